@@ -1,6 +1,15 @@
 import sqlite3
-from typing import List, Tuple, Optional, Any, Union
+import threading
+from typing import List, Tuple, Optional, Any, Union, Sequence, Dict, Iterator
 from queries import Queries as Q
+from metrics import STAGE_SECONDS
+
+# Запросы, увеличивающие счетчик результата в профиле
+RESULT_QUERIES: Dict[str, str] = {
+    "win": Q.INCREMENT_WIN,
+    "lose": Q.INCREMENT_LOSE,
+    "draw": Q.INCREMENT_DRAW,
+}
 
 
 class DataBase:
@@ -9,28 +18,119 @@ class DataBase:
     
     Обеспечивает подключение к базе данных и выполнение основных операций
     для управления пользователями и шахматными играми.
+    
+    Каждый поток держит одно постоянное подключение в режиме WAL: читатели
+    не блокируют писателя, а подготовленные запросы из Queries кешируются
+    подключением и не компилируются заново при каждом вызове.
     """
     
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, synchronous: str = "NORMAL", cache_size: int = -8000,
+                 busy_timeout: float = 5.0) -> None:
         """
-        Инициализирует объект базы данных.
+        Инициализирует объект базы данных. Подключения открываются лениво.
         
         Args:
             name (str): Имя файла базы данных
+            synchronous (str): Значение PRAGMA synchronous (OFF, NORMAL, FULL)
+            cache_size (int): Значение PRAGMA cache_size, отрицательное - в килобайтах
+            busy_timeout (float): Сколько секунд ждать снятия блокировки другим писателем
         """
         self.name: str = name
-        self.cur: Optional[sqlite3.Cursor] = None
-        self.con: Optional[sqlite3.Connection] = None
+        self.synchronous: str = synchronous
+        self.cache_size: int = cache_size
+        self.busy_timeout: float = busy_timeout
+        self._local: threading.local = threading.local()
     
-    def connect(self) -> None:
+    def connect(self) -> sqlite3.Connection:
         """
-        Устанавливает подключение к базе данных.
+        Возвращает подключение текущего потока, открывая его при первом обращении.
+        
+        Returns:
+            sqlite3.Connection: Подключение к базе данных
         
         Raises:
             sqlite3.Error: В случае ошибки подключения к базе данных
         """
-        self.con = sqlite3.connect(self.name)
-        self.cur = self.con.cursor()
+        con: Optional[sqlite3.Connection] = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.name, timeout=self.busy_timeout, cached_statements=256)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(f"PRAGMA synchronous={self.synchronous}")
+            con.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+            self._local.con = con
+        return con
+
+    def fetchone(self, query: str, params: Sequence[Any] = ()) -> Optional[Tuple]:
+        """
+        Выполняет читающий запрос и возвращает первую строку. Транзакция не фиксируется.
+        
+        Args:
+            query (str): SQL-запрос
+            params (Sequence[Any]): Параметры запроса
+            
+        Returns:
+            Optional[Tuple]: Первая строка результата или None
+        """
+        with STAGE_SECONDS.time(stage="db"):
+            return self.connect().execute(query, params).fetchone()
+
+    def fetchall(self, query: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        """
+        Выполняет читающий запрос и возвращает все строки. Транзакция не фиксируется.
+        
+        Args:
+            query (str): SQL-запрос
+            params (Sequence[Any]): Параметры запроса
+            
+        Returns:
+            List[Tuple]: Строки результата
+        """
+        with STAGE_SECONDS.time(stage="db"):
+            return self.connect().execute(query, params).fetchall()
+
+    def execute(self, query: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        """
+        Выполняет изменяющий запрос в отдельной транзакции и фиксирует ее.
+        
+        Args:
+            query (str): SQL-запрос
+            params (Sequence[Any]): Параметры запроса
+            
+        Returns:
+            sqlite3.Cursor: Курсор выполненного запроса
+        """
+        con: sqlite3.Connection = self.connect()
+        with STAGE_SECONDS.time(stage="db"), con:
+            return con.execute(query, params)
+
+    def migrate(self) -> int:
+        """
+        Применяет миграции из Queries.MIGRATIONS, которых еще нет в базе.
+        
+        Версия схемы хранится в PRAGMA user_version. Каждая миграция вместе с
+        новой версией фиксируется одной транзакцией, а BEGIN IMMEDIATE не дает
+        двум процессам применить одну миграцию дважды.
+        
+        Returns:
+            int: Версия схемы после миграций
+            
+        Raises:
+            sqlite3.Error: Если миграцию не удалось применить, например из-за повторяющихся имен
+        """
+        con: sqlite3.Connection = self.connect()
+        version: int = con.execute("PRAGMA user_version").fetchone()[0]
+        while version < len(Q.MIGRATIONS):
+            with con:
+                con.execute("BEGIN IMMEDIATE")
+                # Другой процесс мог успеть обновить схему, пока мы ждали блокировку
+                version = con.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(Q.MIGRATIONS):
+                    break
+                for query in Q.MIGRATIONS[version]:
+                    con.execute(query)
+                version += 1
+                con.execute(f"PRAGMA user_version = {version}")
+        return version
 
     def show_tables(self) -> None:
         """
@@ -39,20 +139,19 @@ class DataBase:
         Returns:
             None
         """
-        self.connect()
-        self.cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        print(self.cur.fetchall())
-        self.close()
+        print(self.fetchall("SELECT name FROM sqlite_master WHERE type='table';"))
 
     def close(self) -> None:
         """
-        Закрывает подключение к базе данных с сохранением изменений.
+        Закрывает подключение текущего потока.
         
         Returns:
             None
         """
-        self.con.commit()
-        self.con.close()
+        con: Optional[sqlite3.Connection] = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
 
     def select_all_user_names(self) -> Union[List[str], bool]:
         """
@@ -61,17 +160,13 @@ class DataBase:
         Returns:
             Union[List[str], bool]: Список имен пользователей или False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_USER_NAMES)
-            all_user_names: List[Tuple] = self.cur.fetchall()
+            all_user_names: List[Tuple] = self.fetchall(Q.SELECT_USER_NAMES)
             all_user_names_processed: List[str] = self.process_lift(all_user_names)
             return all_user_names_processed
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def create_user(self, user_name: str, win: int, lose: int, draw: int, tg_id: int) -> bool:
         """
@@ -86,16 +181,18 @@ class DataBase:
             
         Returns:
             bool: True при успешном создании, False при ошибке
+            
+        Raises:
+            sqlite3.IntegrityError: Если имя или Telegram ID уже заняты
         """
-        self.connect()
         try:
-            self.cur.execute(Q.CREATE_USER, (user_name, win, lose, draw, tg_id))
+            self.execute(Q.CREATE_USER, (user_name, win, lose, draw, tg_id))
             return True
+        except sqlite3.IntegrityError:
+            raise
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def update_win(self, win: int, tg_id: int) -> bool:
         """
@@ -108,15 +205,12 @@ class DataBase:
         Returns:
             bool: True при успешном обновлении, False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.UPDATE_WIN, (win, tg_id))
+            self.execute(Q.UPDATE_WIN, (win, tg_id))
             return True
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
     
     def update_lose(self, lose: int, tg_id: int) -> bool:
         """
@@ -129,17 +223,14 @@ class DataBase:
         Returns:
             bool: True при успешном обновлении, False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.UPDATE_LOSE, (lose, tg_id))
+            self.execute(Q.UPDATE_LOSE, (lose, tg_id))
             return True
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
         
-    def update_draw(self, draw: int, tg_id: int) -> Union[Tuple, bool]:
+    def update_draw(self, draw: int, tg_id: int) -> bool:
         """
         Обновляет количество ничьих пользователя.
         
@@ -148,17 +239,14 @@ class DataBase:
             tg_id (int): Telegram ID пользователя
             
         Returns:
-            Union[Tuple, bool]: Результат запроса или False при ошибке
+            bool: True при успешном обновлении, False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.UPDATE_DRAW, (draw, tg_id))
-            return self.cur.fetchone()
+            self.execute(Q.UPDATE_DRAW, (draw, tg_id))
+            return True
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def select_win(self, tg_id: int) -> Union[Tuple, bool]:
         """
@@ -170,15 +258,11 @@ class DataBase:
         Returns:
             Union[Tuple, bool]: Количество побед или False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_WIN_BY_TG_ID, (tg_id,))
-            return self.cur.fetchone()
+            return self.fetchone(Q.SELECT_WIN_BY_TG_ID, (tg_id,))
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def select_lose(self, tg_id: int) -> Union[Tuple, bool]:
         """
@@ -190,15 +274,11 @@ class DataBase:
         Returns:
             Union[Tuple, bool]: Количество поражений или False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_LOSE_BY_TG_ID, (tg_id,))
-            return self.cur.fetchone()
+            return self.fetchone(Q.SELECT_LOSE_BY_TG_ID, (tg_id,))
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
     
     def select_draw(self, tg_id: int) -> Union[Tuple, bool]:
         """
@@ -210,15 +290,11 @@ class DataBase:
         Returns:
             Union[Tuple, bool]: Количество ничьих или False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_DRAW_BY_TG_ID, (tg_id,))
-            return self.cur.fetchone()
+            return self.fetchone(Q.SELECT_DRAW_BY_TG_ID, (tg_id,))
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def if_profile_exist(self, tg_id: int) -> bool:
         """
@@ -230,18 +306,14 @@ class DataBase:
         Returns:
             bool: True если профиль существует, False если нет или при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_CHECK_PROFILE, (tg_id,))
-            if self.cur.fetchone() is not None:
+            if self.fetchone(Q.SELECT_CHECK_PROFILE, (tg_id,)) is not None:
                 return True
             else:
                 return False
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
         
     def select_games(self, player_id: int, finished: bool = False) -> Union[List[Tuple], bool]:
         """
@@ -254,18 +326,36 @@ class DataBase:
         Returns:
             Union[List[Tuple], bool]: Список игр или False при ошибке
         """
-        self.connect()
         try:
             if not finished:
-                self.cur.execute(Q.SELECT_GAMES_BY_PLAYER_ID, (player_id,))
+                return self.fetchall(Q.SELECT_GAMES_BY_PLAYER_ID, (player_id,))
             else:
-                self.cur.execute(Q.SELECT_FINISHED_GAMES_BY_PLAYER_ID, (player_id,))
-            return self.cur.fetchall()        
+                return self.fetchall(Q.SELECT_FINISHED_GAMES_BY_PLAYER_ID, (player_id,))
+        except Exception as E:
+            print(E)
+            return False
+
+    def select_unfinished_page(self, player_id: int, after: int = -1, before: Optional[int] = None,
+                               limit: int = 10) -> Union[List[Tuple], bool]:
+        """
+        Получает страницу незаконченных игр пользователя по ключу id, без OFFSET.
+        
+        Args:
+            player_id (int): ID игрока
+            after (int): Вернуть игры с id больше этого
+            before (Optional[int]): Если задан, вернуть игры с id меньше этого (предыдущая страница)
+            limit (int): Максимальное количество игр
+            
+        Returns:
+            Union[List[Tuple], bool]: Пары (id, описание) по возрастанию id или False при ошибке
+        """
+        try:
+            if before is None:
+                return self.fetchall(Q.SELECT_UNFINISHED_AFTER, (player_id, after, limit))
+            return self.fetchall(Q.SELECT_UNFINISHED_BEFORE, (player_id, before, limit))[::-1]
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def select_fen(self, game_id: str) -> Union[Tuple, bool]:
         """
@@ -277,15 +367,11 @@ class DataBase:
         Returns:
             Union[Tuple, bool]: FEN-строка или False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_FEN_BY_GAME_ID, (game_id,))
-            return self.cur.fetchone()
+            return self.fetchone(Q.SELECT_FEN_BY_GAME_ID, (game_id,))
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def select_level(self, game_id: str) -> Union[Tuple, bool]:
         """
@@ -297,15 +383,11 @@ class DataBase:
         Returns:
             Union[Tuple, bool]: Уровень сложности или False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_GAME_LEVEL_BY_GAME_ID, (game_id,))
-            return self.cur.fetchone()
+            return self.fetchone(Q.SELECT_GAME_LEVEL_BY_GAME_ID, (game_id,))
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def update_fen(self, fen: str, game_id: str) -> bool:
         """
@@ -318,15 +400,12 @@ class DataBase:
         Returns:
             bool: True при успешном обновлении, False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.UPDATE_FEN_BY_GAME_ID, (fen, game_id))
+            self.execute(Q.UPDATE_FEN_BY_GAME_ID, (fen, game_id))
             return True
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
     
     def create_game(self, player_id: int, description: str = "", level: str = 'средний') -> bool:
         """
@@ -340,15 +419,384 @@ class DataBase:
         Returns:
             bool: True при успешном создании, False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.CREATE_GAME, (player_id, description, level))
+            self.execute(Q.CREATE_GAME, (player_id, description, level))
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    def load_game(self, game_id: str) -> Optional[Union[Dict[str, Any], bool]]:
+        """
+        Загружает состояние игры одним запросом.
+        
+        Args:
+            game_id (str): ID игры
+            
+        Returns:
+            Optional[Union[Dict[str, Any], bool]]: Словарь с ключами 'fen', 'level', 'status',
+            'player1' и 'tg_id' (Telegram ID владельца), None если игры нет, False при ошибке
+        """
+        try:
+            row: Optional[Tuple] = self.fetchone(Q.LOAD_GAME_BY_GAME_ID, (game_id,))
+            if row is None:
+                return None
+            return {
+                "fen": row[0],
+                "level": row[1],
+                "status": row[2],
+                "player1": row[3],
+                "tg_id": row[4],
+            }
+        except Exception as E:
+            print(E)
+            return False
+
+    def record_result(self, tg_id: int, outcome: str) -> bool:
+        """
+        Атомарно увеличивает счетчик побед, поражений или ничьих пользователя.
+        
+        Args:
+            tg_id (int): Telegram ID пользователя
+            outcome (str): Результат игры: 'win', 'lose' или 'draw'
+            
+        Returns:
+            bool: True при успешном обновлении, False при ошибке
+        """
+        try:
+            self.execute(RESULT_QUERIES[outcome], (tg_id,))
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    def finish_game(self, game_id: str, fen: str, tg_id: int, outcome: str, origin: Optional[str] = None,
+                    start_ply: int = 0, moves: Sequence[str] = ()) -> bool:
+        """
+        Завершает игру и учитывает ее результат в профиле в одной транзакции.
+        
+        Args:
+            game_id (str): ID игры
+            fen (str): Итоговая FEN-строка
+            tg_id (int): Telegram ID игрока
+            outcome (str): Результат игры: 'win', 'lose' или 'draw'
+            origin (Optional[str]): FEN позиции, с которой начат журнал ходов
+            start_ply (int): Номер первого нового хода в журнале
+            moves (Sequence[str]): Последние ходы партии в формате UCI
+            
+        Returns:
+            bool: True при успешном обновлении, False при ошибке
+        """
+        try:
+            con: sqlite3.Connection = self.connect()
+            with STAGE_SECONDS.time(stage="db"), con:
+                self._append_moves(con, game_id, origin, start_ply, moves)
+                con.execute(Q.FINISH_GAME_BY_GAME_ID, (fen, game_id))
+                con.execute(RESULT_QUERIES[outcome], (tg_id,))
             return True
         except Exception as E:
             print(E)
             return False
+
+    def iter_player_games(self, player_id: int, batch: int = 500) -> Iterator[Tuple]:
+        """
+        Построчно читает все игры игрока вместе с журналами ходов, не загружая их в память целиком.
+        
+        Args:
+            player_id (int): ID игрока
+            batch (int): Сколько строк забирать из курсора за раз
+            
+        Yields:
+            Tuple: (id, status, description, level, fen, origin_fen, uci) - по строке на ход,
+            строки отсортированы по id игры и номеру хода; у игры без журнала одна строка с uci None
+        """
+        cursor: sqlite3.Cursor = self.connect().execute(Q.EXPORT_GAMES_BY_PLAYER_ID, (player_id,))
+        cursor.arraysize = batch
+        try:
+            while True:
+                rows: List[Tuple] = cursor.fetchmany()
+                if not rows:
+                    return
+                yield from rows
         finally:
-            self.close()
+            cursor.close()
+
+    def iter_unanalyzed_games(self, batch: int = 500) -> Iterator[Tuple]:
+        """
+        Построчно читает законченные игры с журналом ходов, которые еще не проанализированы.
+        
+        Args:
+            batch (int): Сколько строк забирать из курсора за раз
+            
+        Yields:
+            Tuple: (id, origin_fen, uci) - по строке на ход, по порядку id игры и номера хода
+        """
+        cursor: sqlite3.Cursor = self.connect().execute(Q.SELECT_UNANALYZED_GAMES)
+        cursor.arraysize = batch
+        try:
+            while True:
+                rows: List[Tuple] = cursor.fetchmany()
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def save_evals(self, evals: Sequence[Tuple], game_ids: Sequence[int], analyzed_at: float) -> bool:
+        """
+        Сохраняет пачку оценок позиций и отмечает их игры проанализированными в одной транзакции.
+        
+        Args:
+            evals (Sequence[Tuple]): Строки (game_id, ply, cp, mate, best)
+            game_ids (Sequence[int]): Игры, анализ которых завершен
+            analyzed_at (float): Время анализа, секунды Unix
+            
+        Returns:
+            bool: True при успешном сохранении, False при ошибке
+        """
+        try:
+            con: sqlite3.Connection = self.connect()
+            with STAGE_SECONDS.time(stage="db"), con:
+                con.executemany(Q.SAVE_MOVE_EVAL, evals)
+                con.executemany(Q.SAVE_ANALYZED_GAME, [(game_id, analyzed_at) for game_id in game_ids])
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    def iter_player_evals(self, player_id: int, batch: int = 500) -> Iterator[Tuple]:
+        """
+        Построчно читает оценки позиций всех проанализированных игр игрока.
+        
+        Args:
+            player_id (int): ID игрока
+            batch (int): Сколько строк забирать из курсора за раз
+            
+        Yields:
+            Tuple: (game_id, ply, cp) по порядку игры и номера хода
+        """
+        cursor: sqlite3.Cursor = self.connect().execute(Q.SELECT_PLAYER_EVALS, (player_id,))
+        cursor.arraysize = batch
+        try:
+            while True:
+                rows: List[Tuple] = cursor.fetchmany()
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def select_profile(self, tg_id: int) -> Optional[Union[Tuple, bool]]:
+        """
+        Получает ID и имя профиля по Telegram ID.
+        
+        Args:
+            tg_id (int): Telegram ID пользователя
+            
+        Returns:
+            Optional[Union[Tuple, bool]]: (id, username), None если профиля нет, False при ошибке
+        """
+        try:
+            return self.fetchone(Q.SELECT_PROFILE_BY_TG_ID, (tg_id,))
+        except Exception as E:
+            print(E)
+            return False
+
+    def load_moves(self, game_id: str) -> Optional[Union[Tuple[str, List[str]], bool]]:
+        """
+        Загружает журнал ходов игры.
+        
+        Args:
+            game_id (str): ID игры
+            
+        Returns:
+            Optional[Union[Tuple[str, List[str]], bool]]: FEN начальной позиции журнала и ходы
+            в формате UCI, None если журнала еще нет, False при ошибке
+        """
+        try:
+            row: Optional[Tuple] = self.fetchone(Q.SELECT_GAME_ORIGIN, (game_id,))
+            if row is None:
+                return None
+            return row[0], [uci for (uci,) in self.fetchall(Q.SELECT_MOVES_BY_GAME_ID, (game_id,))]
+        except Exception as E:
+            print(E)
+            return False
+
+    def save_moves(self, game_id: str, origin: str, start_ply: int, moves: Sequence[str], fen: str) -> bool:
+        """
+        Дописывает новые ходы в журнал и обновляет FEN игры в одной транзакции.
+        
+        Args:
+            game_id (str): ID игры
+            origin (str): FEN позиции, с которой начат журнал ходов
+            start_ply (int): Номер первого нового хода в журнале
+            moves (Sequence[str]): Новые ходы в формате UCI
+            fen (str): FEN-строка после этих ходов
+            
+        Returns:
+            bool: True при успешном сохранении, False при ошибке
+        """
+        try:
+            con: sqlite3.Connection = self.connect()
+            with STAGE_SECONDS.time(stage="db"), con:
+                self._append_moves(con, game_id, origin, start_ply, moves)
+                con.execute(Q.UPDATE_FEN_BY_GAME_ID, (fen, game_id))
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    @staticmethod
+    def _append_moves(con: sqlite3.Connection, game_id: str, origin: Optional[str], start_ply: int,
+                      moves: Sequence[str]) -> None:
+        """
+        Дописывает ходы в журнал внутри уже открытой транзакции.
+        
+        Журнал, который пишется с нулевого хода, начинается заново: вместе с
+        первыми ходами записывается начальная позиция. Для старых игр,
+        сохраненных только как FEN, журнал начинается с этой FEN.
+        
+        Args:
+            con (sqlite3.Connection): Подключение с открытой транзакцией
+            game_id (str): ID игры
+            origin (Optional[str]): FEN позиции, с которой начат журнал ходов
+            start_ply (int): Номер первого нового хода в журнале
+            moves (Sequence[str]): Новые ходы в формате UCI
+            
+        Returns:
+            None
+        """
+        if not moves or origin is None:
+            return
+        if start_ply == 0:
+            con.execute(Q.DELETE_MOVES_BY_GAME_ID, (game_id,))
+            con.execute(Q.SAVE_GAME_ORIGIN, (game_id, origin))
+        con.executemany(Q.APPEND_MOVE, [(game_id, start_ply + i, uci) for i, uci in enumerate(moves)])
+
+    def select_chat_state(self, chat_id: int) -> Optional[Union[Tuple, bool]]:
+        """
+        Получает состояние диалога с чатом.
+        
+        Args:
+            chat_id (int): ID чата
+            
+        Returns:
+            Optional[Union[Tuple, bool]]: (state, game_id, data, expires_at), None если состояния нет,
+            False при ошибке
+        """
+        try:
+            return self.fetchone(Q.SELECT_CHAT_STATE, (chat_id,))
+        except Exception as E:
+            print(E)
+            return False
+
+    def save_chat_state(self, chat_id: int, state: str, game_id: Optional[int], data: Optional[str],
+                        expires_at: float) -> bool:
+        """
+        Сохраняет состояние диалога с чатом, заменяя прежнее.
+        
+        Args:
+            chat_id (int): ID чата
+            state (str): Состояние
+            game_id (Optional[int]): ID игры
+            data (Optional[str]): Промежуточные данные диалога
+            expires_at (float): Время истечения, секунды Unix
+            
+        Returns:
+            bool: True при успешном сохранении, False при ошибке
+        """
+        try:
+            self.execute(Q.SAVE_CHAT_STATE, (chat_id, state, game_id, data, expires_at))
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    def delete_chat_state(self, chat_id: int) -> bool:
+        """
+        Удаляет состояние диалога с чатом.
+        
+        Args:
+            chat_id (int): ID чата
+            
+        Returns:
+            bool: True при успешном удалении, False при ошибке
+        """
+        try:
+            self.execute(Q.DELETE_CHAT_STATE, (chat_id,))
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    def delete_expired_chat_states(self, now: float) -> bool:
+        """
+        Удаляет просроченные состояния диалогов.
+        
+        Args:
+            now (float): Текущее время, секунды Unix
+            
+        Returns:
+            bool: True при успешном удалении, False при ошибке
+        """
+        try:
+            self.execute(Q.DELETE_EXPIRED_CHAT_STATES, (now,))
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    def select_file_id(self, key: str) -> Optional[str]:
+        """
+        Получает Telegram file_id ранее загруженной картинки.
+        
+        Args:
+            key (str): Ключ картинки
+            
+        Returns:
+            Optional[str]: file_id или None, если картинка не загружалась или произошла ошибка
+        """
+        try:
+            row: Optional[Tuple] = self.fetchone(Q.SELECT_FILE_ID_BY_KEY, (key,))
+            return row[0] if row else None
+        except Exception as E:
+            print(E)
+            return None
+
+    def save_file_id(self, key: str, file_id: str) -> bool:
+        """
+        Запоминает Telegram file_id загруженной картинки.
+        
+        Args:
+            key (str): Ключ картинки
+            file_id (str): file_id, который вернул Telegram
+            
+        Returns:
+            bool: True при успешном сохранении, False при ошибке
+        """
+        try:
+            self.execute(Q.SAVE_FILE_ID, (key, file_id))
+            return True
+        except Exception as E:
+            print(E)
+            return False
+
+    def delete_file_id(self, key: str) -> bool:
+        """
+        Удаляет устаревший file_id картинки.
+        
+        Args:
+            key (str): Ключ картинки
+            
+        Returns:
+            bool: True при успешном удалении, False при ошибке
+        """
+        try:
+            self.execute(Q.DELETE_FILE_ID_BY_KEY, (key,))
+            return True
+        except Exception as E:
+            print(E)
+            return False
 
     def select_player1_by_tg_id(self, tg_id: int) -> Union[Tuple, bool]:
         """
@@ -360,15 +808,11 @@ class DataBase:
         Returns:
             Union[Tuple, bool]: ID игрока или False при ошибке
         """
-        self.connect()
         try:
-            self.cur.execute(Q.SELECT_PLAYER_ID_BY_TG_ID, (tg_id,))
-            return self.cur.fetchone()
+            return self.fetchone(Q.SELECT_PLAYER_ID_BY_TG_ID, (tg_id,))
         except Exception as E:
             print(E)
             return False
-        finally:
-            self.close()
 
     def process_lift(self, spisok: List[Tuple]) -> List[Any]:
         """
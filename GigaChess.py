@@ -1,22 +1,65 @@
 from typing import Dict, List, Tuple, Optional, Any, Union
+import logging
+import threading
+import sys
 import telebot
 import sqlite3
 import chess
-import chess.engine
-import chess.svg
-from svglib.svglib import svg2rlg
-from reportlab.graphics import renderPM
-from pathlib import Path
-from ai import push
-from os import remove
+from ai import push, pool, levels, fastpath
+from render import board_png, board_key, key_to_str, render_cache
+from file_ids import FileIdCache
+from book import MoveCache
+from game_cache import GameCache
+from chat_state import State, ChatState, StateStore
 from telebot import types
-import os
 
 from DataBase import DataBase as Base
-token = ...
-bot = telebot.TeleBot(token = token)
+from dispatcher import ChatDispatcher, OrderedTeleBot, Stage
+from admission import Admission, RESULTS as ADMISSION_RESULTS
+from metrics import REGISTRY, ILLEGAL_MOVES
+from webhook import WebhookServer
+from config import BOT_TOKEN, DISPATCH_WORKERS, DISPATCH_PRIORITY_WORKERS, ADMISSION_RATE, ADMISSION_BURST, ADMISSION_MAX_PENDING, ADMISSION_CHEAP_COMMANDS, ADMISSION_MAX_DEFER, ENGINE_POOL_SIZE, RENDER_WORKERS, IO_WORKERS, DB_PATH, DB_SYNCHRONOUS, DB_CACHE_SIZE, FILE_ID_CACHE_ITEMS, MOVE_CACHE_ROWS, GAME_CACHE_ITEMS, GAME_CACHE_IDLE, GAMES_PAGE_SIZE, METRICS_PORT, METRICS_LOG_INTERVAL, CHAT_STATE_TTL, CHAT_STATE_CACHE_ITEMS, CHAT_STATE_NEGATIVE_TTL, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS, EXPORT_GZIP_BYTES
+token = BOT_TOKEN
+# Без токена модуль импортируется с заглушкой (выгрузка, замеры, supervisor):
+# настоящий токен нужен только для приема обновлений, его проверяет main()
+OFFLINE_TOKEN: str = "0:offline"
+logger = logging.getLogger(__name__)
+dispatcher: Optional[ChatDispatcher] = ChatDispatcher(DISPATCH_WORKERS, DISPATCH_PRIORITY_WORKERS) if DISPATCH_WORKERS > 0 else None
+
+# Ограничение частоты сообщений каждого пользователя и предел общей очереди
+admission = Admission(ADMISSION_RATE, ADMISSION_BURST, ADMISSION_MAX_PENDING, ADMISSION_CHEAP_COMMANDS,
+                      max_defer = ADMISSION_MAX_DEFER)
+# Ход в идущей партии сверх лимита откладывается, а не теряется
+bot = OrderedTeleBot(token = token or OFFLINE_TOKEN, dispatcher = dispatcher, admission = admission,
+                     defer = lambda message: is_playing(message.chat.id))
+
+# Этапы обработки хода: у каждого свой лимит, чтобы поиск движка не занимал все потоки
+engine_stage = Stage("engine", ENGINE_POOL_SIZE)
+render_stage = Stage("render", RENDER_WORKERS)
+io_stage = Stage("io", IO_WORKERS)
+
+# Подключение к базе открывается лениво, миграции применяет startup()
+db = Base(DB_PATH, synchronous = DB_SYNCHRONOUS, cache_size = DB_CACHE_SIZE)
+
+file_ids = FileIdCache(db, FILE_ID_CACHE_ITEMS)
+move_cache = MoveCache(db, MOVE_CACHE_ROWS)
+game_cache = GameCache(db, GAME_CACHE_ITEMS, GAME_CACHE_IDLE)
+states = StateStore(db, CHAT_STATE_TTL, CHAT_STATE_CACHE_ITEMS, CHAT_STATE_NEGATIVE_TTL)
+
+
+def is_playing(chat_id: int) -> bool:
+    """
+    Проверяет, идет ли в чате партия.
+
+    Args:
+        chat_id (int): ID чата
+
+    Returns:
+        bool: True, если бот ждет от чата ход
+    """
+    entry: Optional[ChatState] = states.get(chat_id)
+    return entry is not None and entry.state == State.PLAYING
 
-db = Base("GigaBase.db")
 
 comands = [
     types.BotCommand("start", 'запускает бота'),\
@@ -24,10 +67,37 @@ comands = [
     types.BotCommand('play_game', 'запускает уже существующую игру'),
     types.BotCommand('show_unfinished_games', 'показывает id незаконченных игр'),
     types.BotCommand('create_profile', 'регистрирует новый профиль'),
+    types.BotCommand('export', 'выгружает твои игры в PGN'),
+    types.BotCommand('replay', 'присылает анимацию игры по ее ID'),
     types.BotCommand('help', 'Если тебе нужна помощь')
 ]
 
-bot.set_my_commands(comands)
+# Обработчик состояний регистрируется первым: пока бот ждет ответа на свой вопрос,
+# любое текстовое сообщение чата, в том числе команда, считается этим ответом
+@bot.message_handler(func=lambda message: states.get(message.chat.id) is not None)
+def handler_state(message: Any) -> None:
+    """
+    Передает сообщение шагу диалога, которого ждет бот от этого чата.
+    
+    Args:
+        message (Any): Объект сообщения от пользователя
+        
+    Returns:
+        None
+    """
+    entry: Optional[ChatState] = states.get(message.chat.id)
+    if entry is None:
+        handler_all(message)
+    elif entry.state == State.AWAIT_NAME:
+        process_user_name(message)
+    elif entry.state == State.AWAIT_DESCRIPTION:
+        process_create_game(message)
+    elif entry.state == State.AWAIT_LEVEL:
+        finish_create_game(message, entry.data)
+    elif entry.state == State.AWAIT_GAME_ID:
+        process_play_game(message)
+    elif entry.state == State.PLAYING:
+        next_move(message, entry.game_id)
 
 @bot.message_handler(commands=["start"])
 def handler_start(message: Any) -> None:
@@ -86,7 +156,7 @@ def handler_create_profile(message: Any) -> None:
         bot.send_message(message.chat.id, "Чё ты доканался со своей регистрацией, есть у тебя аккаунт")
     else:
         bot.send_message(message.chat.id, "Чё не зареган, имя напиши!!!")
-        bot.register_next_step_handler_by_chat_id(message.chat.id, process_user_name)
+        states.set(message.chat.id, State.AWAIT_NAME)
 
 def process_user_name(message: Any) -> None:
     """
@@ -99,17 +169,21 @@ def process_user_name(message: Any) -> None:
         None
     """
     user_name: str = message.text
-    spis: List[str] = db.select_all_user_names()
-    
-    if user_name not in spis:
-        user_id: int = message.from_user.id
-        if db.create_user(user_name, 0, 0, 0, user_id):
-            bot.send_message(message.chat.id, "Я зарегал тебя аболтус")
-        else:
-            bot.send_message(message.chat.id, "Даже это ты смог сломать, иди и пытайся еще")
-    else:
+    user_id: int = message.from_user.id
+
+    # Уникальность имени проверяет индекс profiles_username, без выборки всех имен
+    try:
+        created: bool = db.create_user(user_name, 0, 0, 0, user_id)
+    except sqlite3.IntegrityError:
         bot.send_message(message.chat.id, "Никакой уникальности, придумай что то другое")
-        bot.register_next_step_handler_by_chat_id(message.chat.id, process_user_name)
+        states.set(message.chat.id, State.AWAIT_NAME)
+        return
+
+    states.clear(message.chat.id)
+    if created:
+        bot.send_message(message.chat.id, "Я зарегал тебя аболтус")
+    else:
+        bot.send_message(message.chat.id, "Даже это ты смог сломать, иди и пытайся еще")
 
 def finish_create_game(message: Any, description: str) -> None:
     """
@@ -122,17 +196,17 @@ def finish_create_game(message: Any, description: str) -> None:
     Returns:
         None
     """
-    levels: List[str] = ['легко', 'нормально', 'сложно']
     level: str = message.text.lower()
     
-    if level in levels:
+    if level in levels.profiles:
         tg_id: int = message.from_user.id
         player1: int = db.select_player1_by_tg_id(tg_id)[0]
         db.create_game(player1, description, level)
+        states.clear(message.chat.id)
         bot.send_message(message.chat.id, "Игра успешно создана")
     else:
         bot.send_message(message.chat.id, "Уровень введен неправильно. Введите уровень заново")
-        bot.register_next_step_handler_by_chat_id(message.chat.id, finish_create_game, description)
+        states.set(message.chat.id, State.AWAIT_LEVEL, data=description)
 
 def process_create_game(message: Any) -> None:
     """
@@ -145,13 +219,64 @@ def process_create_game(message: Any) -> None:
         None
     """
     description: str = message.text
-    bot.send_message(message.chat.id, "Введи сложность игры: леко, нормально, сложно")
-    bot.register_next_step_handler_by_chat_id(message.chat.id, finish_create_game, description)
+    bot.send_message(message.chat.id, f"Введи сложность игры: {', '.join(levels.names())}")
+    states.set(message.chat.id, State.AWAIT_LEVEL, data=description)
+
+def games_page(player1: int, after: Optional[int] = None, before: Optional[int] = None) -> Tuple[str, Optional[types.InlineKeyboardMarkup]]:
+    """
+    Готовит страницу списка незаконченных игр с кнопками перехода.
+    
+    Страница выбирается по id последней (или первой) показанной игры, поэтому
+    запрос к базе стоит одинаково на любой странице.
+    
+    Args:
+        player1 (int): ID игрока
+        after (Optional[int]): Показать игры с id больше этого, None - первая страница
+        before (Optional[int]): Если задан, показать игры с id меньше этого
+        
+    Returns:
+        Tuple[str, Optional[types.InlineKeyboardMarkup]]: Текст страницы и кнопки
+    """
+    # Одна лишняя строка показывает, есть ли еще страница в эту сторону
+    start: int = after if after is not None else -1
+    games: List[Tuple] = db.select_unfinished_page(player1, start, before, GAMES_PAGE_SIZE + 1) or []
+    if before is None:
+        has_prev: bool = after is not None
+        has_next: bool = len(games) > GAMES_PAGE_SIZE
+        games = games[:GAMES_PAGE_SIZE]
+    else:
+        has_prev = len(games) > GAMES_PAGE_SIZE
+        has_next = True
+        games = games[-GAMES_PAGE_SIZE:]
+
+    if not games:
+        if after is not None or before is not None:
+            # Игры с этой стороны успели закончиться, показываем первую страницу
+            return games_page(player1)
+        return "Незаконченных игр нет", None
+
+    msg: str = ""
+    for game in games:
+        description: str = game[1] or ""
+        if len(description) > 100:
+            description = description[:100] + "…"
+        msg += f'айди игры - {game[0]}, описание - {description}\n'
+
+    buttons: List[types.InlineKeyboardButton] = []
+    if has_prev:
+        buttons.append(types.InlineKeyboardButton("« назад", callback_data=f"games:<:{games[0][0]}"))
+    if has_next:
+        buttons.append(types.InlineKeyboardButton("дальше »", callback_data=f"games:>:{games[-1][0]}"))
+    markup: Optional[types.InlineKeyboardMarkup] = None
+    if buttons:
+        markup = types.InlineKeyboardMarkup()
+        markup.row(*buttons)
+    return msg, markup
 
 @bot.message_handler(commands=["show_unfinished_games"])
 def show_unfinished_games(message: Any) -> None:
     """
-    Показывает список незавершенных игр пользователя.
+    Показывает первую страницу незавершенных игр пользователя.
     
     Args:
         message (Any): Объект сообщения от пользователя
@@ -160,15 +285,108 @@ def show_unfinished_games(message: Any) -> None:
         None
     """
     tg_id: int = message.from_user.id
-    player1: int = db.select_player1_by_tg_id(tg_id)[0]
-    games: List[Tuple] = db.select_games(player1)
-    msg: str = ""
+    player: Optional[Tuple] = db.select_player1_by_tg_id(tg_id)
+    if not player:
+        bot.send_message(message.chat.id, "Мамкин хакер, иди профиль создай!!!")
+        return
+
+    msg, markup = games_page(player[0])
+    bot.send_message(message.chat.id, msg, reply_markup=markup)
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("games:"))
+def turn_games_page(call: Any) -> None:
+    """
+    Листает список незавершенных игр по нажатию кнопки.
     
-    for game in games:
-        row: str = f'айди игры - {game[0]}, описание - {game[3]}\n'
-        msg += row
+    Args:
+        call (Any): Нажатие inline-кнопки с данными вида games:<направление>:<id>
         
-    bot.send_message(message.chat.id, msg)
+    Returns:
+        None
+    """
+    bot.answer_callback_query(call.id)
+    player: Optional[Tuple] = db.select_player1_by_tg_id(call.from_user.id)
+    if not player or call.message is None:
+        return
+
+    _, direction, game_id = call.data.split(":")
+    if direction == ">":
+        msg, markup = games_page(player[0], after=int(game_id))
+    else:
+        msg, markup = games_page(player[0], before=int(game_id))
+    try:
+        bot.edit_message_text(msg, call.message.chat.id, call.message.message_id, reply_markup=markup)
+    except telebot.apihelper.ApiTelegramException as E:
+        # Например, если страница не изменилась
+        print(E)
+
+@bot.message_handler(commands=["export"])
+def export_games(message: Any) -> None:
+    """
+    Отправляет все игры пользователя PGN-файлом, большие выгрузки - в gzip.
+    
+    Args:
+        message (Any): Объект сообщения от пользователя
+        
+    Returns:
+        None
+    """
+    # chess.pgn нужен только для выгрузки, он не загружается при старте бота
+    from export import export_file
+
+    profile: Optional[Tuple] = db.select_profile(message.from_user.id)
+    if not profile:
+        bot.send_message(message.chat.id, "Мамкин хакер, иди профиль создай!!!")
+        return
+
+    document, name, count = export_file(db, profile[0], profile[1], EXPORT_GZIP_BYTES)
+    try:
+        if count == 0:
+            reply(message.chat.id, "Нет игр для выгрузки")
+        else:
+            io_stage.run(bot.send_document, message.chat.id, document, visible_file_name=name,
+                         caption=f"Партий: {count}")
+    finally:
+        document.close()
+
+@bot.message_handler(commands=["replay"])
+def replay_game(message: Any) -> None:
+    """
+    Отправляет анимацию игры по ее журналу ходов: /replay <ID игры>.
+
+    Args:
+        message (Any): Объект сообщения от пользователя
+
+    Returns:
+        None
+    """
+    # Анимация нужна только по команде /replay, модуль не загружается при старте бота
+    from replay import replay_file
+
+    try:
+        game_id: int = int(message.text.split()[1])
+    except (IndexError, ValueError):
+        reply(message.chat.id, "Укажи ID игры, пример: /replay 42")
+        return
+    game: Optional[Union[Dict[str, Any], bool]] = db.load_game(game_id)
+    if not game or str(game["tg_id"]) != str(message.from_user.id):
+        reply(message.chat.id, "Нет у тебя такой игры, проверь ID")
+        return
+    log: Optional[Union[Tuple[str, List[str]], bool]] = db.load_moves(game_id)
+    if log is False:
+        reply(message.chat.id, "Не удалось прочитать запись ходов, попробуй позже")
+        return
+    if not log or not log[1]:
+        # Игры, начатые до журнала ходов, хранят только позицию
+        reply(message.chat.id, "Для этой игры нет записи ходов")
+        return
+
+    animation, count = render_stage.run(replay_file, log[0], log[1])
+    try:
+        io_stage.run(bot.send_animation, message.chat.id, types.InputFile(animation, file_name=f"replay_{game_id}.gif"),
+                     caption=f"Игра {game_id}, ходов: {count}")
+    finally:
+        animation.close()
 
 @bot.message_handler(commands=["create_game"])
 def create_game(message: Any) -> None:
@@ -184,7 +402,7 @@ def create_game(message: Any) -> None:
     user_id: int = message.from_user.id 
     if db.if_profile_exist(user_id):
         bot.send_message(message.chat.id, "Введи описание игры")
-        bot.register_next_step_handler_by_chat_id(message.chat.id, process_create_game)
+        states.set(message.chat.id, State.AWAIT_DESCRIPTION)
     else:
         bot.send_message(message.chat.id, "Мамкин хакер, иди профиль создай!!!")
 
@@ -199,31 +417,33 @@ def process_play_game(message: Any) -> None:
         None
         
     Raises:
-        TypeError: В случае ошибок при обработке SVG/FEN
+        TypeError, ValueError: В случае ошибок при обработке FEN
     """
-    game_id: str = message.text
-    bot.send_message(message.chat.id, f"Игра с ID - {game_id} запущена")
-    image_path: Path = Path('image_base') / game_id
-
+    states.clear(message.chat.id)
     try:
-        if check_path_svg(game_id + ".png"):
-            send_photo(image_path.with_suffix(".png"), message.chat.id)
-        else:
-            fen: str = db.select_fen(game_id)[0]
-            board: chess.Board = chess.Board(fen)
-            svg_data: str = chess.svg.board(board=board)
+        game_id: int = int(message.text)
+    except (TypeError, ValueError):
+        bot.send_message(message.chat.id, "Нет у тебя такой игры, проверь ID")
+        return
+    game: Optional[Union[Dict[str, Any], bool]] = db.load_game(game_id)
+
+    if not game or str(game["tg_id"]) != str(message.from_user.id):
+        bot.send_message(message.chat.id, "Нет у тебя такой игры, проверь ID")
+        return
+    if game["status"] == "over":
+        bot.send_message(message.chat.id, "Эта игра уже закончена, создай новую")
+        return
 
-            with open(image_path.with_suffix(".svg"), "w", encoding="utf-8") as f:
-                f.write(svg_data)
+    bot.send_message(message.chat.id, f"Игра с ID - {game_id} запущена")
 
-            drawing = svg2rlg(image_path.with_suffix(".svg"))
-            renderPM.drawToFile(drawing, image_path.with_suffix(".png"), fmt="PNG")
-            send_photo(image_path.with_suffix(".png"), message.chat.id)
+    try:
+        board: chess.Board = game_cache.get(game_id, game["fen"])
+        send_photo(board, message.chat.id, board.peek() if board.move_stack else None)
             
         bot.send_message(message.chat.id, "Введите ваш ход, пример: е2е4")
-        bot.register_next_step_handler_by_chat_id(message.chat.id, next_move, game_id)
+        states.set(message.chat.id, State.PLAYING, game_id=game_id)
 
-    except TypeError as E:
+    except (TypeError, ValueError, RuntimeError) as E:
         bot.send_message(message.chat.id, str(E))
 
 @bot.message_handler(commands=["play_game"])
@@ -238,122 +458,286 @@ def play_game(message: Any) -> None:
         None
     """
     bot.send_message(message.chat.id, "Напиши ID игры в которую хочешь поиграть")
-    bot.register_next_step_handler_by_chat_id(message.chat.id, process_play_game)
+    states.set(message.chat.id, State.AWAIT_GAME_ID)
 
-def check_path_svg(file_name: str) -> bool:
+def send_photo(board: chess.Board, chat_id: int, lastmove: Optional[chess.Move] = None) -> None:
     """
-    Проверяет существование файла с изображением доски.
+    Отправляет фото шахматной доски в чат.
+    
+    Если такая картинка уже загружалась, отправляется только ее file_id,
+    без отрисовки и повторной загрузки PNG.
     
     Args:
-        file_name (str): Имя файла для проверки
+        board (chess.Board): Шахматная доска
+        chat_id (int): ID чата для отправки
+        lastmove (Optional[chess.Move]): Последний ход для подсветки
         
     Returns:
-        bool: True если файл существует, иначе False
+        None
     """
-    path: Path = Path('image_base') / file_name
-    return path.exists()
+    key: str = key_to_str(board_key(board, lastmove))
+    file_id: Optional[str] = file_ids.get(key)
+
+    if file_id is not None:
+        try:
+            io_stage.run(bot.send_photo, chat_id, file_id)
+            return
+        except telebot.apihelper.ApiTelegramException as E:
+            # file_id устарел или недоступен, загружаем картинку заново
+            print(E)
+            file_ids.forget(key)
+
+    image: bytes = render_stage.run(board_png, board, lastmove)
+    sent = io_stage.run(bot.send_photo, chat_id, image)
+    file_ids.put(key, sent.photo[-1].file_id)
 
-def send_photo(image_path: Path, chat_id: int) -> None:
+def reply(chat_id: int, text: str) -> None:
     """
-    Отправляет фото шахматной доски в чат.
+    Отправляет текстовое сообщение в чат через этап запросов к Telegram.
     
     Args:
-        image_path (Path): Путь к файлу изображения
         chat_id (int): ID чата для отправки
+        text (str): Текст сообщения
         
     Returns:
         None
     """
-    with open(image_path, "rb") as image:
-        bot.send_photo(chat_id, image)
+    io_stage.run(bot.send_message, chat_id, text)
+
+# Ответ, когда ход не удалось сохранить в базу
+SAVE_FAILED_TEXT: str = "Не удалось сохранить ход, повтори его еще раз"
+LOAD_FAILED_TEXT: str = "Не удалось загрузить игру, повтори ход еще раз"
 
-def next_move(message: Any, game_id: str) -> None:
+def next_move(message: Any, game_id: int) -> None:
     """
     Обрабатывает ход игрока и обновляет состояние игры.
     
     Args:
         message (Any): Объект сообщения с ходом игрока
-        game_id (str): ID текущей игры
+        game_id (int): ID текущей игры
         
     Returns:
         None
     """
-    image_path: Path = Path('image_base') / game_id
     text: str = message.text
 
     if text == "exit":
-        bot.send_message(message.chat.id, "Игра приостановлена")
+        states.clear(message.chat.id)
+        reply(message.chat.id, "Игра приостановлена")
     else:
-        fen: str = db.select_fen(game_id)[0]
-        board: chess.Board = chess.Board(fen)
-        result: Dict[str, Any] = push(board, text, game_id)
+        game: Optional[Union[Dict[str, Any], bool]] = db.load_game(game_id)
+        if not game:
+            states.clear(message.chat.id)
+            reply(message.chat.id, "Игра не найдена")
+            return
+
+        try:
+            board: chess.Board = game_cache.get(game_id, game["fen"])
+        except RuntimeError as E:
+            logger.warning("%s", E)
+            reply(message.chat.id, LOAD_FAILED_TEXT)
+            states.keep(message.chat.id)
+            return
+        ply: int = len(board.move_stack)
+        try:
+            result: Dict[str, Any] = engine_stage.run(push, board, text, game_id, game["level"], move_cache)
+        except Exception:
+            # Ход игрока мог остаться на доске без ответа бота, соберем доску заново
+            game_cache.forget(game_id)
+            raise
+        count: int = len(board.move_stack) - ply
 
         if result["finish"]:
-            delete_image(game_id)
-            bot.send_message(message.chat.id, result["message"])
-            
+            outcome: str
             if result["message"] == "Мат! Победил кожаный":
-                win_numeral: int = int(db.select_win(message.from_user.id)[0]) + 1
-                db.update_win(message.from_user.id, win_numeral)
+                outcome = "win"
             elif result["message"] == "Мат! Победило ведро с гвоздями":
-                lose_numeral: int = int(db.select_lose(message.from_user.id)[0]) + 1
-                db.update_lose(message.from_user.id, lose_numeral)
+                outcome = "lose"
             else:
-                draw_numeral: int = int(db.select_draw(message.from_user.id)[0]) + 1
-                db.update_draw(message.from_user.id, draw_numeral)
+                outcome = "draw"
+            # Последние ходы, статус игры и статистика игрока сохраняются в одной транзакции
+            if not game_cache.finish(game_id, board, count, message.from_user.id, outcome):
+                # В базе осталась позиция до хода, с нее игра и продолжится
+                reply(message.chat.id, SAVE_FAILED_TEXT)
+                states.keep(message.chat.id)
+                return
+            states.clear(message.chat.id)
+            reply(message.chat.id, result["message"])
 
         elif not result["finish"] and result["message"] != "illegal_move":
-            board: chess.Board = result["board"]
-            db.update_fen(board.fen(), game_id)
-            send_photo(image_path.with_suffix(".png"), message.chat.id)
-            bot.send_message(message.chat.id, result["message"])
-            bot.send_message(message.chat.id, "Введи следующий ход")
-            bot.register_next_step_handler_by_chat_id(message.chat.id, next_move, game_id)
+            if not game_cache.save(game_id, board, count):
+                # Доска вытеснена, следующий ход проверится по позиции до этого хода
+                reply(message.chat.id, SAVE_FAILED_TEXT)
+                states.keep(message.chat.id)
+                return
+            send_photo(board, message.chat.id, board.peek())
+            reply(message.chat.id, result["message"])
+            reply(message.chat.id, "Введи следующий ход")
+            states.keep(message.chat.id)
 
         elif not result["finish"] and result["message"] == "illegal_move":
-            bot.send_message(message.chat.id, result["message"])
-            bot.send_message(message.chat.id, "Ход невозможен. Введите другой ход")
-            bot.register_next_step_handler_by_chat_id(message.chat.id, next_move, game_id)
+            ILLEGAL_MOVES.inc()
+            reply(message.chat.id, result["message"])
+            reply(message.chat.id, "Ход невозможен. Введите другой ход")
+            states.keep(message.chat.id)
 
-def delete_image(game_id: str) -> None:
+@bot.message_handler(func=check_word)
+def handler_all(message: Any) -> None:
     """
-    Удаляет файлы изображений для указанной игры.
+    Обрабатывает все текстовые сообщения, не соответствующие командам.
     
     Args:
-        game_id (str): ID игры для удаления изображений
+        message (Any): Объект сообщения от пользователя
         
     Returns:
         None
     """
-    image_path: Path = Path('image_base') / game_id
-    svg_path: Path = image_path.with_suffix(".svg")
-    png_path: Path = image_path.with_suffix(".png")
+    bot.send_message(message.chat.id, "Ты русский??? Скажи нормально")
+
+
     
-    if svg_path.exists():
-        os.remove(svg_path)
-    if png_path.exists():
-        os.remove(png_path)
 
-@bot.message_handler(func=check_word)
-def handler_all(message: Any) -> None:
+
+
+def register_metrics() -> None:
     """
-    Обрабатывает все текстовые сообщения, не соответствующие командам.
+    Регистрирует метрики, которые читаются из пула движков, кешей и диспетчера.
     
-    Args:
-        message (Any): Объект сообщения от пользователя
-        
     Returns:
         None
     """
-    bot.send_message(message.chat.id, "Ты русский??? Скажи нормально")
+    stages: List[Stage] = [engine_stage, render_stage, io_stage]
+    REGISTRY.register("gigachess_engine_spawns_total", "counter", "Запуски процессов движка",
+                      lambda: {(): pool.stats()["spawns"]})
+    REGISTRY.register("gigachess_engine_restarts_total", "counter", "Перезапуски упавших движков",
+                      lambda: {(): pool.stats()["restarts"]})
+    REGISTRY.register("gigachess_engine_processes", "gauge", "Процессы движка по состоянию",
+                      lambda: {(("state", state),): pool.stats()[state] for state in ("spawned", "idle", "waiting", "pondering")})
+    REGISTRY.register("gigachess_engine_routing_total", "counter", "Ходы на движке игры и ушедшие на другой движок",
+                      lambda: {(("result", "home"),): pool.stats()["affinity_hits"], (("result", "spill"),): pool.stats()["spills"]})
+    REGISTRY.register("gigachess_engine_affinities", "gauge", "Игры, привязанные к движкам",
+                      lambda: {(): pool.stats()["affinities"]})
+    REGISTRY.register("gigachess_engine_ponder_total", "counter", "Исходы обдумывания ответа игрока",
+                      lambda: {(("result", result),): pool.stats()["ponder_" + result]
+                               for result in ("hits", "misses", "expired", "reclaimed")})
+    REGISTRY.register("gigachess_cache_hits_total", "counter", "Попадания в кеши", lambda: {
+        (("cache", "render"),): render_cache.stats()["hits"],
+        (("cache", "file_id"),): file_ids.stats()["hits"],
+        (("cache", "game"),): game_cache.stats()["hits"],
+        (("cache", "move"),): sum(level["hits"] + level["book"] for level in move_cache.stats().values()),
+    })
+    REGISTRY.register("gigachess_cache_misses_total", "counter", "Промахи кешей", lambda: {
+        (("cache", "render"),): render_cache.stats()["misses"],
+        (("cache", "file_id"),): file_ids.stats()["misses"],
+        (("cache", "game"),): game_cache.stats()["loads"],
+        (("cache", "move"),): sum(level["misses"] for level in move_cache.stats().values()),
+    })
+    REGISTRY.register("gigachess_move_cache_moves_total", "counter", "Обращения к кешу ходов по уровням: книга, попадание, промах",
+                      lambda: {(("level", level), ("result", result)): counters[result]
+                               for level, counters in move_cache.stats().items() for result in ("book", "hits", "misses")})
+    REGISTRY.register("gigachess_move_cache_hit_rate", "gauge", "Доля ходов уровня из книги или кеша ходов",
+                      lambda: {(("level", level),): counters["hit_rate"] for level, counters in move_cache.stats().items()})
+    REGISTRY.register("gigachess_fastpath_moves_total", "counter", "Ходы бота без поиска движка",
+                      lambda: {(("shortcut", name),): count for name, count in fastpath.stats().items()})
+    REGISTRY.register("gigachess_active_games", "gauge", "Партии, доски которых держатся в памяти",
+                      lambda: {(): game_cache.stats()["items"]})
+    REGISTRY.register("gigachess_chat_states", "gauge", "Чаты, от которых бот ждет ответа (в памяти)",
+                      lambda: {(): states.stats()["active"]})
+    REGISTRY.register("gigachess_dispatcher_pending", "gauge", "Сообщения в очередях чатов",
+                      lambda: {(): dispatcher.pending() if dispatcher is not None else 0})
+    REGISTRY.register("gigachess_admission_total", "counter", "Решения допуска входящих сообщений",
+                      lambda: {(("result", result),): admission.stats()[result] for result in ADMISSION_RESULTS})
+    REGISTRY.register("gigachess_admission_users", "gauge", "Пользователи с корзиной токенов в памяти",
+                      lambda: {(): admission.stats()["users"]})
+    REGISTRY.register("gigachess_stage_active", "gauge", "Задачи, выполняющиеся на этапе",
+                      lambda: {(("stage", stage.name),): stage.stats()["active"] for stage in stages})
+    REGISTRY.register("gigachess_stage_waiting", "gauge", "Задачи, ожидающие места на этапе",
+                      lambda: {(("stage", stage.name),): stage.stats()["waiting"] for stage in stages})
+
+
+def serve_webhook() -> WebhookServer:
+    """
+    Запускает прием обновлений через webhook и сообщает Telegram его адрес.
+    
+    Returns:
+        WebhookServer: Запущенный сервер
+    """
+    server: WebhookServer = WebhookServer(bot, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+                                          WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS)
+    server.start()
+    REGISTRY.register("gigachess_webhook_updates_total", "counter", "Обновления, пришедшие через webhook",
+                      lambda: {(("result", result),): server.stats()[result] for result in ("received", "rejected", "failed")})
+    REGISTRY.register("gigachess_webhook_queued", "gauge", "Принятые, но еще не обработанные обновления",
+                      lambda: {(): server.stats()["queued"]})
+    bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET or None,
+                    allowed_updates=["message", "callback_query"])
+    return server
 
 
+def register_commands() -> bool:
+    """
+    Отправляет Telegram список команд бота для меню.
     
+    Список не нужен для работы бота, поэтому ошибка сети или API только
+    записывается в лог и не мешает запуску.
+    
+    Returns:
+        bool: True, если список команд принят
+    """
+    try:
+        return bool(bot.set_my_commands(comands))
+    except Exception as E:
+        logger.warning("Не удалось зарегистрировать команды бота: %s", E)
+        return False
 
 
+def startup() -> None:
+    """
+    Готовит бота к приему сообщений: применяет миграции базы и регистрирует команды.
+    
+    При импорте модуля не выполняется ни запросов к сети, ни к базе,
+    поэтому его можно импортировать без сети и без файла базы.
+    
+    Returns:
+        None
+    """
+    db.migrate()
+    register_commands()
 
-if __name__ == "__main__":
-    bot.polling(none_stop=True)
 
+def main() -> None:
+    """
+    Запускает бота: метрики, движки, прием обновлений через webhook или long polling.
     
+    Returns:
+        None
+    """
+    if not token:
+        sys.exit("Не задан токен бота: GIGACHESS_TOKEN")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    startup()
+    register_metrics()
+    if METRICS_PORT > 0:
+        REGISTRY.serve(METRICS_PORT)
+    if METRICS_LOG_INTERVAL > 0:
+        REGISTRY.log_periodically(METRICS_LOG_INTERVAL)
+    pool.warm_up()
+    webhook: Optional[WebhookServer] = None
+    try:
+        if WEBHOOK_URL:
+            webhook = serve_webhook()
+            threading.Event().wait()
+        else:
+            # Пока у бота есть webhook, getUpdates не работает
+            bot.remove_webhook()
+            bot.polling(none_stop=True)
+    finally:
+        if webhook is not None:
+            webhook.stop()
+        if dispatcher is not None:
+            dispatcher.shutdown()
+        pool.close()
+
 
+if __name__ == "__main__":
+    main()
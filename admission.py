@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+# Решения о входящем сообщении
+ADMITTED: str = "admitted"
+PRIORITY: str = "priority"
+DEFERRED: str = "deferred"
+LIMITED: str = "limited"
+BUSY: str = "busy"
+RESULTS: Tuple[str, ...] = (ADMITTED, PRIORITY, DEFERRED, LIMITED, BUSY)
+
+# Ответы пользователю, сообщение которого не принято
+LIMITED_TEXT: str = "Не так быстро, подожди пару секунд"
+BUSY_TEXT: str = "Сервер перегружен, повтори через минуту"
+
+
+class Bucket:
+    """
+    Корзина токенов одного пользователя.
+    """
+
+    __slots__ = ("tokens", "updated", "warned")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        """
+        Инициализирует корзину.
+
+        Args:
+            tokens (float): Количество токенов
+            updated (float): Время последнего пополнения (time.monotonic)
+        """
+        self.tokens: float = tokens
+        self.updated: float = updated
+        # Пользователь уже получил ответ "не так быстро" и еще не дождался токена
+        self.warned: bool = False
+
+
+class Admission:
+    """
+    Допуск входящих сообщений: ограничение частоты для каждого пользователя
+    и общий предел очереди.
+
+    Каждое сообщение тратит токен из корзины пользователя, корзина пополняется
+    с постоянной скоростью до burst токенов. Дешевые команды (без движка и
+    рендера) идут вне очереди, остальные сообщения отклоняются, когда в
+    очередях чатов уже max_pending задач: лучше сразу ответить "сервер занят",
+    чем копить задержку для всех.
+
+    Сообщение, которое нельзя терять (ход в идущей партии), при пустой корзине
+    берет токен в долг и откладывается до его появления, но не дольше max_defer
+    секунд: так быстрый игрок получает ответы с задержкой, а не пропадающие ходы.
+    """
+
+    def __init__(self, rate: float, burst: int, max_pending: int = 0,
+                 cheap_commands: Iterable[str] = (), max_users: int = 100000, max_defer: float = 0.0) -> None:
+        """
+        Инициализирует допуск.
+
+        Args:
+            rate (float): Сколько сообщений в секунду в среднем разрешено пользователю, 0 - без ограничения
+            burst (int): Сколько сообщений пользователь может прислать подряд
+            max_pending (int): Предел задач в очередях чатов для обычных сообщений, 0 - без предела
+            cheap_commands (Iterable[str]): Команды без слэша, которые обрабатываются вне очереди
+            max_users (int): Сколько корзин пользователей держать в памяти
+            max_defer (float): На сколько секунд можно отложить сообщение до появления токена, 0 - не откладывать
+        """
+        self.rate: float = rate
+        self.burst: int = burst
+        self.max_pending: int = max_pending
+        self.cheap_commands: FrozenSet[str] = frozenset(cheap_commands)
+        self.max_users: int = max_users
+        self.max_defer: float = max_defer
+        self._buckets: "OrderedDict[int, Bucket]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.counters: Dict[str, int] = {result: 0 for result in RESULTS}
+
+    def is_cheap(self, text: Optional[str]) -> bool:
+        """
+        Проверяет, является ли сообщение дешевой командой.
+
+        Args:
+            text (Optional[str]): Текст сообщения
+
+        Returns:
+            bool: True для команды из списка дешевых
+        """
+        if not text or not text.startswith("/"):
+            return False
+        # "/help@GigaChessBot аргументы" -> "help"
+        return text.split(maxsplit=1)[0][1:].split("@", 1)[0] in self.cheap_commands
+
+    def _take(self, user_id: int, now: float, deferrable: bool) -> Tuple[bool, bool, float]:
+        """
+        Забирает токен из корзины пользователя. Вызывается под блокировкой.
+
+        Args:
+            user_id (int): Telegram ID пользователя
+            now (float): Текущее время (time.monotonic)
+            deferrable (bool): Можно ли взять токен в долг и отложить сообщение
+
+        Returns:
+            Tuple[bool, bool, float]: Получен ли токен, нужно ли сообщить пользователю об отказе
+                и через сколько секунд токен действительно появится
+        """
+        bucket: Optional[Bucket] = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = Bucket(float(self.burst), now)
+            self._buckets[user_id] = bucket
+            # Корзины пользователей, которые долго молчат, полны - их можно забыть
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket.tokens = min(float(self.burst), bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            bucket.warned = False
+            return True, False, 0.0
+        # Корзина уходит в минус, поэтому следующие отложенные сообщения ждут дольше и идут по порядку
+        delay: float = (1.0 - bucket.tokens) / self.rate
+        if deferrable and delay <= self.max_defer:
+            bucket.tokens -= 1.0
+            return True, False, delay
+        # Отвечаем один раз, иначе на каждое лишнее сообщение уходил бы ответ
+        warn: bool = not bucket.warned
+        bucket.warned = True
+        return False, warn, 0.0
+
+    def admit(self, user_id: int, cheap: bool, pending: int, deferrable: bool = False) -> Tuple[str, bool, float]:
+        """
+        Решает, принять ли сообщение пользователя.
+
+        Args:
+            user_id (int): Telegram ID пользователя
+            cheap (bool): Дешевое ли сообщение (идет вне очереди)
+            pending (int): Сколько задач сейчас ждет в очередях чатов
+            deferrable (bool): Можно ли отложить сообщение вместо отказа по лимиту
+
+        Returns:
+            Tuple[str, bool, float]: Решение (ADMITTED, PRIORITY, DEFERRED, LIMITED или BUSY),
+                нужно ли ответить пользователю об отказе и на сколько секунд отложить сообщение
+        """
+        with self._lock:
+            delay: float = 0.0
+            if self.rate > 0:
+                taken, warn, delay = self._take(user_id, time.monotonic(), deferrable and not cheap)
+                if not taken:
+                    self.counters[LIMITED] += 1
+                    return LIMITED, warn, 0.0
+            if cheap:
+                self.counters[PRIORITY] += 1
+                return PRIORITY, False, 0.0
+            if self.max_pending > 0 and pending >= self.max_pending:
+                # Токен не возвращается: иначе на поток сообщений при полной очереди
+                # бот отвечал бы "сервер перегружен" на каждое
+                self.counters[BUSY] += 1
+                return BUSY, True, 0.0
+            if delay > 0:
+                self.counters[DEFERRED] += 1
+                return DEFERRED, False, delay
+            self.counters[ADMITTED] += 1
+            return ADMITTED, False, 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает количество решений каждого вида и корзин в памяти.
+
+        Returns:
+            Dict[str, Any]: Словарь со счетчиками допуска
+        """
+        with self._lock:
+            return dict(self.counters, users=len(self._buckets))
@@ -1,27 +1,41 @@
 import chess
-import chess.engine
-import chess.svg
-from svglib.svglib import svg2rlg
-from reportlab.graphics import renderPM
-from os import remove
-from typing import Dict, Any, Optional
-from DataBase import DataBase 
+from typing import TYPE_CHECKING, Dict, Any, Optional
+from engine_pool import EnginePool
+from book import OpeningBook, MoveCache
+from fastpath import FastPath
+from levels import Levels, LevelProfile
+from config import ENGINE_PATH, ENGINE_POOL_SIZE, ENGINE_CHECKOUT_TIMEOUT, PONDER_SECONDS, ENGINE_AFFINITY_SECONDS, BOOK_PATH, LEVELS_PATH, SYZYGY_PATH, SYZYGY_PIECES
 
-db = DataBase("GigaBase.db")
+if TYPE_CHECKING:
+    import chess.engine
 
+levels = Levels(LEVELS_PATH)
 
-def push(board: chess.Board, move: str, file: str) -> Dict[str, Any]:
+# Движки запускаются при первом ходе (или через pool.warm_up()) и живут до остановки бота
+pool = EnginePool(ENGINE_PATH, ENGINE_POOL_SIZE, options=levels.engine_options, timeout=ENGINE_CHECKOUT_TIMEOUT,
+                  ponder_seconds=PONDER_SECONDS, affinity_seconds=ENGINE_AFFINITY_SECONDS)
+
+book = OpeningBook(BOOK_PATH)
+
+fastpath = FastPath(SYZYGY_PATH, SYZYGY_PIECES)
+
+
+def push(board: chess.Board, move: str, file: str, level: str,
+         move_cache: Optional[MoveCache] = None) -> Dict[str, Any]:
     """
     Обрабатывает ход игрока и ответный ход бота, обновляет состояние игры.
     
     Преобразует текстовый ход в объект хода, проверяет его легальность,
     выполняет ход игрока, проверяет состояние игры, затем выполняет ход бота
-    с учетом уровня сложности, сохраняет новое состояние доски в SVG/PNG.
+    с учетом уровня сложности. Перед поиском движком ход ищется в дебютной
+    книге и в кеше ранее найденных ходов.
     
     Args:
         board (chess.Board): Текущее состояние шахматной доски
         move (str): Ход игрока в формате UCI (например, 'e2e4')
-        file (str): Идентификатор файла для сохранения изображения доски
+        file (str): Идентификатор игры
+        level (str): Уровень сложности игры
+        move_cache (Optional[MoveCache]): Кеш ходов движка, None - без кеша
         
     Returns:
         Dict[str, Any]: Словарь с информацией о состоянии игры, содержащий:
@@ -30,18 +44,22 @@ def push(board: chess.Board, move: str, file: str) -> Dict[str, Any]:
             - 'message' (str): Сообщение о состоянии игры
             
     Raises:
-        chess.engine.EngineTerminatedError: Если движок Stockfish завершился с ошибкой
-        Exception: Другие ошибки при работе с движком или файловой системой
+        chess.engine.EngineTerminatedError: Если движок Stockfish упал и при повторной попытке
+        TimeoutError: Если в пуле не нашлось свободного движка
+        Exception: Другие ошибки при работе с движком
         
     Examples:
         >>> board = chess.Board()
-        >>> result = push(board, "e2e4", "game_123")
+        >>> result = push(board, "e2e4", "game_123", "нормально")
         >>> print(result["message"])
     """
-    engine = chess.engine.SimpleEngine.popen_uci(r"stockfish/stockfish-windows-x86-64-avx2.exe")
-    move_obj: chess.Move = chess.Move.from_uci(move)
+    try:
+        move_obj: Optional[chess.Move] = chess.Move.from_uci(move)
+    except ValueError:
+        # Текст не похож на ход в формате UCI - это такой же невозможный ход
+        move_obj = None
 
-    if move_obj in board.legal_moves:
+    if move_obj is not None and move_obj in board.legal_moves:
         board.push(move_obj)
         game_state: Dict[str, Any] = check_game_state(board)
         game_state["board"] = board
@@ -49,7 +67,6 @@ def push(board: chess.Board, move: str, file: str) -> Dict[str, Any]:
         if game_state["finish"]:
             if game_state["message"] == "Мат":
                 game_state["message"] = "Мат! Победил кожаный"
-            engine.quit()
             return game_state
     else: 
         illegal_move: Dict[str, Any] = {
@@ -57,25 +74,28 @@ def push(board: chess.Board, move: str, file: str) -> Dict[str, Any]:
             "finish": False, 
             "message": "illegal_move"
         }  
-        engine.quit()
         return illegal_move 
     
-    level: str = db.select_level(file)[0]
-    
-    # Устанавливаем время для хода бота в зависимости от уровня сложности
-    time: float
-    if level == 'легко':
-        time = 0.03
-    elif level == 'нормально':
-        time = 0.075
-    elif level == 'сложно':
-        time = 0.09
-    else:
-        time = 0.075
-        
-    result: chess.engine.PlayResult = engine.play(board, chess.engine.Limit(time=time))
-    board.push(result.move)
-    engine.quit()
+    # Сила игры и объем поиска задаются профилем уровня из levels.json
+    profile: LevelProfile = levels.get(level)
+
+    # Вынужденные и тривиальные ходы (единственный ход, мат в один, таблицы Syzygy) - без движка
+    bot_move: Optional[chess.Move] = fastpath.move(board, profile.fastpath)
+    if bot_move is None:
+        bot_move = book.move(board)
+        if bot_move is not None and move_cache is not None:
+            move_cache.count_book(profile.name)
+    # Ходы ослабленных уровней случайны, для них кеш не используется (profile.cache)
+    if not profile.cache:
+        move_cache = None
+    if bot_move is None and move_cache is not None:
+        bot_move = move_cache.get(board, profile.name)
+    if bot_move is None:
+        result: chess.engine.PlayResult = pool.play(board, profile.limit, game=file, options=profile.options)
+        bot_move = result.move
+        if move_cache is not None:
+            move_cache.put(board, profile.name, bot_move)
+    board.push(bot_move)
     
     game_state = check_game_state(board)
     game_state["board"] = board
@@ -84,17 +104,6 @@ def push(board: chess.Board, move: str, file: str) -> Dict[str, Any]:
         if game_state["message"] == "Мат":
             game_state["message"] = "Мат! Победило ведро с гвоздями"
     
-    # Генерируем SVG изображение доски с подсветкой последнего хода
-    svg_data: str = chess.svg.board(board=board, lastmove=board.peek())
-
-    # Сохраняем SVG файл
-    with open(f"image_base/{file}.svg", "w", encoding="utf-8") as f:
-        f.write(svg_data)
-    
-    # Конвертируем SVG в PNG
-    drawing = svg2rlg(f"image_base/{file}.svg")
-    renderPM.drawToFile(drawing, f"image_base/{file}.png", fmt="PNG")
-    
     return game_state
 
 
@@ -165,5 +174,5 @@ def check_game_state(board: chess.Board) -> Dict[str, Any]:
 
 # Пример использования:
 # board = chess.Board("r1bq1rk1/ppp2ppp/2n2n2/3p4/3P4/2bBPN2/PP3PPP/R1BQ1RK1 w - - 0 2")
-# a = push(board, "b2c3", "test")
+# a = push(board, "b2c3", "test", "нормально")
 # print(a)
\ No newline at end of file
@@ -0,0 +1,277 @@
+import argparse
+import itertools
+import multiprocessing.util
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import chess
+import chess.engine
+
+from DataBase import DataBase
+from config import (
+    ANALYSIS_DEPTH,
+    ANALYSIS_HASH,
+    ANALYSIS_THREADS,
+    ANALYSIS_WORKERS,
+    DB_CACHE_SIZE,
+    DB_PATH,
+    DB_SYNCHRONOUS,
+    ENGINE_PATH,
+)
+
+# Пакетный анализ законченных игр. Каждый процесс пула держит свой Stockfish и
+# разбирает игры целиком: позиции одной игры идут подряд, поэтому хеш движка
+# переиспользуется между соседними позициями. Оценки пишутся в move_evals пачками,
+# а готовые игры отмечаются в analyzed_games в той же транзакции, поэтому
+# прерванный запуск продолжается с первой непроанализированной игры.
+#
+#   python analysis.py --workers 8 --depth 14
+#   python analysis.py --report 123456789
+
+# Оценка мата в сантипешках и предел, которым ограничиваются оценки при подсчете потерь
+MATE_CP: int = 10000
+LOSS_CAP: int = 1000
+
+# Потеря оценки за ход, начиная с которой ход считается ошибкой и грубой ошибкой
+MISTAKE_CP: int = 100
+BLUNDER_CP: int = 300
+
+# Игра для анализа: ID, начальная позиция и ходы в UCI
+Task = Tuple[int, str, List[str]]
+
+# Строка move_evals: game_id, ply, cp, mate, best
+Eval = Tuple[int, int, int, Optional[int], Optional[str]]
+
+# Движок и лимит поиска процесса пула, выставляются в _init_worker
+_engine: Optional[chess.engine.SimpleEngine] = None
+_limit: Optional[chess.engine.Limit] = None
+
+
+def _init_worker(command: str, options: Dict[str, Any], depth: int) -> None:
+    """
+    Запускает движок процесса пула. Вызывается один раз при старте процесса.
+
+    Args:
+        command (str): Команда запуска движка
+        options (Dict[str, Any]): UCI-опции движка (Threads, Hash)
+        depth (int): Глубина поиска на позицию
+
+    Returns:
+        None
+    """
+    global _engine, _limit
+    _engine = chess.engine.SimpleEngine.popen_uci(command)
+    _engine.configure(options)
+    # Процессы пула завершаются без atexit, движок закрывается финализатором multiprocessing
+    multiprocessing.util.Finalize(None, _engine.close, exitpriority=10)
+    _limit = chess.engine.Limit(depth=depth)
+
+
+def evaluate(engine: chess.engine.SimpleEngine, board: chess.Board, limit: chess.engine.Limit,
+             game: object) -> Tuple[int, Optional[int], Optional[str]]:
+    """
+    Оценивает позицию с точки зрения стороны, которая ходит.
+
+    Args:
+        engine (chess.engine.SimpleEngine): Движок
+        board (chess.Board): Позиция
+        limit (chess.engine.Limit): Лимит поиска
+        game (object): Ключ игры, при его смене движок очищает хеш
+
+    Returns:
+        Tuple[int, Optional[int], Optional[str]]: Оценка в сантипешках, ходов до мата и лучший ход
+    """
+    if board.is_checkmate():
+        return -MATE_CP, 0, None
+    if board.is_game_over():
+        return 0, None, None
+
+    info: chess.engine.InfoDict = engine.analyse(board, limit, game=game)
+    score: chess.engine.Score = info["score"].relative
+    pv: List[chess.Move] = info.get("pv") or []
+    return score.score(mate_score=MATE_CP), score.mate(), pv[0].uci() if pv else None
+
+
+def analyse_game(task: Task) -> Tuple[int, List[Eval]]:
+    """
+    Оценивает все позиции игры движком процесса пула.
+
+    Args:
+        task (Task): Игра для анализа
+
+    Returns:
+        Tuple[int, List[Eval]]: ID игры и оценки позиций, от начальной до последней
+    """
+    game_id, origin, moves = task
+    board: chess.Board = chess.Board(origin)
+    evals: List[Eval] = []
+    for ply in range(len(moves) + 1):
+        evals.append((game_id, ply) + evaluate(_engine, board, _limit, game_id))
+        if ply < len(moves):
+            move: chess.Move = chess.Move.from_uci(moves[ply])
+            if not board.is_legal(move):
+                break
+            board.push(move)
+    return game_id, evals
+
+
+def iter_tasks(db: DataBase) -> Iterator[Task]:
+    """
+    Выдает непроанализированные игры по одной.
+
+    Args:
+        db (DataBase): База данных
+
+    Yields:
+        Task: Игра для анализа
+    """
+    for game_id, rows in itertools.groupby(db.iter_unanalyzed_games(), key=lambda row: row[0]):
+        rows = list(rows)
+        yield game_id, rows[0][1], [row[2] for row in rows]
+
+
+def analyse(db_path: str, command: str, workers: int, threads: int, hash_mb: int, depth: int,
+            max_games: Optional[int] = None, flush_games: int = 50) -> int:
+    """
+    Анализирует непроанализированные законченные игры в пуле процессов.
+
+    Игры читаются и оценки пишутся через разные подключения: в режиме WAL
+    чтение идет по снимку базы и не мешает записи пачек.
+
+    Args:
+        db_path (str): Путь к базе данных
+        command (str): Команда запуска движка
+        workers (int): Количество процессов движка
+        threads (int): Потоков на движок
+        hash_mb (int): Хеш на движок, МБ
+        depth (int): Глубина поиска на позицию
+        max_games (Optional[int]): Сколько игр проанализировать за запуск, None - все
+        flush_games (int): Сколько игр копить перед записью в базу
+
+    Returns:
+        int: Количество проанализированных игр
+    """
+    reader: DataBase = DataBase(db_path, DB_SYNCHRONOUS, DB_CACHE_SIZE)
+    writer: DataBase = DataBase(db_path, DB_SYNCHRONOUS, DB_CACHE_SIZE)
+    writer.migrate()
+
+    tasks: Iterator[Task] = itertools.islice(iter_tasks(reader), max_games)
+    evals: List[Eval] = []
+    done: List[int] = []
+    analysed: int = 0
+    start: float = time.perf_counter()
+
+    def flush() -> None:
+        nonlocal analysed
+        if done:
+            if not writer.save_evals(evals, done, time.time()):
+                raise RuntimeError("Не удалось сохранить оценки")
+            analysed += len(done)
+            print(f"Проанализировано игр: {analysed}, {analysed / (time.perf_counter() - start):.2f} игр/с",
+                  file=sys.stderr)
+            evals.clear()
+            done.clear()
+
+    workers = max(1, workers)
+    options: Dict[str, Any] = {"Threads": threads, "Hash": hash_mb}
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(command, options, depth)) as pool:
+        pending: Set[Future] = set()
+        exhausted: bool = False
+        while pending or not exhausted:
+            # В работе держится не больше двух игр на процесс, чтобы не читать всю базу в память
+            while not exhausted and len(pending) < workers * 2:
+                task: Optional[Task] = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                else:
+                    pending.add(pool.submit(analyse_game, task))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                game_id, game_evals = future.result()
+                evals.extend(game_evals)
+                done.append(game_id)
+            if len(done) >= flush_games:
+                flush()
+        flush()
+    return analysed
+
+
+def player_report(db: DataBase, player_id: int) -> Dict[str, Any]:
+    """
+    Считает точность игрока по оценкам его проанализированных игр.
+
+    Игрок делает первый ход от начальной позиции игры, поэтому его ходы - четные.
+    Потеря хода - насколько ухудшилась оценка с точки зрения сделавшего ход,
+    оценки ограничены LOSS_CAP, чтобы мат не перевешивал все остальные ходы.
+
+    Args:
+        db (DataBase): База данных
+        player_id (int): ID игрока
+
+    Returns:
+        Dict[str, Any]: Количество игр и ходов, средняя потеря, ошибки и грубые ошибки
+    """
+    games: int = 0
+    moves: int = 0
+    loss_total: int = 0
+    mistakes: int = 0
+    blunders: int = 0
+    for _, rows in itertools.groupby(db.iter_player_evals(player_id), key=lambda row: row[0]):
+        games += 1
+        scores: List[int] = [max(-LOSS_CAP, min(LOSS_CAP, cp)) for _, _, cp in rows]
+        for ply in range(0, len(scores) - 1, 2):
+            # Оценка после хода дана с точки зрения соперника
+            loss: int = max(0, scores[ply] + scores[ply + 1])
+            moves += 1
+            loss_total += loss
+            if loss >= BLUNDER_CP:
+                blunders += 1
+            elif loss >= MISTAKE_CP:
+                mistakes += 1
+    return {
+        "games": games,
+        "moves": moves,
+        "acpl": loss_total / moves if moves else 0.0,
+        "mistakes": mistakes,
+        "blunders": blunders,
+    }
+
+
+def main() -> None:
+    """
+    Запускает анализ или печатает отчет по игроку.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Пакетный анализ законченных игр GigaChess")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--engine", default=ENGINE_PATH, help="Команда запуска UCI-движка")
+    parser.add_argument("--workers", type=int, default=ANALYSIS_WORKERS, help="Процессов движка")
+    parser.add_argument("--threads", type=int, default=ANALYSIS_THREADS, help="Потоков на движок")
+    parser.add_argument("--hash", type=int, default=ANALYSIS_HASH, help="Хеш на движок, МБ")
+    parser.add_argument("--depth", type=int, default=ANALYSIS_DEPTH, help="Глубина поиска на позицию")
+    parser.add_argument("--max-games", type=int, default=None, help="Сколько игр проанализировать за запуск")
+    parser.add_argument("--report", type=int, metavar="TG_ID", help="Не анализировать, а напечатать отчет игрока")
+    args = parser.parse_args()
+
+    if args.report is None:
+        count: int = analyse(args.db, args.engine, args.workers, args.threads, args.hash, args.depth, args.max_games)
+        print(f"Готово, проанализировано игр: {count}", file=sys.stderr)
+        return
+
+    db: DataBase = DataBase(args.db, DB_SYNCHRONOUS, DB_CACHE_SIZE)
+    profile = db.select_profile(args.report)
+    if not profile:
+        sys.exit(f"Профиль с Telegram ID {args.report} не найден")
+    report: Dict[str, Any] = player_report(db, profile[0])
+    print(f"{profile[1]}: игр {report['games']}, ходов {report['moves']}, "
+          f"средняя потеря {report['acpl']:.0f} сп, ошибок {report['mistakes']}, грубых ошибок {report['blunders']}")
+
+
+if __name__ == "__main__":
+    main()
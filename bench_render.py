@@ -0,0 +1,82 @@
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List, Optional, Tuple
+
+import chess
+
+from render import render_sprite_png, render_svg_png
+
+
+def random_positions(count: int, seed: int) -> List[Tuple[chess.Board, Optional[chess.Move]]]:
+    """
+    Генерирует позиции из случайных партий.
+
+    Args:
+        count (int): Количество позиций
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        List[Tuple[chess.Board, Optional[chess.Move]]]: Позиции и последние ходы
+    """
+    rng: random.Random = random.Random(seed)
+    positions: List[Tuple[chess.Board, Optional[chess.Move]]] = []
+    board: chess.Board = chess.Board()
+    while len(positions) < count:
+        if board.is_game_over() or board.ply() > 120:
+            board = chess.Board()
+        board.push(rng.choice(list(board.legal_moves)))
+        positions.append((board.copy(stack=False), board.peek()))
+    return positions
+
+
+def bench(name: str, render: Callable[..., bytes], positions: List[Tuple[chess.Board, Optional[chess.Move]]]) -> None:
+    """
+    Замеряет время отрисовки каждой позиции и печатает сводку.
+
+    Args:
+        name (str): Название способа отрисовки
+        render (Callable[..., bytes]): Функция отрисовки
+        positions (List[Tuple[chess.Board, Optional[chess.Move]]]): Позиции для отрисовки
+
+    Returns:
+        None
+    """
+    # Первая отрисовка включает загрузку библиотек и спрайтов, ее считаем отдельно
+    start: float = time.perf_counter()
+    render(*positions[0])
+    first: float = (time.perf_counter() - start) * 1000
+
+    timings: List[float] = []
+    for board, lastmove in positions:
+        start = time.perf_counter()
+        render(board, lastmove)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{name:>7}: first {first:7.1f} ms, mean {statistics.mean(timings):6.2f} ms, "
+          f"p50 {timings[len(timings) // 2]:6.2f} ms, p95 {timings[int(len(timings) * 0.95)]:6.2f} ms")
+
+
+def main() -> None:
+    """
+    Сравнивает отрисовку через svglib/reportlab и через спрайты Pillow.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк отрисовки доски")
+    parser.add_argument("-n", "--positions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    positions = random_positions(args.positions, args.seed)
+    bench("pillow", render_sprite_png, positions)
+    try:
+        bench("svg", render_svg_png, positions)
+    except ImportError as E:
+        print(f"    svg: пропущено, {E}")
+
+
+if __name__ == "__main__":
+    main()
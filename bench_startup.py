@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+# Замер времени запуска бота: импорт GigaChess.py и startup() в отдельном
+# процессе, без сети (запросы к Bot API уходят на закрытый локальный порт)
+# и на пустой временной базе.
+#
+#   python bench_startup.py -n 20
+
+# Тяжелые модули, которые не должны загружаться при импорте бота
+HEAVY_MODULES: List[str] = ["chess.engine", "asyncio", "chess.pgn", "chess.svg", "svglib", "reportlab", "PIL"]
+
+CHILD: str = """
+import json, sys, time
+start = time.perf_counter()
+import telebot.apihelper
+# Порт 9 (discard) закрыт: запрос к Bot API сразу получает отказ в соединении
+telebot.apihelper.API_URL = "http://127.0.0.1:9/bot{0}/{1}"
+import GigaChess
+imported = time.perf_counter()
+loaded = [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+GigaChess.startup()
+ready = time.perf_counter()
+print(json.dumps({"import": imported - start, "startup": ready - imported, "loaded": loaded}))
+"""
+
+
+def run_once(db_path: str) -> Dict[str, Any]:
+    """
+    Запускает бота в новом процессе и возвращает замеры.
+
+    Args:
+        db_path (str): Путь к базе данных для этого запуска
+
+    Returns:
+        Dict[str, Any]: Время импорта и startup() в секундах, загруженные тяжелые модули
+    """
+    env: Dict[str, str] = dict(os.environ, GIGACHESS_TOKEN="1:bench", GIGACHESS_DB_PATH=db_path)
+    result = subprocess.run([sys.executable, "-c", CHILD, json.dumps(HEAVY_MODULES)], env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """
+    Несколько раз запускает бота и печатает медиану и минимум замеров.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Замер времени запуска GigaChess")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="Количество запусков")
+    args = parser.parse_args()
+
+    runs: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="gigachess-bench-") as workdir:
+        for index in range(args.runs):
+            runs.append(run_once(os.path.join(workdir, f"bench{index}.db")))
+
+    for key in ("import", "startup"):
+        values: List[float] = [run[key] * 1000 for run in runs]
+        print(f"{key:8} median {statistics.median(values):7.1f} ms  min {min(values):7.1f} ms")
+    print("тяжелые модули после импорта:", ", ".join(runs[-1]["loaded"]) or "нет")
+
+
+if __name__ == "__main__":
+    main()
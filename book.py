@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import chess
+import chess.polyglot
+
+from DataBase import DataBase
+from queries import Queries as Q
+
+
+def signed_hash(board: chess.Board) -> int:
+    """
+    Возвращает Zobrist-хеш позиции в виде знакового 64-битного числа, которое помещается в INTEGER SQLite.
+
+    Args:
+        board (chess.Board): Шахматная доска
+
+    Returns:
+        int: Хеш позиции
+    """
+    key: int = chess.polyglot.zobrist_hash(board)
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class OpeningBook:
+    """
+    Дебютная книга в формате Polyglot. Если файла нет, книга просто ничего не находит.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Инициализирует книгу. Файл открывается при первом обращении.
+
+        Args:
+            path (str): Путь к файлу книги .bin
+        """
+        self.path: str = path
+        self._reader: Optional[chess.polyglot.MemoryMappedReader] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def move(self, board: chess.Board) -> Optional[chess.Move]:
+        """
+        Выбирает ход из книги с учетом весов записей.
+
+        Args:
+            board (chess.Board): Позиция
+
+        Returns:
+            Optional[chess.Move]: Ход из книги или None, если позиции в книге нет
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with self._lock:
+            if self._reader is None:
+                self._reader = chess.polyglot.open_reader(self.path)
+        try:
+            return self._reader.weighted_choice(board).move
+        except IndexError:
+            return None
+
+
+class MoveCache:
+    """
+    Постоянный кеш найденных движком ходов: (Zobrist-хеш позиции, уровень) -> ход.
+
+    Хранится в базе, поэтому переживает перезапуски. Когда записей становится
+    больше max_rows, удаляются давно не использованные. Время использования
+    обновляется не чаще раза в touch_seconds, чтобы попадание в кеш было
+    только чтением: для вытеснения точность в пределах часа не важна.
+    """
+
+    def __init__(self, db: DataBase, max_rows: int, touch_seconds: float = 3600.0) -> None:
+        """
+        Инициализирует кеш.
+
+        Args:
+            db (DataBase): База данных
+            max_rows (int): Максимальное количество записей
+            touch_seconds (float): Как давно должна быть использована запись, чтобы обновить время ее использования
+        """
+        self.db: DataBase = db
+        self.max_rows: int = max_rows
+        self.touch_seconds: float = touch_seconds
+        self._lock: threading.Lock = threading.Lock()
+        self._inserts: int = 0
+        self.levels: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, level: str, counter: str) -> None:
+        """
+        Увеличивает счетчик метрик уровня.
+
+        Args:
+            level (str): Уровень сложности
+            counter (str): Название счетчика: book, hits или misses
+
+        Returns:
+            None
+        """
+        with self._lock:
+            counters = self.levels.setdefault(level, {"book": 0, "hits": 0, "misses": 0})
+            counters[counter] += 1
+
+    def count_book(self, level: str) -> None:
+        """
+        Учитывает ход, взятый из дебютной книги.
+
+        Args:
+            level (str): Уровень сложности
+
+        Returns:
+            None
+        """
+        self._count(level, "book")
+
+    def get(self, board: chess.Board, level: str) -> Optional[chess.Move]:
+        """
+        Ищет сохраненный ход для позиции.
+
+        Args:
+            board (chess.Board): Позиция
+            level (str): Уровень сложности
+
+        Returns:
+            Optional[chess.Move]: Ход или None, если его нет или он нелегален (коллизия хеша)
+        """
+        key: int = signed_hash(board)
+        move: Optional[chess.Move] = None
+        try:
+            row = self.db.fetchone(Q.SELECT_CACHED_MOVE, (key, level))
+            if row is not None:
+                candidate = chess.Move.from_uci(row[0])
+                if candidate in board.legal_moves:
+                    move = candidate
+                    now: float = time.time()
+                    if now - row[1] >= self.touch_seconds:
+                        self.db.execute(Q.TOUCH_CACHED_MOVE, (now, key, level))
+        except Exception as E:
+            print(E)
+        self._count(level, "hits" if move is not None else "misses")
+        return move
+
+    def put(self, board: chess.Board, level: str, move: chess.Move) -> None:
+        """
+        Сохраняет найденный движком ход и при необходимости вытесняет старые записи.
+
+        Args:
+            board (chess.Board): Позиция до хода
+            level (str): Уровень сложности
+            move (chess.Move): Найденный ход
+
+        Returns:
+            None
+        """
+        try:
+            self.db.execute(Q.SAVE_CACHED_MOVE, (signed_hash(board), level, move.uci(), time.time()))
+            with self._lock:
+                self._inserts += 1
+                # Считать записи на каждой вставке дорого, проверяем размер пачками
+                evict: bool = self._inserts % 100 == 0
+            if evict:
+                self.evict()
+        except Exception as E:
+            print(E)
+
+    def evict(self) -> None:
+        """
+        Удаляет давно не использованные записи сверх max_rows.
+
+        Returns:
+            None
+        """
+        try:
+            excess: int = self.db.fetchone(Q.COUNT_CACHED_MOVES)[0] - self.max_rows
+            if excess > 0:
+                self.db.execute(Q.EVICT_CACHED_MOVES, (excess,))
+        except Exception as E:
+            print(E)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает счетчики и долю попаданий по уровням сложности.
+
+        Returns:
+            Dict[str, Any]: Метрики по каждому уровню
+        """
+        with self._lock:
+            result: Dict[str, Any] = {}
+            for level, counters in self.levels.items():
+                total: int = sum(counters.values())
+                result[level] = dict(counters, hit_rate=(counters["book"] + counters["hits"]) / total if total else 0.0)
+            return result
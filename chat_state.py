@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+from DataBase import DataBase
+
+
+class State(str, Enum):
+    """
+    Чего бот ждет от чата следующим сообщением.
+    """
+
+    AWAIT_NAME = "await_name"
+    AWAIT_DESCRIPTION = "await_description"
+    AWAIT_LEVEL = "await_level"
+    AWAIT_GAME_ID = "await_game_id"
+    PLAYING = "playing"
+
+
+class ChatState(NamedTuple):
+    """
+    Состояние диалога с чатом.
+    """
+
+    state: State
+    game_id: Optional[int]
+    data: Optional[str]
+    expires_at: float
+
+
+class StateStore:
+    """
+    Состояния диалогов, хранящиеся в базе, с кешем в памяти.
+
+    В отличие от next-step обработчиков TeleBot состояние переживает
+    перезапуск бота. У каждого состояния есть срок жизни, поэтому брошенные
+    диалоги не копятся ни в памяти, ни в базе.
+
+    Кеш в памяти не сверяется с базой: состояние, которое уже лежит в кеше,
+    не увидит изменений из другого процесса. Поэтому все сообщения одного
+    чата должен обрабатывать один процесс (так распределяет их supervisor.py).
+    Отсутствие состояния помнится только negative_ttl секунд, чтобы чат без
+    диалога не читал базу на каждое сообщение.
+    """
+
+    def __init__(self, db: DataBase, ttl: float, max_items: int, negative_ttl: float = 5.0) -> None:
+        """
+        Инициализирует хранилище.
+
+        Args:
+            db (DataBase): База данных с таблицей chat_states
+            ttl (float): Сколько секунд состояние живет без новых сообщений
+            max_items (int): Сколько состояний держать в памяти
+            negative_ttl (float): Сколько секунд помнить, что у чата нет состояния
+        """
+        self.db: DataBase = db
+        self.ttl: float = ttl
+        self.max_items: int = max_items
+        self.negative_ttl: float = negative_ttl
+        # Число в кеше означает, что у чата нет состояния: до этого времени за ним не нужно ходить в базу
+        self._items: "OrderedDict[int, Union[ChatState, float]]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._writes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, chat_id: int) -> Optional[ChatState]:
+        """
+        Возвращает действующее состояние чата.
+
+        Args:
+            chat_id (int): ID чата
+
+        Returns:
+            Optional[ChatState]: Состояние или None, если бот ничего не ждет от чата
+        """
+        now: float = time.time()
+        with self._lock:
+            cached: Union[ChatState, float, None] = self._items.get(chat_id)
+            if isinstance(cached, ChatState):
+                self.hits += 1
+                self._items.move_to_end(chat_id)
+                return cached if cached.expires_at > now else None
+            if cached is not None and cached > now:
+                self.hits += 1
+                self._items.move_to_end(chat_id)
+                return None
+
+        row = self.db.select_chat_state(chat_id)
+        entry: Optional[ChatState] = None
+        if row:
+            state, game_id, data, expires_at = row
+            if expires_at > now:
+                entry = ChatState(State(state), game_id, data, expires_at)
+        with self._lock:
+            self.misses += 1
+            self._remember(chat_id, entry)
+        return entry
+
+    def set(self, chat_id: int, state: State, game_id: Optional[int] = None, data: Optional[str] = None) -> None:
+        """
+        Сохраняет состояние чата и продлевает его срок жизни.
+
+        Args:
+            chat_id (int): ID чата
+            state (State): Чего бот ждет от чата
+            game_id (Optional[int]): ID игры для состояния PLAYING
+            data (Optional[str]): Промежуточные данные диалога, например описание игры
+
+        Returns:
+            None
+        """
+        entry: ChatState = ChatState(state, game_id, data, time.time() + self.ttl)
+        self.db.save_chat_state(chat_id, state.value, game_id, data, entry.expires_at)
+        with self._lock:
+            self._remember(chat_id, entry)
+            self._writes += 1
+            # Просроченные строки удаляются из базы пачками, а не на каждой записи
+            evict: bool = self._writes % 1000 == 0
+        if evict:
+            self.evict_expired()
+
+    def keep(self, chat_id: int) -> None:
+        """
+        Продлевает текущее состояние чата, не меняя его.
+
+        Срок жизни переписывается в базе, только когда прошла половина ttl,
+        поэтому обычный ход в партии не добавляет лишнюю запись.
+
+        Args:
+            chat_id (int): ID чата
+
+        Returns:
+            None
+        """
+        entry: Optional[ChatState] = self.get(chat_id)
+        if entry is not None and entry.expires_at - time.time() < self.ttl / 2:
+            self.set(chat_id, entry.state, entry.game_id, entry.data)
+
+    def clear(self, chat_id: int) -> None:
+        """
+        Удаляет состояние чата: следующее сообщение обрабатывается как обычное.
+
+        Args:
+            chat_id (int): ID чата
+
+        Returns:
+            None
+        """
+        self.db.delete_chat_state(chat_id)
+        with self._lock:
+            self._remember(chat_id, None)
+
+    def evict_expired(self) -> None:
+        """
+        Удаляет просроченные состояния из базы и из памяти.
+
+        Returns:
+            None
+        """
+        now: float = time.time()
+        self.db.delete_expired_chat_states(now)
+        with self._lock:
+            for chat_id in [key for key, entry in self._items.items()
+                            if (entry.expires_at if isinstance(entry, ChatState) else entry) <= now]:
+                del self._items[chat_id]
+
+    def _remember(self, chat_id: int, entry: Optional[ChatState]) -> None:
+        """
+        Кладет состояние в память, вытесняя давно не использованные. Вызывается под блокировкой.
+
+        Args:
+            chat_id (int): ID чата
+            entry (Optional[ChatState]): Состояние или None, если у чата его нет
+
+        Returns:
+            None
+        """
+        self._items[chat_id] = entry if entry is not None else time.time() + self.negative_ttl
+        self._items.move_to_end(chat_id)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики хранилища.
+
+        Returns:
+            Dict[str, Any]: Количество действующих состояний в памяти, попадания и промахи кеша
+        """
+        now: float = time.time()
+        with self._lock:
+            return {
+                "active": sum(1 for entry in self._items.values() if isinstance(entry, ChatState) and entry.expires_at > now),
+                "items": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
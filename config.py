@@ -0,0 +1,124 @@
+import os
+from pathlib import Path
+from typing import List
+
+# Настройки читаются из переменных окружения, чтобы их можно было менять без правки кода
+
+# Токен бота от @BotFather
+BOT_TOKEN: str = os.environ.get("GIGACHESS_TOKEN", "")
+
+# Путь к исполняемому файлу Stockfish
+ENGINE_PATH: str = os.environ.get("GIGACHESS_ENGINE_PATH", str(Path("stockfish") / "stockfish-windows-x86-64-avx2.exe"))
+
+# Количество постоянно запущенных процессов движка
+ENGINE_POOL_SIZE: int = int(os.environ.get("GIGACHESS_ENGINE_POOL_SIZE", "2"))
+
+# Сколько секунд ждать свободный движок, прежде чем выдать ошибку
+ENGINE_CHECKOUT_TIMEOUT: float = float(os.environ.get("GIGACHESS_ENGINE_CHECKOUT_TIMEOUT", "30"))
+
+# Сколько секунд движок думает над ожидаемым ответом игрока после своего хода, 0 - не думать.
+# Пока движок думает, он закреплен за игрой, но отдается другим играм, если свободных нет
+PONDER_SECONDS: float = float(os.environ.get("GIGACHESS_PONDER_SECONDS", "0"))
+
+# Сколько секунд без ходов игра остается привязанной к своему движку, 0 - отдавать любой свободный
+ENGINE_AFFINITY_SECONDS: float = float(os.environ.get("GIGACHESS_ENGINE_AFFINITY_SECONDS", "600"))
+
+# Сколько чатов обрабатывается параллельно, 0 - стандартная обработка TeleBot
+DISPATCH_WORKERS: int = int(os.environ.get("GIGACHESS_DISPATCH_WORKERS", "8"))
+
+# Режим supervisor.py: сколько процессов бота запускать (чаты делятся между ними по chat.id),
+# сколько обновлений может ждать в очереди одного процесса и через сколько секунд после
+# запуска можно перезапустить упавший процесс. Лимиты движков и потоков (ENGINE_POOL_SIZE,
+# DISPATCH_*_WORKERS, RENDER_WORKERS) - общие и делятся между процессами, но каждому достается
+# хотя бы по одному: по умолчанию процессов столько же, сколько ядер, и у каждого свой движок
+SUPERVISOR_WORKERS: int = int(os.environ.get("GIGACHESS_SUPERVISOR_WORKERS", str(os.cpu_count() or 1)))
+SUPERVISOR_QUEUE_SIZE: int = int(os.environ.get("GIGACHESS_SUPERVISOR_QUEUE_SIZE", "1000"))
+SUPERVISOR_RESTART_DELAY: float = float(os.environ.get("GIGACHESS_SUPERVISOR_RESTART_DELAY", "1"))
+
+# Потоки для дешевых команд, которые не ждут поиска движка в общей очереди, 0 - общие потоки
+DISPATCH_PRIORITY_WORKERS: int = int(os.environ.get("GIGACHESS_DISPATCH_PRIORITY_WORKERS", "2"))
+
+# Допуск сообщений: сколько сообщений в секунду в среднем и сколько подряд можно одному
+# пользователю (0 - без ограничения), сколько сообщений может ждать в очередях чатов,
+# прежде чем бот начнет отвечать "сервер перегружен" (0 - без предела), и команды,
+# которые идут вне очереди
+ADMISSION_RATE: float = float(os.environ.get("GIGACHESS_ADMISSION_RATE", "2"))
+ADMISSION_BURST: int = int(os.environ.get("GIGACHESS_ADMISSION_BURST", "10"))
+ADMISSION_MAX_PENDING: int = int(os.environ.get("GIGACHESS_ADMISSION_MAX_PENDING", "64"))
+ADMISSION_CHEAP_COMMANDS: List[str] = os.environ.get(
+    "GIGACHESS_ADMISSION_CHEAP_COMMANDS", "start,help,create_profile,create_game,show_unfinished_games").split(",")
+# На сколько секунд можно отложить ход в идущей партии сверх лимита, вместо того чтобы
+# его отклонить (0 - не откладывать)
+ADMISSION_MAX_DEFER: float = float(os.environ.get("GIGACHESS_ADMISSION_MAX_DEFER", "5"))
+
+# Лимиты параллельности этапов обработки хода
+RENDER_WORKERS: int = int(os.environ.get("GIGACHESS_RENDER_WORKERS", str(os.cpu_count() or 1)))
+IO_WORKERS: int = int(os.environ.get("GIGACHESS_IO_WORKERS", "8"))
+
+# База данных SQLite и ее настройки
+DB_PATH: str = os.environ.get("GIGACHESS_DB_PATH", "GigaBase.db")
+DB_SYNCHRONOUS: str = os.environ.get("GIGACHESS_DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE: int = int(os.environ.get("GIGACHESS_DB_CACHE_SIZE", "-8000"))
+
+# Максимальный суммарный размер картинок доски в кеше рендера, байт
+RENDER_CACHE_BYTES: int = int(os.environ.get("GIGACHESS_RENDER_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# Сколько соответствий картинка -> Telegram file_id держать в памяти
+FILE_ID_CACHE_ITEMS: int = int(os.environ.get("GIGACHESS_FILE_ID_CACHE_ITEMS", "10000"))
+
+# Способ отрисовки доски: pillow - сборка из спрайтов, svg - chess.svg + svglib + reportlab
+RENDER_BACKEND: str = os.environ.get("GIGACHESS_RENDER_BACKEND", "pillow")
+
+# Дебютная книга Polyglot (необязательна) и размер кеша ходов движка
+BOOK_PATH: str = os.environ.get("GIGACHESS_BOOK_PATH", "book.bin")
+
+# Каталоги с эндшпильными таблицами Syzygy (через os.pathsep), пустая строка - без таблиц,
+# и наибольшее количество фигур в имеющихся таблицах
+SYZYGY_PATH: str = os.environ.get("GIGACHESS_SYZYGY_PATH", "")
+SYZYGY_PIECES: int = int(os.environ.get("GIGACHESS_SYZYGY_PIECES", "5"))
+MOVE_CACHE_ROWS: int = int(os.environ.get("GIGACHESS_MOVE_CACHE_ROWS", "200000"))
+
+# JSON-файл с уровнями сложности и настройками движка
+LEVELS_PATH: str = os.environ.get("GIGACHESS_LEVELS_PATH", "levels.json")
+
+# Сколько живых досок активных партий держать в памяти и через сколько секунд без ходов их вытеснять
+GAME_CACHE_ITEMS: int = int(os.environ.get("GIGACHESS_GAME_CACHE_ITEMS", "1000"))
+GAME_CACHE_IDLE: float = float(os.environ.get("GIGACHESS_GAME_CACHE_IDLE", "1800"))
+
+# Сколько игр показывать на одной странице /show_unfinished_games
+GAMES_PAGE_SIZE: int = int(os.environ.get("GIGACHESS_GAMES_PAGE_SIZE", "10"))
+
+# Порт локального HTTP-сервера с метриками в формате Prometheus (/metrics), 0 - не запускать
+METRICS_PORT: int = int(os.environ.get("GIGACHESS_METRICS_PORT", "0"))
+
+# Как часто писать сводку метрик в лог, секунды, 0 - не писать
+METRICS_LOG_INTERVAL: float = float(os.environ.get("GIGACHESS_METRICS_LOG_INTERVAL", "60"))
+
+# Сколько секунд бот помнит, чего ждет от чата, и сколько таких состояний держать в памяти
+CHAT_STATE_TTL: float = float(os.environ.get("GIGACHESS_CHAT_STATE_TTL", str(7 * 24 * 3600)))
+CHAT_STATE_CACHE_ITEMS: int = int(os.environ.get("GIGACHESS_CHAT_STATE_CACHE_ITEMS", "10000"))
+# Сколько секунд помнить, что у чата нет состояния. Кеш состояний не сверяется с базой,
+# поэтому сообщения одного чата должен обрабатывать один процесс (см. supervisor.py)
+CHAT_STATE_NEGATIVE_TTL: float = float(os.environ.get("GIGACHESS_CHAT_STATE_NEGATIVE_TTL", "5"))
+
+# Webhook: публичный адрес, который получает Telegram. Пустая строка - long polling
+WEBHOOK_URL: str = os.environ.get("GIGACHESS_WEBHOOK_URL", "")
+# Локальный адрес, порт и путь сервера webhook (перед ним обычно стоит reverse proxy с TLS)
+WEBHOOK_HOST: str = os.environ.get("GIGACHESS_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT: int = int(os.environ.get("GIGACHESS_WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH: str = os.environ.get("GIGACHESS_WEBHOOK_PATH", "/telegram")
+# Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET: str = os.environ.get("GIGACHESS_WEBHOOK_SECRET", "")
+# Емкость очереди принятых обновлений и количество потоков, которые ее разбирают
+WEBHOOK_QUEUE_SIZE: int = int(os.environ.get("GIGACHESS_WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS: int = int(os.environ.get("GIGACHESS_WEBHOOK_WORKERS", "4"))
+
+# Выгрузки PGN больше этого размера, байт, отправляются сжатыми в gzip
+EXPORT_GZIP_BYTES: int = int(os.environ.get("GIGACHESS_EXPORT_GZIP_BYTES", str(1024 * 1024)))
+
+# Пакетный анализ законченных игр (analysis.py): количество процессов Stockfish,
+# потоки и хеш каждого из них, глубина поиска на позицию
+ANALYSIS_WORKERS: int = int(os.environ.get("GIGACHESS_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+ANALYSIS_THREADS: int = int(os.environ.get("GIGACHESS_ANALYSIS_THREADS", "1"))
+ANALYSIS_HASH: int = int(os.environ.get("GIGACHESS_ANALYSIS_HASH", "64"))
+ANALYSIS_DEPTH: int = int(os.environ.get("GIGACHESS_ANALYSIS_DEPTH", "12"))
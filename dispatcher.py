@@ -0,0 +1,413 @@
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import telebot
+
+from admission import BUSY, BUSY_TEXT, LIMITED, LIMITED_TEXT, PRIORITY, Admission
+from metrics import STAGE_SECONDS, STAGE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Stage:
+    """
+    Этап обработки хода (поиск движка, рендер, запросы к Telegram) с собственным лимитом параллельности.
+
+    Пока один этап занят, потоки других чатов могут выполнять остальные этапы,
+    поэтому медленный поиск движка не задерживает отправку сообщений.
+    """
+
+    def __init__(self, name: str, limit: int) -> None:
+        """
+        Инициализирует этап.
+
+        Args:
+            name (str): Название этапа
+            limit (int): Сколько задач этапа может выполняться одновременно, 0 - без ограничения
+        """
+        self.name: str = name
+        self.limit: int = limit
+        self._slots: Optional[threading.BoundedSemaphore] = threading.BoundedSemaphore(limit) if limit > 0 else None
+        self._lock: threading.Lock = threading.Lock()
+        self.active: int = 0
+        self.waiting: int = 0
+        self.completed: int = 0
+        self.busy_time: float = 0.0
+
+    def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Выполняет функцию, дождавшись свободного места на этапе.
+
+        Args:
+            fn (Callable[..., T]): Выполняемая функция
+            *args (Any): Позиционные аргументы функции
+            **kwargs (Any): Именованные аргументы функции
+
+        Returns:
+            T: Результат функции
+        """
+        with self._lock:
+            self.waiting += 1
+        queued: float = time.perf_counter()
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+        start: float = time.perf_counter()
+        STAGE_WAIT_SECONDS.observe(start - queued, stage=self.name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            duration: float = time.perf_counter() - start
+            STAGE_SECONDS.observe(duration, stage=self.name)
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self.busy_time += duration
+            if self._slots is not None:
+                self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает загрузку этапа.
+
+        Returns:
+            Dict[str, Any]: Словарь с метриками этапа
+        """
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "active": self.active,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "busy_time": self.busy_time,
+            }
+
+
+class ChatDispatcher:
+    """
+    Выполняет задачи разных чатов параллельно, а задачи одного чата - строго по очереди.
+
+    Дешевые задачи (команды без движка и рендера) выполняются отдельными
+    потоками, поэтому не ждут, пока освободятся потоки, занятые поиском.
+    Порядок внутри чата сохраняется: дешевая задача чата, у которого уже есть
+    задачи в очереди, выполнится после них. Отложенная задача тоже занимает
+    место в очереди сразу, а до своего времени не держит ни одного потока.
+    """
+
+    def __init__(self, max_workers: int, priority_workers: int = 0) -> None:
+        """
+        Инициализирует диспетчер.
+
+        Args:
+            max_workers (int): Сколько чатов обрабатывается одновременно
+            priority_workers (int): Потоки для дешевых задач, 0 - общие потоки
+        """
+        self.max_workers: int = max_workers
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers, thread_name_prefix="chat")
+        self._priority: ThreadPoolExecutor = (ThreadPoolExecutor(priority_workers, thread_name_prefix="chat-priority")
+                                              if priority_workers > 0 else self._executor)
+        # Задача, дешевая ли она и не раньше какого времени (time.monotonic) ее выполнять
+        self._queues: Dict[int, Deque[Tuple[Callable[[], Any], bool, float]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._drained: threading.Condition = threading.Condition(self._lock)
+        self._pending: int = 0
+
+    def submit(self, chat_id: int, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """
+        Ставит задачу в очередь чата.
+
+        Args:
+            chat_id (int): ID чата, внутри которого сохраняется порядок
+            fn (Callable[..., Any]): Выполняемая функция
+            *args (Any): Позиционные аргументы функции
+            **kwargs (Any): Именованные аргументы функции
+
+        Returns:
+            None
+        """
+        self._submit(chat_id, functools.partial(fn, *args, **kwargs), False)
+
+    def submit_priority(self, chat_id: int, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """
+        Ставит дешевую задачу в очередь чата, она выполняется потоками вне общей очереди.
+
+        Args:
+            chat_id (int): ID чата, внутри которого сохраняется порядок
+            fn (Callable[..., Any]): Выполняемая функция
+            *args (Any): Позиционные аргументы функции
+            **kwargs (Any): Именованные аргументы функции
+
+        Returns:
+            None
+        """
+        self._submit(chat_id, functools.partial(fn, *args, **kwargs), True)
+
+    def submit_later(self, chat_id: int, delay: float, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """
+        Ставит задачу в очередь чата, но выполняет ее не раньше чем через delay секунд.
+
+        Args:
+            chat_id (int): ID чата, внутри которого сохраняется порядок
+            delay (float): Через сколько секунд можно выполнить задачу
+            fn (Callable[..., Any]): Выполняемая функция
+            *args (Any): Позиционные аргументы функции
+            **kwargs (Any): Именованные аргументы функции
+
+        Returns:
+            None
+        """
+        self._submit(chat_id, functools.partial(fn, *args, **kwargs), False, time.monotonic() + delay)
+
+    def _submit(self, chat_id: int, task: Callable[[], Any], priority: bool, not_before: float = 0.0) -> None:
+        """
+        Добавляет задачу в очередь чата и запускает чат, если он простаивал.
+
+        Args:
+            chat_id (int): ID чата
+            task (Callable[[], Any]): Задача без аргументов
+            priority (bool): Дешевая ли задача
+            not_before (float): Не раньше какого времени (time.monotonic) выполнять задачу
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._pending += 1
+            tasks = self._queues.get(chat_id)
+            if tasks is not None:
+                # Чат уже обрабатывается, задача выполнится после предыдущих
+                tasks.append((task, priority, not_before))
+                return
+            self._queues[chat_id] = deque([(task, priority, not_before)])
+            self._schedule(chat_id)
+
+    def _schedule(self, chat_id: int) -> None:
+        """
+        Запускает первую задачу чата сразу или по таймеру, если ее время еще не пришло.
+        Вызывается под блокировкой.
+
+        Args:
+            chat_id (int): ID чата
+
+        Returns:
+            None
+        """
+        _, priority, not_before = self._queues[chat_id][0]
+        delay: float = not_before - time.monotonic()
+        if delay > 0:
+            timer: threading.Timer = threading.Timer(delay, self._wake, (chat_id, priority))
+            timer.daemon = True
+            timer.start()
+        else:
+            (self._priority if priority else self._executor).submit(self._run_next, chat_id)
+
+    def _wake(self, chat_id: int, priority: bool) -> None:
+        """
+        Передает потокам чат, отложенная задача которого дождалась своего времени.
+
+        Args:
+            chat_id (int): ID чата
+            priority (bool): Дешевая ли задача
+
+        Returns:
+            None
+        """
+        try:
+            (self._priority if priority else self._executor).submit(self._run_next, chat_id)
+        except RuntimeError:
+            # Диспетчер уже остановлен без ожидания
+            pass
+
+    def _run_next(self, chat_id: int) -> None:
+        """
+        Выполняет очередную задачу чата и, если есть еще, ставит чат в конец общей очереди.
+
+        Args:
+            chat_id (int): ID чата
+
+        Returns:
+            None
+        """
+        with self._lock:
+            task, _, _ = self._queues[chat_id].popleft()
+            self._pending -= 1
+        try:
+            task()
+        except Exception:
+            logger.exception("Ошибка при обработке сообщения чата %s", chat_id)
+        with self._lock:
+            tasks = self._queues[chat_id]
+            if tasks:
+                # Не держим поток за одним чатом, чтобы остальные чаты не простаивали
+                self._schedule(chat_id)
+            else:
+                del self._queues[chat_id]
+                if not self._queues:
+                    self._drained.notify_all()
+
+    def pending(self) -> int:
+        """
+        Возвращает количество задач, ожидающих выполнения.
+
+        Returns:
+            int: Количество задач в очередях чатов
+        """
+        with self._lock:
+            return self._pending
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Останавливает потоки диспетчера.
+
+        Args:
+            wait (bool): Дождаться ли выполнения уже поставленных задач
+
+        Returns:
+            None
+        """
+        if wait:
+            with self._drained:
+                while self._queues:
+                    self._drained.wait()
+        self._executor.shutdown(wait=wait)
+        if self._priority is not self._executor:
+            self._priority.shutdown(wait=wait)
+
+
+class OrderedTeleBot(telebot.TeleBot):
+    """
+    TeleBot, который раздает входящие сообщения по ChatDispatcher.
+
+    Обработчики (включая next-step) выполняются синхронно внутри задачи чата,
+    поэтому ответы одному пользователю приходят в порядке его сообщений,
+    а разные пользователи обслуживаются параллельно. Если задан допуск,
+    сообщения сверх лимита пользователя или при переполненной очереди
+    отклоняются коротким ответом, а дешевые команды идут вне очереди.
+    Сообщения, для которых defer возвращает True, сверх лимита не
+    отклоняются, а откладываются в очереди чата.
+    """
+
+    def __init__(self, token: str, dispatcher: Optional[ChatDispatcher] = None,
+                 admission: Optional[Admission] = None,
+                 defer: Optional[Callable[[telebot.types.Message], bool]] = None, **kwargs: Any) -> None:
+        """
+        Инициализирует бота.
+
+        Args:
+            token (str): Токен бота
+            dispatcher (Optional[ChatDispatcher]): Диспетчер чатов, None - обычная обработка TeleBot
+            admission (Optional[Admission]): Допуск сообщений, None - принимать все
+            defer (Optional[Callable[[telebot.types.Message], bool]]): Можно ли отложить сообщение
+                сверх лимита вместо отказа, None - нельзя
+            **kwargs (Any): Параметры telebot.TeleBot
+        """
+        if dispatcher is not None:
+            kwargs["threaded"] = False
+        super().__init__(token, **kwargs)
+        self.dispatcher: Optional[ChatDispatcher] = dispatcher
+        self.admission: Optional[Admission] = admission
+        # Отложить сообщение можно только в очередь чата
+        self.defer: Optional[Callable[[telebot.types.Message], bool]] = defer if dispatcher is not None else None
+
+    def _admit(self, chat_id: int, user_id: int, cheap: bool, reject: Callable[[str], Any],
+               deferrable: bool = False) -> Optional[Tuple[bool, float]]:
+        """
+        Пропускает сообщение через допуск и отвечает пользователю, если оно отклонено.
+
+        Args:
+            chat_id (int): ID чата
+            user_id (int): Telegram ID отправителя
+            cheap (bool): Дешевое ли сообщение
+            reject (Callable[[str], Any]): Отправляет пользователю текст отказа
+            deferrable (bool): Можно ли отложить сообщение вместо отказа по лимиту
+
+        Returns:
+            Optional[Tuple[bool, float]]: None - сообщение отклонено, иначе идет ли оно вне очереди
+                и на сколько секунд его отложить
+        """
+        if self.admission is None:
+            return False, 0.0
+        pending: int = self.dispatcher.pending() if self.dispatcher is not None else 0
+        result, notify, delay = self.admission.admit(user_id, cheap, pending, deferrable)
+        if result not in (LIMITED, BUSY):
+            return result == PRIORITY, delay
+        if notify:
+            text: str = LIMITED_TEXT if result == LIMITED else BUSY_TEXT
+            if self.dispatcher is not None:
+                self.dispatcher.submit_priority(chat_id, reject, text)
+            else:
+                try:
+                    reject(text)
+                except Exception as E:
+                    logger.warning("Не удалось ответить на отклоненное сообщение чата %s: %s", chat_id, E)
+        return None
+
+    def process_new_messages(self, new_messages: List[telebot.types.Message]) -> None:
+        """
+        Передает каждое принятое сообщение в очередь его чата.
+
+        Args:
+            new_messages (List[telebot.types.Message]): Новые сообщения
+
+        Returns:
+            None
+        """
+        admitted: List[telebot.types.Message] = []
+        for message in new_messages:
+            chat_id: int = message.chat.id
+            user_id: int = message.from_user.id if message.from_user else chat_id
+            cheap: bool = self.admission is not None and self.admission.is_cheap(message.text)
+            deferrable: bool = self.admission is not None and self.defer is not None and not cheap and self.defer(message)
+            decision: Optional[Tuple[bool, float]] = self._admit(chat_id, user_id, cheap,
+                                                                functools.partial(self.send_message, chat_id),
+                                                                deferrable)
+            if decision is None:
+                continue
+            priority, delay = decision
+            if self.dispatcher is None:
+                admitted.append(message)
+            elif delay > 0:
+                self.dispatcher.submit_later(chat_id, delay, super().process_new_messages, [message])
+            else:
+                # Ставим сразу, чтобы допуск следующего сообщения пачки видел эту задачу в очереди
+                submit = self.dispatcher.submit_priority if priority else self.dispatcher.submit
+                submit(chat_id, super().process_new_messages, [message])
+        if admitted:
+            super().process_new_messages(admitted)
+
+    def process_new_callback_query(self, new_callback_queries: List[telebot.types.CallbackQuery]) -> None:
+        """
+        Передает нажатия inline-кнопок в очередь чата, как и сообщения.
+
+        Кнопки только листают списки, поэтому при допуске они идут вне очереди.
+
+        Args:
+            new_callback_queries (List[telebot.types.CallbackQuery]): Новые нажатия кнопок
+
+        Returns:
+            None
+        """
+        admitted: List[telebot.types.CallbackQuery] = []
+        for query in new_callback_queries:
+            chat_id: int = query.message.chat.id if query.message else query.from_user.id
+            decision: Optional[Tuple[bool, float]] = self._admit(chat_id, query.from_user.id, True,
+                                                                functools.partial(self.answer_callback_query, query.id))
+            if decision is None:
+                continue
+            priority, _ = decision
+            if self.dispatcher is None:
+                admitted.append(query)
+            else:
+                submit = self.dispatcher.submit_priority if priority else self.dispatcher.submit
+                submit(chat_id, super().process_new_callback_query, [query])
+        if admitted:
+            super().process_new_callback_query(admitted)
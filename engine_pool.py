@@ -0,0 +1,510 @@
+import bisect
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple, Union
+
+import chess
+
+if TYPE_CHECKING:
+    # chess.engine тянет за собой asyncio, поэтому загружается при запуске первого движка
+    import chess.engine
+
+from metrics import STAGE_SECONDS
+
+# Сколько точек на кольце консистентного хеширования приходится на один движок
+RING_POINTS: int = 64
+
+
+class EnginePool:
+    """
+    Ограниченный пул постоянно запущенных UCI-движков.
+
+    Движки запускаются один раз и переиспользуются между запросами, поэтому
+    запуск процесса, загрузка сети NNUE и выделение хеш-таблицы не повторяются
+    на каждом ходу. Упавшие движки отбрасываются и перезапускаются при
+    следующем запросе.
+
+    У каждого движка есть постоянное место (слот). Если включена привязка
+    игр (affinity_seconds > 0), ход игры ищется на том же движке, что и
+    прошлый, пока игра активна, а новая игра получает слот по кольцу
+    консистентного хеширования. В хеш-таблице движка остаются позиции из
+    прошлых поисков этой игры, и поиск начинается с "горячей" таблицы.
+    На другой движок игра уходит, только если ее движок занят. Движок,
+    который до этого искал ход другой игры, получает ucinewgame.
+    """
+
+    def __init__(self, command: Union[str, List[str]], size: int,
+                 options: Optional[Dict[str, Any]] = None, timeout: float = 30.0,
+                 ponder_seconds: float = 0.0, affinity_seconds: float = 0.0) -> None:
+        """
+        Инициализирует пул. Процессы движков запускаются лениво или через warm_up().
+
+        Args:
+            command (Union[str, List[str]]): Команда запуска движка
+            size (int): Максимальное количество процессов движка
+            options (Optional[Dict[str, Any]]): UCI-опции, выставляемые при запуске движка
+            timeout (float): Сколько секунд ждать свободный движок
+            ponder_seconds (float): Сколько секунд движок может думать над ожидаемым ответом игрока, 0 - не думать
+            affinity_seconds (float): Сколько секунд без ходов игра остается привязанной к движку, 0 - не привязывать
+        """
+        self.command: Union[str, List[str]] = command
+        self.size: int = max(1, size)
+        self.options: Dict[str, Any] = options or {}
+        self.timeout: float = timeout
+        self.ponder_seconds: float = ponder_seconds
+        self.affinity_seconds: float = affinity_seconds
+
+        self._lock: threading.Lock = threading.Lock()
+        self._cond: threading.Condition = threading.Condition(self._lock)
+        # Слоты движков: процесс (None - не запущен) и флаг занятости. Слот без
+        # процесса, но занятый - процесс для него сейчас запускается
+        self._engines: List[Optional[chess.engine.SimpleEngine]] = [None] * self.size
+        self._busy: List[bool] = [False] * self.size
+        self._released: List[float] = [0.0] * self.size
+        self._slots: Dict[chess.engine.SimpleEngine, int] = {}
+        self._waiting: int = 0
+        self._closed: bool = False
+        # Кольцо консистентного хеширования: (точка, слот), по возрастанию точки
+        self._ring: List[Tuple[int, int]] = sorted(
+            (zlib.crc32(f"{slot}:{point}".encode()), slot) for slot in range(self.size) for point in range(RING_POINTS)
+        )
+        # Привязки игр к слотам: игра -> (слот, время последнего хода), от давних к свежим
+        self._affinity: "OrderedDict[object, Tuple[int, float]]" = OrderedDict()
+        # Движки, которые после хода думают над ожидаемым ответом игрока:
+        # игра -> (движок, ожидаемая история ходов, время начала), в порядке начала
+        self._pondering: "OrderedDict[object, Tuple[chess.engine.SimpleEngine, List[chess.Move], float]]" = OrderedDict()
+        self._reaper: Optional[threading.Thread] = None
+
+        self.checkouts: int = 0
+        self.spawns: int = 0
+        self.restarts: int = 0
+        self.wait_total: float = 0.0
+        self.wait_max: float = 0.0
+        self.affinity_hits: int = 0
+        self.spills: int = 0
+        self.ponder_hits: int = 0
+        self.ponder_misses: int = 0
+        self.ponder_expired: int = 0
+        self.ponder_reclaimed: int = 0
+
+    def _spawn(self) -> "chess.engine.SimpleEngine":
+        """
+        Запускает новый процесс движка и применяет к нему опции пула.
+
+        Returns:
+            chess.engine.SimpleEngine: Запущенный движок
+        """
+        import chess.engine
+
+        engine = chess.engine.SimpleEngine.popen_uci(self.command)
+        if self.options:
+            try:
+                engine.configure(self.options)
+            except Exception:
+                engine.close()
+                raise
+        with self._lock:
+            self.spawns += 1
+        return engine
+
+    def _fill(self, slot: int) -> "chess.engine.SimpleEngine":
+        """
+        Запускает процесс для занятого вызывающим пустого слота.
+
+        Args:
+            slot (int): Слот
+
+        Returns:
+            chess.engine.SimpleEngine: Запущенный движок
+        """
+        try:
+            engine = self._spawn()
+        except Exception:
+            with self._cond:
+                self._busy[slot] = False
+                self._cond.notify_all()
+            raise
+        with self._lock:
+            self._engines[slot] = engine
+            self._slots[engine] = slot
+        return engine
+
+    def warm_up(self) -> None:
+        """
+        Заранее запускает все процессы пула, чтобы первые ходы не ждали запуска.
+
+        Returns:
+            None
+        """
+        for slot in range(self.size):
+            with self._lock:
+                if self._engines[slot] is not None or self._busy[slot]:
+                    continue
+                self._busy[slot] = True
+            self._release(self._fill(slot))
+
+    def _home(self, game: object) -> int:
+        """
+        Находит слот игры на кольце консистентного хеширования.
+
+        Args:
+            game (object): Идентификатор партии
+
+        Returns:
+            int: Слот
+        """
+        index: int = bisect.bisect(self._ring, (zlib.crc32(str(game).encode()), self.size))
+        return self._ring[index % len(self._ring)][1]
+
+    def _touch(self, game: object, slot: int) -> None:
+        """
+        Привязывает игру к слоту и продлевает привязку. Вызывается под блокировкой.
+
+        Args:
+            game (object): Идентификатор партии
+            slot (int): Слот, на котором игра искала ход
+
+        Returns:
+            None
+        """
+        self._affinity[game] = (slot, time.monotonic())
+        self._affinity.move_to_end(game)
+
+    def _choose(self, game: Optional[object]) -> Optional[int]:
+        """
+        Выбирает свободный слот для игры. Вызывается под блокировкой.
+
+        Сначала слот, к которому привязана игра, затем свободный слот с
+        запущенным движком (недавно работавший - "теплее"), затем пустой слот.
+
+        Args:
+            game (Optional[object]): Идентификатор партии или None
+
+        Returns:
+            Optional[int]: Слот или None, если все слоты заняты
+        """
+        preferred: Optional[int] = None
+        if game is not None and self.affinity_seconds > 0:
+            # Давно не ходившие игры отвязываются от движков
+            deadline: float = time.monotonic() - self.affinity_seconds
+            while self._affinity and next(iter(self._affinity.values()))[1] < deadline:
+                self._affinity.popitem(last=False)
+            entry: Optional[Tuple[int, float]] = self._affinity.get(game)
+            preferred = entry[0] if entry is not None else self._home(game)
+            if not self._busy[preferred]:
+                self.affinity_hits += 1
+                return preferred
+
+        idle: List[int] = [slot for slot in range(self.size) if not self._busy[slot] and self._engines[slot] is not None]
+        if idle:
+            slot: int = max(idle, key=lambda index: self._released[index])
+        else:
+            empty: List[int] = [slot for slot in range(self.size) if not self._busy[slot]]
+            if not empty:
+                return None
+            slot = empty[0]
+        if preferred is not None:
+            self.spills += 1
+        return slot
+
+    def _acquire(self, game: Optional[object] = None) -> "chess.engine.SimpleEngine":
+        """
+        Забирает свободный движок, при необходимости запуская новый или ожидая освобождения.
+
+        Args:
+            game (Optional[object]): Идентификатор партии, для которой нужен движок
+
+        Returns:
+            chess.engine.SimpleEngine: Движок, закрепленный за вызывающим
+
+        Raises:
+            TimeoutError: Если свободный движок не появился за timeout секунд
+        """
+        start: float = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Пул движков закрыт")
+                slot: Optional[int] = self._choose(game)
+                if slot is not None:
+                    break
+                if self._pondering:
+                    # Свободных движков нет: забираем тот, что дольше всех думает над чужой игрой
+                    slot = self._slots[self._pondering.popitem(last=False)[1][0]]
+                    self.ponder_reclaimed += 1
+                    break
+                remaining: float = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Нет свободного движка")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._busy[slot] = True
+            if game is not None and self.affinity_seconds > 0:
+                self._touch(game, slot)
+            engine: Optional[chess.engine.SimpleEngine] = self._engines[slot]
+            waited: float = time.monotonic() - start
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+        if engine is None:
+            engine = self._fill(slot)
+        return engine
+
+    def _release(self, engine: "chess.engine.SimpleEngine") -> None:
+        """
+        Возвращает исправный движок в пул.
+
+        Args:
+            engine (chess.engine.SimpleEngine): Возвращаемый движок
+
+        Returns:
+            None
+        """
+        if self._closed:
+            self._discard(engine)
+            return
+        with self._cond:
+            slot: int = self._slots[engine]
+            self._busy[slot] = False
+            self._released[slot] = time.monotonic()
+            self._cond.notify_all()
+
+    def _discard(self, engine: "chess.engine.SimpleEngine") -> None:
+        """
+        Убирает сломанный движок из пула, освобождая место для перезапуска.
+
+        Args:
+            engine (chess.engine.SimpleEngine): Отбрасываемый движок
+
+        Returns:
+            None
+        """
+        try:
+            engine.close()
+        except Exception as E:
+            print(E)
+        with self._cond:
+            slot: Optional[int] = self._slots.pop(engine, None)
+            if slot is not None:
+                self._engines[slot] = None
+                self._busy[slot] = False
+            if not self._closed:
+                self.restarts += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def engine(self, game: Optional[object] = None) -> Iterator["chess.engine.SimpleEngine"]:
+        """
+        Выдает движок в монопольное пользование на время блока with.
+
+        Если движок упал или перестал отвечать, он не возвращается в пул,
+        а следующий запрос запустит вместо него новый процесс.
+
+        Args:
+            game (Optional[object]): Идентификатор партии, для которой нужен движок
+
+        Yields:
+            chess.engine.SimpleEngine: Движок из пула
+        """
+        engine = self._acquire(game)
+        try:
+            yield engine
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError, TimeoutError):
+            self._discard(engine)
+            raise
+        except BaseException:
+            self._release(engine)
+            raise
+        else:
+            self._release(engine)
+
+    def play(self, board: chess.Board, limit: "chess.engine.Limit", game: Optional[object] = None,
+             **kwargs: Any) -> "chess.engine.PlayResult":
+        """
+        Ищет ход на свободном движке пула.
+
+        Если движок до этого искал ход другой игры, python-chess сам
+        отправляет ему ucinewgame, поэтому партии разных игроков не делят
+        хеш-таблицу и историю поиска. Без game сброса между запросами нет.
+        Если движок упал во время поиска, запрос один раз повторяется на
+        перезапущенном движке.
+
+        Если включено обдумывание (ponder_seconds > 0), после хода движок
+        продолжает думать над ожидаемым ответом игрока и остается закрепленным
+        за игрой. Если игрок сделал этот ход, движок получает ponderhit и
+        отвечает почти сразу.
+
+        Args:
+            board (chess.Board): Позиция для поиска
+            limit (chess.engine.Limit): Ограничение поиска
+            game (Optional[object]): Идентификатор партии
+            **kwargs (Any): Дополнительные параметры chess.engine.SimpleEngine.play
+
+        Returns:
+            chess.engine.PlayResult: Результат поиска
+        """
+        import chess.engine
+
+        with STAGE_SECONDS.time(stage="search"):
+            if self.ponder_seconds > 0 and game is not None:
+                try:
+                    return self._play_pondering(board, limit, game, **kwargs)
+                except chess.engine.EngineTerminatedError:
+                    return self._play_pondering(board, limit, game, **kwargs)
+            try:
+                with self.engine(game) as engine:
+                    return engine.play(board, limit, game=game, **kwargs)
+            except chess.engine.EngineTerminatedError:
+                with self.engine(game) as engine:
+                    return engine.play(board, limit, game=game, **kwargs)
+
+    def _play_pondering(self, board: chess.Board, limit: "chess.engine.Limit", game: object,
+                        **kwargs: Any) -> "chess.engine.PlayResult":
+        """
+        Ищет ход на движке, который уже думает над этой игрой, или на свободном, и оставляет его думать дальше.
+
+        Args:
+            board (chess.Board): Позиция для поиска
+            limit (chess.engine.Limit): Ограничение поиска
+            game (object): Идентификатор партии
+            **kwargs (Any): Дополнительные параметры chess.engine.SimpleEngine.play
+
+        Returns:
+            chess.engine.PlayResult: Результат поиска
+        """
+        engine: Optional[chess.engine.SimpleEngine] = self._take_pondering(game, board)
+        if engine is None:
+            engine = self._acquire(game)
+        try:
+            # python-chess сам отправит ponderhit, если позиция совпала с ожидаемой, иначе stop
+            result: chess.engine.PlayResult = engine.play(board, limit, game=game, ponder=True, **kwargs)
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError, TimeoutError):
+            self._discard(engine)
+            raise
+        except BaseException:
+            self._release(engine)
+            raise
+
+        if result.move is None or result.ponder is None:
+            self._release(engine)
+            return result
+        with self._lock:
+            # Если движок уже кто-то ждет, думать над этой игрой некогда
+            park: bool = not self._closed and self._waiting == 0
+            if park:
+                expected: List[chess.Move] = board.move_stack + [result.move, result.ponder]
+                self._pondering[game] = (engine, expected, time.monotonic())
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._reap, name="engine-ponder-reaper", daemon=True)
+                    self._reaper.start()
+        if not park:
+            self._release(engine)
+        return result
+
+    def _take_pondering(self, game: object, board: chess.Board) -> Optional["chess.engine.SimpleEngine"]:
+        """
+        Забирает движок, который думает над этой игрой.
+
+        Args:
+            game (object): Идентификатор партии
+            board (chess.Board): Позиция, в которой движку предстоит искать ход
+
+        Returns:
+            Optional[chess.engine.SimpleEngine]: Движок или None, если над игрой никто не думает
+        """
+        with self._lock:
+            entry = self._pondering.pop(game, None)
+            if entry is None:
+                return None
+            engine, expected, _ = entry
+            if board.move_stack == expected:
+                self.ponder_hits += 1
+            else:
+                self.ponder_misses += 1
+            if self.affinity_seconds > 0:
+                self._touch(game, self._slots[engine])
+            self.checkouts += 1
+        return engine
+
+    def _reap(self) -> None:
+        """
+        Останавливает обдумывание в играх, где игрок не ходит дольше ponder_seconds, и возвращает движки в пул.
+
+        Returns:
+            None
+        """
+        while not self._closed:
+            time.sleep(min(1.0, self.ponder_seconds / 2))
+            deadline: float = time.monotonic() - self.ponder_seconds
+            expired: List[chess.engine.SimpleEngine] = []
+            with self._lock:
+                while self._pondering:
+                    game, (engine, _, started) = next(iter(self._pondering.items()))
+                    if started > deadline:
+                        break
+                    del self._pondering[game]
+                    expired.append(engine)
+                self.ponder_expired += len(expired)
+            for engine in expired:
+                try:
+                    # Любая команда прерывает обдумывание: python-chess отправит stop
+                    engine.ping()
+                except Exception as E:
+                    print(E)
+                    self._discard(engine)
+                else:
+                    self._release(engine)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики пула: размер, глубину очереди и время ожидания движка.
+
+        Returns:
+            Dict[str, Any]: Словарь с метриками пула
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "spawned": sum(1 for slot in range(self.size) if self._engines[slot] is not None or self._busy[slot]),
+                "idle": sum(1 for slot in range(self.size) if self._engines[slot] is not None and not self._busy[slot]),
+                "waiting": self._waiting,
+                "pondering": len(self._pondering),
+                "affinities": len(self._affinity),
+                "checkouts": self.checkouts,
+                "spawns": self.spawns,
+                "restarts": self.restarts,
+                "wait_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+                "wait_max": self.wait_max,
+                "affinity_hits": self.affinity_hits,
+                "spills": self.spills,
+                "ponder_hits": self.ponder_hits,
+                "ponder_misses": self.ponder_misses,
+                "ponder_expired": self.ponder_expired,
+                "ponder_reclaimed": self.ponder_reclaimed,
+            }
+
+    def close(self) -> None:
+        """
+        Останавливает все свободные движки и запрещает выдачу новых.
+
+        Returns:
+            None
+        """
+        with self._cond:
+            self._closed = True
+            pondering: List[chess.engine.SimpleEngine] = [entry[0] for entry in self._pondering.values()]
+            self._pondering.clear()
+            idle: List[chess.engine.SimpleEngine] = [
+                engine for slot, engine in enumerate(self._engines) if engine is not None and not self._busy[slot]
+            ]
+            self._cond.notify_all()
+        for engine in pondering + idle:
+            self._discard(engine)
@@ -0,0 +1,165 @@
+import argparse
+import gzip
+import itertools
+import shutil
+import sys
+import tempfile
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+import chess
+import chess.pgn
+
+from DataBase import DataBase
+
+# Выгрузка игр игрока в PGN. Игры читаются из базы курсором и пишутся по одной,
+# поэтому память не зависит от количества игр.
+#
+#   python export.py --tg-id 123456789 -o games.pgn.gz
+
+
+def build_game(game_rows: Iterable[Tuple], player_name: str) -> Optional[chess.pgn.Game]:
+    """
+    Собирает PGN-партию из строк одной игры.
+
+    Args:
+        game_rows (Iterable[Tuple]): Строки iter_player_games одной игры
+        player_name (str): Имя игрока, он всегда играет белыми
+
+    Returns:
+        Optional[chess.pgn.Game]: Партия или None, если позицию игры не удалось разобрать
+    """
+    rows = iter(game_rows)
+    game_id, status, description, level, fen, origin, uci = next(rows)
+    try:
+        board: chess.Board = chess.Board(origin or fen)
+    except ValueError as E:
+        print(f"Игра {game_id}: {E}")
+        return None
+
+    game: chess.pgn.Game = chess.pgn.Game()
+    game.setup(board)
+    game.headers["Event"] = description or "GigaChess"
+    game.headers["Site"] = "GigaChess"
+    game.headers["Round"] = str(game_id)
+    game.headers["White"] = player_name
+    game.headers["Black"] = f"GigaChess ({level})"
+
+    node: chess.pgn.GameNode = game
+    for uci in itertools.chain([uci], (row[6] for row in rows)):
+        if uci is None:
+            continue
+        move: chess.Move = chess.Move.from_uci(uci)
+        if not board.is_legal(move):
+            print(f"Игра {game_id}: журнал ходов поврежден на ходе {uci}")
+            break
+        board.push(move)
+        node = node.add_main_variation(move)
+
+    outcome: Optional[chess.Outcome] = board.outcome() if status == "over" else None
+    game.headers["Result"] = outcome.result() if outcome is not None else "*"
+    return game
+
+
+def iter_pgn(db: DataBase, player_id: int, player_name: str) -> Iterator[str]:
+    """
+    Выдает игры игрока в формате PGN по одной.
+
+    Args:
+        db (DataBase): База данных
+        player_id (int): ID игрока
+        player_name (str): Имя игрока
+
+    Yields:
+        str: PGN одной партии с пустой строкой в конце
+    """
+    for _, game_rows in itertools.groupby(db.iter_player_games(player_id), key=lambda row: row[0]):
+        game: Optional[chess.pgn.Game] = build_game(game_rows, player_name)
+        if game is not None:
+            yield game.accept(chess.pgn.StringExporter()) + "\n\n"
+
+
+def write_pgn(chunks: Iterable[str], out: IO[bytes]) -> int:
+    """
+    Записывает партии в двоичный поток.
+
+    Args:
+        chunks (Iterable[str]): Партии в формате PGN
+        out (IO[bytes]): Поток для записи
+
+    Returns:
+        int: Количество записанных партий
+    """
+    count: int = 0
+    for chunk in chunks:
+        out.write(chunk.encode("utf-8"))
+        count += 1
+    return count
+
+
+def export_file(db: DataBase, player_id: int, player_name: str, gzip_bytes: int) -> Tuple[IO[bytes], str, int]:
+    """
+    Выгружает игры игрока во временный файл для отправки документом.
+
+    PGN пишется на диск, а не в память. Если файл больше gzip_bytes,
+    он пережимается в gzip.
+
+    Args:
+        db (DataBase): База данных
+        player_id (int): ID игрока
+        player_name (str): Имя игрока
+        gzip_bytes (int): Начиная с какого размера сжимать выгрузку
+
+    Returns:
+        Tuple[IO[bytes], str, int]: Открытый файл в начале, имя файла для пользователя и количество партий
+    """
+    plain: IO[bytes] = tempfile.TemporaryFile()
+    count: int = write_pgn(iter_pgn(db, player_id, player_name), plain)
+    name: str = f"gigachess_{player_name}.pgn"
+    if plain.tell() <= gzip_bytes:
+        plain.seek(0)
+        return plain, name, count
+
+    packed: IO[bytes] = tempfile.TemporaryFile()
+    plain.seek(0)
+    with gzip.GzipFile(filename=name, mode="wb", fileobj=packed) as archive:
+        shutil.copyfileobj(plain, archive)
+    plain.close()
+    packed.seek(0)
+    return packed, name + ".gz", count
+
+
+def main() -> None:
+    """
+    Выгружает игры игрока в файл или в stdout.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Выгрузка игр игрока GigaChess в PGN")
+    parser.add_argument("--db", default="GigaBase.db")
+    parser.add_argument("--tg-id", type=int, required=True, help="Telegram ID игрока")
+    parser.add_argument("-o", "--output", default="-", help="Файл .pgn или .pgn.gz, по умолчанию stdout")
+    args = parser.parse_args()
+
+    db: DataBase = DataBase(args.db)
+    # Журнал ходов и начальные позиции живут в таблицах, которых может не быть в старой базе
+    db.migrate()
+    profile = db.select_profile(args.tg_id)
+    if not profile:
+        sys.exit(f"Профиль с Telegram ID {args.tg_id} не найден")
+    player_id, player_name = profile
+
+    chunks: Iterator[str] = iter_pgn(db, player_id, player_name)
+    if args.output == "-":
+        count: int = write_pgn(chunks, sys.stdout.buffer)
+    elif args.output.endswith(".gz"):
+        with gzip.open(args.output, "wb") as out:
+            count = write_pgn(chunks, out)
+    else:
+        with open(args.output, "wb") as out:
+            count = write_pgn(chunks, out)
+    print(f"Выгружено партий: {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import io
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import chess
+from PIL import Image
+
+# Спрайты из assets нарисованы make_sprites.py в 4 раза крупнее доски chess.svg по умолчанию
+ASSETS: Path = Path(__file__).resolve().parent / "assets"
+MASTER_SCALE: int = 4
+PIECE_ORDER: str = "PNBRQKpnbrqk"
+
+# Размеры доски chess.svg.board по умолчанию: клетка 45 px, рамка с координатами 17 px
+SQUARE_SIZE: int = 45
+BOARD_OFFSET: int = 17
+DEFAULT_SIZE: int = 8 * SQUARE_SIZE + 2 * BOARD_OFFSET
+
+# Цвета клеток как в chess.svg.DEFAULT_COLORS
+COLORS: Dict[Tuple[bool, bool], Tuple[int, int, int]] = {
+    (True, False): (0xff, 0xce, 0x9e),   # светлая
+    (False, False): (0xd1, 0x8b, 0x47),  # темная
+    (True, True): (0xcd, 0xd1, 0x6a),    # светлая, последний ход
+    (False, True): (0xaa, 0xa2, 0x3b),   # темная, последний ход
+}
+
+# Ключ клетки: (символ фигуры или None, светлая ли клетка, подсвечен ли ход, шах)
+TileKey = Tuple[Optional[str], bool, bool, bool]
+
+
+class SpriteRenderer:
+    """
+    Рисует доску одного размера, собирая ее из готовых спрайтов средствами Pillow.
+
+    Рамка с координатами и клетки с фигурами готовятся заранее, поэтому
+    отрисовка позиции - это копия рамки и 64 вставки готовых клеток.
+    """
+
+    def __init__(self, size: int = DEFAULT_SIZE) -> None:
+        """
+        Загружает спрайты и масштабирует их под размер доски.
+
+        Args:
+            size (int): Размер изображения в пикселях
+        """
+        self.size: int = size
+        self.square: int = round(SQUARE_SIZE * size / DEFAULT_SIZE)
+        self.offset: int = (size - 8 * self.square) // 2
+        master_square: int = SQUARE_SIZE * MASTER_SCALE
+
+        self.frames: Dict[bool, Image.Image] = {}
+        for name, orientation in (("white", chess.WHITE), ("black", chess.BLACK)):
+            with Image.open(ASSETS / f"frame_{name}.png") as frame:
+                self.frames[orientation] = frame.convert("RGB").resize((size, size), Image.LANCZOS)
+
+        self.pieces: Dict[str, Image.Image] = {}
+        with Image.open(ASSETS / "pieces.png") as sheet:
+            sheet = sheet.convert("RGBA")
+            for index, symbol in enumerate(PIECE_ORDER):
+                sprite = sheet.crop((index * master_square, 0, (index + 1) * master_square, master_square))
+                self.pieces[symbol] = sprite.resize((self.square, self.square), Image.LANCZOS)
+
+        with Image.open(ASSETS / "check.png") as check:
+            self.check: Image.Image = check.convert("RGBA").resize((self.square, self.square), Image.LANCZOS)
+
+        self._tiles: Dict[TileKey, Image.Image] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def tile(self, key: TileKey) -> Image.Image:
+        """
+        Возвращает готовую клетку: фон, подсветку шаха и фигуру.
+
+        Args:
+            key (TileKey): Ключ клетки
+
+        Returns:
+            Image.Image: RGB-изображение клетки
+        """
+        tile: Optional[Image.Image] = self._tiles.get(key)
+        if tile is None:
+            symbol, light, highlighted, check = key
+            tile = Image.new("RGBA", (self.square, self.square), COLORS[(light, highlighted)])
+            if check:
+                tile.alpha_composite(self.check)
+            if symbol is not None:
+                tile.alpha_composite(self.pieces[symbol])
+            tile = tile.convert("RGB")
+            with self._lock:
+                self._tiles[key] = tile
+        return tile
+
+    def square_box(self, square: chess.Square, orientation: bool) -> Tuple[int, int]:
+        """
+        Возвращает координаты левого верхнего угла клетки на изображении.
+
+        Args:
+            square (chess.Square): Клетка доски
+            orientation (bool): Сторона, которая находится снизу
+
+        Returns:
+            Tuple[int, int]: Координаты x и y
+        """
+        file_index: int = chess.square_file(square)
+        rank_index: int = chess.square_rank(square)
+        x: int = (file_index if orientation else 7 - file_index) * self.square + self.offset
+        y: int = (7 - rank_index if orientation else rank_index) * self.square + self.offset
+        return x, y
+
+    def draw(self, board: chess.BaseBoard, lastmove: Optional[chess.Move] = None,
+             orientation: bool = chess.WHITE, check: Optional[chess.Square] = None) -> Image.Image:
+        """
+        Рисует позицию.
+
+        Args:
+            board (chess.BaseBoard): Шахматная доска
+            lastmove (Optional[chess.Move]): Последний ход для подсветки
+            orientation (bool): Сторона, которая находится снизу
+            check (Optional[chess.Square]): Клетка короля под шахом
+
+        Returns:
+            Image.Image: RGB-изображение доски
+        """
+        image: Image.Image = self.frames[orientation].copy()
+        highlighted = (lastmove.from_square, lastmove.to_square) if lastmove else ()
+        for square in chess.SQUARES:
+            image.paste(self.tile(self.tile_key(board, square, highlighted, check)), self.square_box(square, orientation))
+        return image
+
+    @staticmethod
+    def tile_key(board: chess.BaseBoard, square: chess.Square, highlighted: Tuple[chess.Square, ...],
+                 check: Optional[chess.Square]) -> TileKey:
+        """
+        Строит ключ клетки для позиции.
+
+        Args:
+            board (chess.BaseBoard): Шахматная доска
+            square (chess.Square): Клетка доски
+            highlighted (Tuple[chess.Square, ...]): Клетки последнего хода
+            check (Optional[chess.Square]): Клетка короля под шахом
+
+        Returns:
+            TileKey: Ключ клетки
+        """
+        piece: Optional[chess.Piece] = board.piece_at(square)
+        return (
+            piece.symbol() if piece else None,
+            bool(chess.BB_LIGHT_SQUARES & chess.BB_SQUARES[square]),
+            square in highlighted,
+            square == check,
+        )
+
+    def render(self, board: chess.BaseBoard, lastmove: Optional[chess.Move] = None,
+               orientation: bool = chess.WHITE, check: Optional[chess.Square] = None) -> bytes:
+        """
+        Рисует позицию и кодирует ее в PNG.
+
+        Args:
+            board (chess.BaseBoard): Шахматная доска
+            lastmove (Optional[chess.Move]): Последний ход для подсветки
+            orientation (bool): Сторона, которая находится снизу
+            check (Optional[chess.Square]): Клетка короля под шахом
+
+        Returns:
+            bytes: PNG-изображение
+        """
+        buffer: io.BytesIO = io.BytesIO()
+        self.draw(board, lastmove, orientation, check).save(buffer, format="PNG", compress_level=3)
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def get_renderer(size: int = DEFAULT_SIZE) -> SpriteRenderer:
+    """
+    Возвращает общий рендерер для размера, загружая спрайты при первом обращении.
+
+    Args:
+        size (int): Размер изображения в пикселях
+
+    Returns:
+        SpriteRenderer: Рендерер доски
+    """
+    return SpriteRenderer(size)
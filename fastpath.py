@@ -0,0 +1,167 @@
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import chess
+import chess.syzygy
+
+# Короткие пути, по которым ход находится без движка
+SHORTCUTS: Tuple[str, ...] = ("single", "mate", "syzygy")
+
+
+class FastPath:
+    """
+    Ходы, для которых не нужен поиск движка: единственный легальный ход,
+    мат в один ход и позиции из эндшпильных таблиц Syzygy.
+
+    Таблицы необязательны: если путь не задан или файлов нет, проверяются
+    только первые два случая. Для каждого короткого пути считается, сколько
+    раз он сработал, то есть сколько поисков движка сэкономлено.
+    """
+
+    def __init__(self, syzygy_path: str = "", syzygy_pieces: int = 5) -> None:
+        """
+        Инициализирует короткие пути. Таблицы открываются при первом обращении.
+
+        Args:
+            syzygy_path (str): Каталоги с таблицами Syzygy через os.pathsep, пустая строка - без таблиц
+            syzygy_pieces (int): Наибольшее количество фигур (с королями) в имеющихся таблицах
+        """
+        self.syzygy_path: str = syzygy_path
+        self.syzygy_pieces: int = syzygy_pieces
+        self._tablebase: Optional[chess.syzygy.Tablebase] = None
+        self._opened: bool = False
+        self._lock: threading.Lock = threading.Lock()
+        self.counters: Dict[str, int] = {name: 0 for name in SHORTCUTS}
+
+    def _tables(self) -> Optional[chess.syzygy.Tablebase]:
+        """
+        Открывает таблицы при первом обращении.
+
+        Returns:
+            Optional[chess.syzygy.Tablebase]: Таблицы или None, если их нет
+        """
+        with self._lock:
+            if not self._opened:
+                self._opened = True
+                directories: List[str] = [path for path in self.syzygy_path.split(os.pathsep) if os.path.isdir(path)]
+                if directories:
+                    tablebase: chess.syzygy.Tablebase = chess.syzygy.Tablebase()
+                    for directory in directories:
+                        tablebase.add_directory(directory)
+                    self._tablebase = tablebase
+            return self._tablebase
+
+    def move(self, board: chess.Board, shortcuts: Optional[Iterable[str]] = None) -> Optional[chess.Move]:
+        """
+        Ищет ход без движка.
+
+        Args:
+            board (chess.Board): Позиция, в которой ходит бот
+            shortcuts (Optional[Iterable[str]]): Разрешенные короткие пути (см. SHORTCUTS), None - все
+
+        Returns:
+            Optional[chess.Move]: Ход или None, если нужен поиск движка
+        """
+        shortcuts = set(SHORTCUTS if shortcuts is None else shortcuts)
+        moves: List[chess.Move] = list(board.legal_moves)
+        if not moves:
+            return None
+
+        found: Optional[Tuple[chess.Move, str]] = None
+        if len(moves) == 1 and "single" in shortcuts:
+            found = moves[0], "single"
+        if found is None and "mate" in shortcuts:
+            mate: Optional[chess.Move] = self.mate_in_one(board, moves)
+            if mate is not None:
+                found = mate, "mate"
+        if (found is None and "syzygy" in shortcuts and self.syzygy_path
+                and chess.popcount(board.occupied) <= self.syzygy_pieces):
+            best: Optional[chess.Move] = self.tablebase_move(board, moves)
+            if best is not None:
+                found = best, "syzygy"
+
+        if found is None:
+            return None
+        with self._lock:
+            self.counters[found[1]] += 1
+        return found[0]
+
+    @staticmethod
+    def mate_in_one(board: chess.Board, moves: List[chess.Move]) -> Optional[chess.Move]:
+        """
+        Ищет ход, который ставит мат.
+
+        Args:
+            board (chess.Board): Позиция
+            moves (List[chess.Move]): Легальные ходы позиции
+
+        Returns:
+            Optional[chess.Move]: Матующий ход или None
+        """
+        for move in moves:
+            # Проверка шаха дешевле, чем сделать ход и проверить мат
+            if not board.gives_check(move):
+                continue
+            board.push(move)
+            mate: bool = board.is_checkmate()
+            board.pop()
+            if mate:
+                return move
+        return None
+
+    def tablebase_move(self, board: chess.Board, moves: List[chess.Move]) -> Optional[chess.Move]:
+        """
+        Выбирает лучший ход по таблицам: сначала по исходу (WDL), затем по
+        расстоянию до обнуления счетчика 50 ходов (DTZ) - быстрее выигрывать
+        и дольше проигрывать.
+
+        Args:
+            board (chess.Board): Позиция
+            moves (List[chess.Move]): Легальные ходы позиции
+
+        Returns:
+            Optional[chess.Move]: Ход или None, если для позиции нет таблиц
+        """
+        tablebase: Optional[chess.syzygy.Tablebase] = self._tables()
+        if tablebase is None:
+            return None
+
+        best: Optional[Tuple[Tuple[int, int], chess.Move]] = None
+        try:
+            for move in moves:
+                board.push(move)
+                try:
+                    # Оценки с точки зрения соперника: чем меньше, тем лучше для бота
+                    key: Tuple[int, int] = (tablebase.probe_wdl(board), -tablebase.probe_dtz(board))
+                finally:
+                    board.pop()
+                if best is None or key < best[0]:
+                    best = key, move
+        except KeyError:
+            # MissingTableError: таблиц для этого набора фигур нет
+            return None
+        return best[1] if best is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает количество ходов, найденных каждым коротким путем.
+
+        Returns:
+            Dict[str, Any]: Счетчики по коротким путям
+        """
+        with self._lock:
+            return dict(self.counters)
+
+    def close(self) -> None:
+        """
+        Закрывает файлы таблиц.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._tablebase is not None:
+                self._tablebase.close()
+                self._tablebase = None
+            self._opened = False
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from DataBase import DataBase
+
+
+class FileIdCache:
+    """
+    Соответствие ключа картинки доски и Telegram file_id первой загрузки.
+
+    Повторная отправка той же картинки передает только file_id, без загрузки
+    PNG. Соответствия хранятся в базе, а недавно использованные дублируются
+    в памяти, чтобы не ходить в базу на каждом ходу.
+    """
+
+    def __init__(self, db: DataBase, max_items: int) -> None:
+        """
+        Инициализирует кеш.
+
+        Args:
+            db (DataBase): База данных, в которой хранятся file_id
+            max_items (int): Сколько соответствий держать в памяти
+        """
+        self.db: DataBase = db
+        self.max_items: int = max_items
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Ищет file_id картинки в памяти, затем в базе.
+
+        Args:
+            key (str): Ключ картинки
+
+        Returns:
+            Optional[str]: file_id или None, если картинка еще не загружалась
+        """
+        with self._lock:
+            file_id: Optional[str] = self._items.get(key)
+            if file_id is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return file_id
+
+        file_id = self.db.select_file_id(key)
+        with self._lock:
+            if file_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, file_id)
+        return file_id
+
+    def put(self, key: str, file_id: str) -> None:
+        """
+        Сохраняет file_id загруженной картинки.
+
+        Args:
+            key (str): Ключ картинки
+            file_id (str): file_id, который вернул Telegram
+
+        Returns:
+            None
+        """
+        self.db.save_file_id(key, file_id)
+        with self._lock:
+            self._remember(key, file_id)
+
+    def forget(self, key: str) -> None:
+        """
+        Удаляет file_id, который Telegram перестал принимать.
+
+        Args:
+            key (str): Ключ картинки
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._items.pop(key, None)
+        self.db.delete_file_id(key)
+
+    def _remember(self, key: str, file_id: str) -> None:
+        """
+        Кладет соответствие в память, вытесняя самые старые. Вызывается под блокировкой.
+
+        Args:
+            key (str): Ключ картинки
+            file_id (str): file_id картинки
+
+        Returns:
+            None
+        """
+        self._items[key] = file_id
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики кеша.
+
+        Returns:
+            Dict[str, Any]: Количество записей в памяти, попадания и промахи
+        """
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
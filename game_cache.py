@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import chess
+
+from DataBase import DataBase
+
+
+class GameCache:
+    """
+    Живые доски активных партий, чтобы ход был одним board.push, а не разбором FEN.
+
+    Доска собирается из журнала ходов (таблица moves), поэтому у нее есть
+    история: python-chess правильно находит пятикратное повторение, а движок
+    получает всю партию. Новые ходы только дописываются в журнал. Доски, к
+    которым давно не обращались, вытесняются из памяти.
+    """
+
+    def __init__(self, db: DataBase, max_items: int, idle_timeout: float) -> None:
+        """
+        Инициализирует кеш.
+
+        Args:
+            db (DataBase): База данных с журналом ходов
+            max_items (int): Сколько досок держать в памяти
+            idle_timeout (float): Через сколько секунд без ходов доска вытесняется
+        """
+        self.db: DataBase = db
+        self.max_items: int = max_items
+        self.idle_timeout: float = idle_timeout
+        self._boards: "OrderedDict[str, Tuple[chess.Board, float]]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.loads: int = 0
+        self.evictions: int = 0
+
+    def get(self, game_id: str, fen: str) -> chess.Board:
+        """
+        Возвращает живую доску партии, при необходимости собирая ее из журнала ходов.
+
+        Доска не копируется: вызывающий двигает ее сам и затем сохраняет ходы
+        через save() или finish(). Если ходы сохранить не удалось, доску нужно
+        убрать через forget().
+
+        Args:
+            game_id (str): ID игры
+            fen (str): Текущая FEN-строка игры из базы
+
+        Returns:
+            chess.Board: Доска с историей ходов
+
+        Raises:
+            RuntimeError: Если не удалось прочитать журнал ходов
+        """
+        key: str = str(game_id)
+        now: float = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry: Optional[Tuple[chess.Board, float]] = self._boards.get(key)
+            if entry is not None and entry[0].fen() == fen:
+                self._boards[key] = (entry[0], now)
+                self._boards.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        board: chess.Board = self.load(game_id, fen)
+        with self._lock:
+            self.loads += 1
+            self._boards[key] = (board, now)
+            self._boards.move_to_end(key)
+            while len(self._boards) > self.max_items:
+                self._boards.popitem(last=False)
+                self.evictions += 1
+        return board
+
+    def load(self, game_id: str, fen: str) -> chess.Board:
+        """
+        Собирает доску из журнала ходов. Для старых игр без журнала - из FEN.
+
+        Args:
+            game_id (str): ID игры
+            fen (str): Текущая FEN-строка игры из базы
+
+        Returns:
+            chess.Board: Доска с историей ходов
+
+        Raises:
+            RuntimeError: Если не удалось прочитать журнал ходов
+        """
+        log = self.db.load_moves(game_id)
+        if log is False:
+            # Доска из FEN без истории при сохранении переписала бы журнал с нуля
+            raise RuntimeError(f"Не удалось прочитать журнал ходов игры {game_id}")
+        if log:
+            origin, moves = log
+            board: chess.Board = chess.Board(origin)
+            try:
+                for uci in moves:
+                    board.push(chess.Move.from_uci(uci))
+            except ValueError as E:
+                print(E)
+            # Журнал должен приводить к позиции из games.fen, иначе доверяем FEN
+            if board.fen() == fen:
+                return board
+        return chess.Board(fen)
+
+    def save(self, game_id: str, board: chess.Board, count: int) -> bool:
+        """
+        Дописывает последние ходы доски в журнал и обновляет FEN игры.
+
+        Args:
+            game_id (str): ID игры
+            board (chess.Board): Доска после ходов
+            count (int): Сколько последних ходов дописать
+
+        Returns:
+            bool: True при успешном сохранении, False при ошибке (доска при этом вытесняется)
+        """
+        origin, start_ply, moves = self._tail(board, count)
+        if self.db.save_moves(game_id, origin, start_ply, moves, board.fen()):
+            return True
+        self.forget(game_id)
+        return False
+
+    def finish(self, game_id: str, board: chess.Board, count: int, tg_id: int, outcome: str) -> bool:
+        """
+        Дописывает последние ходы, завершает игру и убирает ее доску из памяти.
+
+        Args:
+            game_id (str): ID игры
+            board (chess.Board): Итоговая доска
+            count (int): Сколько последних ходов дописать
+            tg_id (int): Telegram ID игрока
+            outcome (str): Результат игры: 'win', 'lose' или 'draw'
+
+        Returns:
+            bool: True при успешном сохранении, False при ошибке
+        """
+        origin, start_ply, moves = self._tail(board, count)
+        self.forget(game_id)
+        return self.db.finish_game(game_id, board.fen(), tg_id, outcome, origin, start_ply, moves)
+
+    def forget(self, game_id: str) -> None:
+        """
+        Убирает доску из памяти, следующий ход соберет ее заново из базы.
+
+        Args:
+            game_id (str): ID игры
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._boards.pop(str(game_id), None)
+
+    @staticmethod
+    def _tail(board: chess.Board, count: int) -> Tuple[str, int, List[str]]:
+        """
+        Возвращает начальную позицию журнала, номер первого нового хода и сами ходы.
+
+        Args:
+            board (chess.Board): Доска после ходов
+            count (int): Сколько последних ходов взять
+
+        Returns:
+            Tuple[str, int, List[str]]: FEN начальной позиции, номер хода и ходы в формате UCI
+        """
+        start_ply: int = len(board.move_stack) - count
+        moves: List[str] = [move.uci() for move in board.move_stack[start_ply:]]
+        return board.root().fen(), start_ply, moves
+
+    def _evict_idle(self, now: float) -> None:
+        """
+        Вытесняет доски, к которым не обращались дольше idle_timeout. Вызывается под блокировкой.
+
+        Args:
+            now (float): Текущее время time.monotonic()
+
+        Returns:
+            None
+        """
+        # Самые давние доски лежат в начале словаря
+        while self._boards:
+            key, (_, used) = next(iter(self._boards.items()))
+            if now - used < self.idle_timeout:
+                break
+            del self._boards[key]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики кеша.
+
+        Returns:
+            Dict[str, Any]: Количество досок в памяти, попадания, сборки из базы и вытеснения
+        """
+        with self._lock:
+            return {
+                "items": len(self._boards),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,110 @@
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import chess.engine
+
+# Значения по умолчанию опций силы игры во встроенном Stockfish (engine.cpp).
+# Движок из пула переиспользуется между уровнями, поэтому каждый профиль
+# выставляет все эти опции, иначе настройки прошлого уровня остались бы в силе.
+STRENGTH_DEFAULTS: Dict[str, Any] = {
+    "Skill Level": 20,
+    "UCI_LimitStrength": False,
+    "UCI_Elo": 1320,
+}
+
+
+class LevelProfile:
+    """
+    Профиль уровня сложности: UCI-опции силы игры и ограничение поиска.
+
+    Ограничение задается узлами или глубиной, а не временем, поэтому цена
+    хода не зависит от загрузки сервера и ее можно планировать заранее.
+    """
+
+    def __init__(self, name: str, options: Dict[str, Any], limit: Dict[str, Any],
+                 fastpath: Optional[List[str]] = None, cache: Optional[bool] = None) -> None:
+        """
+        Инициализирует профиль.
+
+        Args:
+            name (str): Название уровня
+            options (Dict[str, Any]): UCI-опции уровня
+            limit (Dict[str, Any]): Параметры chess.engine.Limit (nodes, depth, time)
+            fastpath (Optional[List[str]]): Короткие пути без движка (single, mate, syzygy), None - все
+            cache (Optional[bool]): Сохранять ли ходы движка в кеш ходов, None - только на полной силе
+        """
+        self.name: str = name
+        self.options: Dict[str, Any] = dict(STRENGTH_DEFAULTS, **options)
+        self.limit_args: Dict[str, Any] = dict(limit)
+        self._limit: Optional["chess.engine.Limit"] = None
+        self.fastpath: Optional[List[str]] = fastpath
+        # Ослабленный движок (Skill Level, UCI_LimitStrength, MultiPV) выбирает ход случайно,
+        # из кеша он стал бы повторять один и тот же ход в позиции
+        weakened: bool = (self.options["Skill Level"] < 20 or bool(self.options["UCI_LimitStrength"])
+                          or int(self.options.get("MultiPV", 1)) > 1)
+        self.cache: bool = not weakened if cache is None else cache
+
+    @property
+    def limit(self) -> "chess.engine.Limit":
+        """
+        Ограничение поиска. Создается при первом ходе, чтобы загрузка уровней не импортировала chess.engine.
+
+        Returns:
+            chess.engine.Limit: Ограничение поиска уровня
+        """
+        if self._limit is None:
+            import chess.engine
+
+            self._limit = chess.engine.Limit(**self.limit_args)
+        return self._limit
+
+
+class Levels:
+    """
+    Набор уровней сложности, загруженный из JSON-файла.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Загружает уровни из файла.
+
+        Args:
+            path (str): Путь к JSON-файлу с уровнями
+
+        Raises:
+            ValueError: Если уровень по умолчанию не описан в файле
+        """
+        with open(path, encoding="utf-8") as f:
+            data: Dict[str, Any] = json.load(f)
+
+        self.engine_options: Dict[str, Any] = data.get("engine", {})
+        self.profiles: Dict[str, LevelProfile] = {
+            name: LevelProfile(name, profile.get("options", {}), profile.get("limit", {}), profile.get("fastpath"),
+                               profile.get("cache"))
+            for name, profile in data["levels"].items()
+        }
+        self.default: str = data.get("default", next(iter(self.profiles)))
+        if self.default not in self.profiles:
+            raise ValueError(f"Уровень по умолчанию '{self.default}' не описан в {path}")
+
+    def names(self) -> List[str]:
+        """
+        Возвращает названия уровней в порядке из файла.
+
+        Returns:
+            List[str]: Названия уровней
+        """
+        return list(self.profiles)
+
+    def get(self, name: str) -> LevelProfile:
+        """
+        Возвращает профиль уровня. Неизвестные уровни (например, из старых игр) получают уровень по умолчанию.
+
+        Args:
+            name (str): Название уровня
+
+        Returns:
+            LevelProfile: Профиль уровня
+        """
+        return self.profiles.get(name, self.profiles[self.default])
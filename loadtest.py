@@ -0,0 +1,514 @@
+import argparse
+import itertools
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+import chess
+
+from admission import LIMITED_TEXT
+
+# Нагрузочный тест: обработчики GigaChess.py работают против локальной заглушки
+# Telegram Bot API, N игроков параллельно проходят create_profile -> create_game ->
+# play_game -> ходы. По умолчанию вместо Stockfish запускается stub_engine.py.
+#
+#   python loadtest.py -n 50 --moves 10
+#   python loadtest.py -n 20 --engine stockfish/stockfish-windows-x86-64-avx2.exe
+#   python loadtest.py -n 50 --webhook
+#   python loadtest.py -n 20 --retry-limited 1
+#
+# Лимит частоты сообщений (admission.py) остается включенным. Шаг, отклоненный
+# лимитом, считается отдельным исходом (строка limited в отчете) и не входит в
+# задержки этапов; игрок на нем останавливается, а с --retry-limited повторяет
+# шаг после паузы, которая тоже не входит в замер.
+
+
+class Limited(Exception):
+    """
+    Бот отклонил сообщение игрока лимитом частоты.
+    """
+
+
+class Recorder:
+    """
+    Собирает длительности операций по этапам и считает перцентили.
+    """
+
+    def __init__(self) -> None:
+        """
+        Инициализирует пустой набор замеров.
+        """
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock: threading.Lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        """
+        Добавляет замер.
+
+        Args:
+            stage (str): Название этапа
+            seconds (float): Длительность в секундах
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Оборачивает функцию так, чтобы каждый ее вызов замерялся.
+
+        Args:
+            stage (str): Название этапа
+            fn (Callable[..., Any]): Оборачиваемая функция
+
+        Returns:
+            Callable[..., Any]: Функция с замером времени
+        """
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start: float = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def report(self, elapsed: float) -> None:
+        """
+        Печатает количество операций, пропускную способность и перцентили по этапам.
+
+        Args:
+            elapsed (float): Длительность теста в секундах
+
+        Returns:
+            None
+        """
+        print(f"{'stage':>8} {'count':>7} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        with self._lock:
+            for stage, samples in sorted(self.samples.items()):
+                ordered: List[float] = sorted(samples)
+
+                def percentile(q: float) -> float:
+                    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+                print(f"{stage:>8} {len(ordered):>7} {len(ordered) / elapsed:>8.1f} {percentile(0.50):>8.1f} "
+                      f"{percentile(0.95):>8.1f} {percentile(0.99):>8.1f} {ordered[-1] * 1000:>8.1f}")
+
+
+class FakeTelegram:
+    """
+    Локальная заглушка Telegram Bot API.
+
+    Принимает getUpdates (long polling), sendMessage, sendPhoto и служебные
+    методы бота. Ответы бота складываются в очередь чата, откуда их читают
+    имитируемые игроки. Если задан webhook, обновления не ждут getUpdates,
+    а сразу отправляются POST-запросом на сервер webhook бота.
+    """
+
+    def __init__(self) -> None:
+        """
+        Запускает HTTP-сервер на свободном локальном порту.
+        """
+        self.updates: List[Dict[str, Any]] = []
+        self.inbox: Dict[int, "queue.Queue[Dict[str, Any]]"] = defaultdict(queue.Queue)
+        self._cond: threading.Condition = threading.Condition()
+        self._ids = itertools.count(1)
+        self.uploads: int = 0
+        # Адрес и секрет webhook бота, None - обновления забираются через getUpdates
+        self.webhook: Optional[Tuple[str, str]] = None
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                self.handle_method()
+
+            def do_POST(self) -> None:
+                self.handle_method()
+
+            def handle_method(self) -> None:
+                url = urlparse(self.path)
+                body: bytes = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                params: Dict[str, str] = dict(parse_qsl(url.query))
+                if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                    params.update(parse_qsl(body.decode()))
+                result = fake.call(url.path.rsplit("/", 1)[-1], params, body)
+                payload: bytes = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url: str = f"http://127.0.0.1:{self.server.server_address[1]}/bot{{0}}/{{1}}"
+
+    def call(self, method: str, params: Dict[str, str], body: bytes) -> Any:
+        """
+        Выполняет метод Bot API.
+
+        Args:
+            method (str): Название метода
+            params (Dict[str, str]): Параметры запроса
+            body (bytes): Тело запроса (для загрузки фото)
+
+        Returns:
+            Any: Поле result ответа Bot API
+        """
+        if method == "getUpdates":
+            return self.get_updates(int(params.get("offset", 0)), float(params.get("timeout", 0)))
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "GigaChess", "username": "gigachess_bot"}
+        if method in ("sendMessage", "sendPhoto", "editMessageText"):
+            chat_id: int = int(params["chat_id"])
+            message: Dict[str, Any] = {
+                "message_id": int(params.get("message_id", 0)) or next(self._ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+            if "reply_markup" in params:
+                message["reply_markup"] = json.loads(params["reply_markup"])
+            if method == "sendPhoto":
+                # Фото приходит либо файлом (multipart), либо file_id прошлой загрузки
+                file_id: str = params.get("photo") or f"photo-{next(self._ids)}"
+                if "photo" not in params:
+                    with self._cond:
+                        self.uploads += 1
+                message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 394, "height": 394}]
+            self.inbox[chat_id].put(dict(message, method=method))
+            return message
+        # setMyCommands, answerCallbackQuery и прочие служебные методы
+        return True
+
+    def push_update(self, kind: str, payload: Dict[str, Any]) -> None:
+        """
+        Добавляет входящее обновление для бота.
+
+        Args:
+            kind (str): Тип обновления: message или callback_query
+            payload (Dict[str, Any]): Объект обновления
+
+        Returns:
+            None
+        """
+        with self._cond:
+            update: Dict[str, Any] = {"update_id": len(self.updates) + 1, kind: payload}
+            self.updates.append(update)
+            self._cond.notify_all()
+        if self.webhook is not None:
+            url, secret = self.webhook
+            request = urllib.request.Request(url, data=json.dumps(update).encode(), headers={
+                "Content-Type": "application/json",
+                "X-Telegram-Bot-Api-Secret-Token": secret,
+            })
+            urllib.request.urlopen(request).close()
+
+    def get_updates(self, offset: int, timeout: float) -> List[Dict[str, Any]]:
+        """
+        Отдает обновления начиная с offset, ожидая новые до timeout секунд.
+
+        Args:
+            offset (int): Первый нужный update_id
+            timeout (float): Время long polling
+
+        Returns:
+            List[Dict[str, Any]]: Обновления
+        """
+        deadline: float = time.monotonic() + timeout
+        with self._cond:
+            while len(self.updates) < max(offset, 1):
+                remaining: float = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+            return self.updates[max(offset, 1) - 1:max(offset, 1) + 99]
+
+    def close(self) -> None:
+        """
+        Останавливает сервер.
+
+        Returns:
+            None
+        """
+        self.server.shutdown()
+
+
+class Player:
+    """
+    Имитируемый игрок: отдельный чат, который проходит весь сценарий игры.
+    """
+
+    def __init__(self, index: int, fake: FakeTelegram, recorder: Recorder, db: Any, timeout: float,
+                 retry_limited: float = 0.0) -> None:
+        """
+        Инициализирует игрока.
+
+        Args:
+            index (int): Номер игрока, из него строятся Telegram ID и имя
+            fake (FakeTelegram): Заглушка Bot API
+            recorder (Recorder): Сборщик замеров
+            db (Any): Отдельное подключение к базе, чтобы узнавать позицию после хода бота
+            timeout (float): Сколько секунд ждать ответа бота
+            retry_limited (float): Через сколько секунд повторить шаг, отклоненный лимитом, 0 - не повторять
+        """
+        self.user_id: int = 1_000_000 + index
+        self.name: str = f"player{index}"
+        self.fake: FakeTelegram = fake
+        self.recorder: Recorder = recorder
+        self.db: Any = db
+        self.timeout: float = timeout
+        self.retry_limited: float = retry_limited
+        self.errors: int = 0
+        self.limited: int = 0
+
+    def send(self, text: str) -> None:
+        """
+        Отправляет боту текстовое сообщение от имени игрока.
+
+        Args:
+            text (str): Текст сообщения
+
+        Returns:
+            None
+        """
+        self.fake.push_update("message", {
+            "message_id": 0,
+            "date": int(time.time()),
+            "chat": {"id": self.user_id, "type": "private"},
+            "from": {"id": self.user_id, "is_bot": False, "first_name": self.name},
+            "text": text,
+        })
+
+    def expect(self, pattern: str) -> Dict[str, Any]:
+        """
+        Ждет текстовый ответ бота, подходящий под регулярное выражение.
+
+        Args:
+            pattern (str): Регулярное выражение
+
+        Returns:
+            Dict[str, Any]: Сообщение бота
+
+        Raises:
+            TimeoutError: Если бот не ответил за timeout секунд
+        """
+        deadline: float = time.monotonic() + self.timeout
+        inbox = self.fake.inbox[self.user_id]
+        while True:
+            remaining: float = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{self.name}: нет ответа {pattern!r}")
+            try:
+                message: Dict[str, Any] = inbox.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if re.search(pattern, message["text"]):
+                return message
+
+    def step(self, name: str, text: str, pattern: str) -> Dict[str, Any]:
+        """
+        Отправляет сообщение и замеряет время до нужного ответа.
+
+        Отказ по лимиту частоты замеряется отдельно, как этап limited. Если
+        задан retry_limited, шаг повторяется после паузы, и в замер шага
+        входит только последняя попытка.
+
+        Args:
+            name (str): Название шага в отчете
+            text (str): Текст сообщения
+            pattern (str): Регулярное выражение ожидаемого ответа
+
+        Returns:
+            Dict[str, Any]: Сообщение бота
+
+        Raises:
+            Limited: Если бот отклонил сообщение лимитом частоты, а повтор не задан
+        """
+        while True:
+            start: float = time.perf_counter()
+            self.send(text)
+            message: Dict[str, Any] = self.expect(f"{pattern}|^{re.escape(LIMITED_TEXT)}$")
+            if message["text"] != LIMITED_TEXT:
+                break
+            self.recorder.add("limited", time.perf_counter() - start)
+            self.limited += 1
+            if self.retry_limited <= 0:
+                raise Limited(f"{self.name}: шаг {name} отклонен лимитом частоты")
+            time.sleep(self.retry_limited)
+        self.recorder.add(name, time.perf_counter() - start)
+        return message
+
+    def run(self, moves: int, level: str) -> None:
+        """
+        Проходит сценарий: профиль, игра, запуск игры и ходы.
+
+        Args:
+            moves (int): Сколько ходов сделать
+            level (str): Уровень сложности игры
+
+        Returns:
+            None
+        """
+        try:
+            self.step("profile", "/create_profile", "имя напиши")
+            self.step("profile", self.name, "зарегал")
+            self.step("game", "/create_game", "описание")
+            self.step("game", f"нагрузочный тест {self.name}", "сложность")
+            self.step("game", level, "успешно создана")
+            listing: Dict[str, Any] = self.step("list", "/show_unfinished_games", "айди игры")
+            game_id: int = int(re.search(r"айди игры - (\d+)", listing["text"]).group(1))
+            self.step("play", "/play_game", "ID игры")
+            self.step("play", str(game_id), "Введите ваш ход")
+
+            for _ in range(moves):
+                board: chess.Board = chess.Board(self.db.load_game(game_id)["fen"])
+                move: chess.Move = next(iter(board.legal_moves))
+                reply: Dict[str, Any] = self.step("move", move.uci(), "Введи следующий ход|Ход невозможен|Мат|Ничья|Пат")
+                if "следующий" not in reply["text"]:
+                    break
+            self.send("exit")
+        except Limited as E:
+            # Отказ уже посчитан в limited, это не ошибка бота
+            print(E)
+        except Exception as E:
+            print(E)
+            self.errors += 1
+
+
+def main() -> None:
+    """
+    Запускает бота против заглушки Bot API и печатает отчет по этапам.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Нагрузочный тест GigaChess")
+    parser.add_argument("-n", "--players", type=int, default=20)
+    parser.add_argument("--moves", type=int, default=10)
+    parser.add_argument("--level", default="легко")
+    parser.add_argument("--engine", default=None, help="Путь к Stockfish, по умолчанию stub_engine.py")
+    parser.add_argument("--stub-delay-ms", type=float, default=20)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--retry-limited", type=float, default=0,
+                        help="Через сколько секунд повторять шаг, отклоненный лимитом частоты, 0 - не повторять")
+    parser.add_argument("--webhook", action="store_true", help="Доставлять обновления через webhook, а не getUpdates")
+    parser.add_argument("--webhook-workers", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Запустить бота через supervisor.py в N процессах (замеры этапов внутри бота недоступны)")
+    args = parser.parse_args()
+
+    # Бот читает настройки при импорте, поэтому окружение готовится заранее
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    workdir: str = tempfile.mkdtemp(prefix="gigachess-load-")
+    engine: str = args.engine or os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_engine.py")
+    os.environ["GIGACHESS_ENGINE_PATH"] = engine
+    os.environ["GIGACHESS_STUB_DELAY_MS"] = str(args.stub_delay_ms)
+    os.environ["GIGACHESS_DB_PATH"] = os.path.join(workdir, "load.db")
+    os.environ.setdefault("GIGACHESS_TOKEN", "1:loadtest")
+
+    fake: FakeTelegram = FakeTelegram()
+    import telebot.apihelper
+    telebot.apihelper.API_URL = fake.url
+
+    from DataBase import DataBase
+
+    recorder: Recorder = Recorder()
+    supervisor: Optional[Any] = None
+    webhook: Optional[Any] = None
+    if args.workers > 0:
+        # Процессы-обработчики наследуют окружение и адрес заглушки Bot API, бот живет только в них
+        from supervisor import Supervisor
+        DataBase(os.environ["GIGACHESS_DB_PATH"]).migrate()
+        supervisor = Supervisor(args.workers)
+        supervisor.start()
+        if args.webhook:
+            webhook = supervisor.serve_webhook("127.0.0.1", 0, "/telegram", "loadtest")
+            fake.webhook = (f"http://127.0.0.1:{webhook.http.server_address[1]}/telegram", "loadtest")
+        else:
+            threading.Thread(target=supervisor.poll, kwargs={"timeout": 1}, daemon=True).start()
+    else:
+        import GigaChess
+        GigaChess.startup()
+        for stage in (GigaChess.engine_stage, GigaChess.render_stage, GigaChess.io_stage):
+            stage.run = recorder.wrap("upload" if stage.name == "io" else stage.name, stage.run)
+        for name in dir(GigaChess.db):
+            if name.startswith("_") or name in ("connect", "fetchone", "fetchall", "execute", "migrate", "close"):
+                continue
+            method = getattr(GigaChess.db, name)
+            if callable(method):
+                setattr(GigaChess.db, name, recorder.wrap("db", method))
+
+        GigaChess.pool.warm_up()
+        if args.webhook:
+            from webhook import WebhookServer
+            webhook = WebhookServer(GigaChess.bot, "127.0.0.1", 0, "/telegram", "loadtest", workers=args.webhook_workers)
+            webhook.start()
+            fake.webhook = (f"http://127.0.0.1:{webhook.http.server_address[1]}/telegram", "loadtest")
+        else:
+            poller = threading.Thread(target=GigaChess.bot.polling,
+                                      kwargs={"none_stop": True, "interval": 0, "timeout": 1}, daemon=True)
+            poller.start()
+
+    reader: DataBase = DataBase(os.environ["GIGACHESS_DB_PATH"])
+    players: List[Player] = [Player(i, fake, recorder, reader, args.timeout, args.retry_limited) for i in range(args.players)]
+    threads: List[threading.Thread] = [
+        threading.Thread(target=player.run, args=(args.moves, args.level)) for player in players
+    ]
+    start: float = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed: float = time.perf_counter() - start
+
+    if webhook is not None:
+        webhook.stop()
+    if supervisor is not None:
+        supervisor.stop()
+    else:
+        if webhook is None:
+            GigaChess.bot.stop_polling()
+        if GigaChess.dispatcher is not None:
+            GigaChess.dispatcher.shutdown()
+        GigaChess.pool.close()
+    fake.close()
+
+    print(f"players {args.players}, moves {args.moves}, engine {os.path.basename(engine)}, "
+          f"intake {'webhook' if webhook is not None else 'polling'}, "
+          f"{f'{args.workers} workers, ' if supervisor is not None else ''}"
+          f"{elapsed:.1f} s, errors {sum(player.errors for player in players)}, "
+          f"limited {sum(player.limited for player in players)}, uploads {fake.uploads}")
+    recorder.report(elapsed)
+    if supervisor is not None:
+        print("supervisor", supervisor.stats())
+    else:
+        print("pool", GigaChess.pool.stats())
+        print("admission", GigaChess.admission.stats())
+    if webhook is not None:
+        print("webhook", webhook.stats())
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
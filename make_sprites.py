@@ -0,0 +1,63 @@
+import io
+from pathlib import Path
+
+import chess
+import chess.svg
+import resvg_py
+from PIL import Image
+
+# Спрайты для fast_render.py рисуются из тех же SVG, что и chess.svg.board,
+# в 4 раза крупнее доски по умолчанию, и уменьшаются под нужный размер при загрузке.
+# Запускается вручную при смене оформления: pip install resvg-py && python make_sprites.py
+
+ASSETS: Path = Path(__file__).resolve().parent / "assets"
+SCALE: int = 4
+PIECE_ORDER: str = "PNBRQKpnbrqk"
+
+
+def rasterize(svg: str) -> Image.Image:
+    """
+    Растеризует SVG с прозрачным фоном.
+
+    Args:
+        svg (str): SVG-разметка
+
+    Returns:
+        Image.Image: RGBA-изображение
+    """
+    return Image.open(io.BytesIO(resvg_py.svg_to_bytes(svg_string=svg))).convert("RGBA")
+
+
+def main() -> None:
+    """
+    Создает спрайты фигур, рамки доски и подсветки шаха в папке assets.
+
+    Returns:
+        None
+    """
+    ASSETS.mkdir(exist_ok=True)
+    square: int = chess.svg.SQUARE_SIZE * SCALE
+
+    sheet: Image.Image = Image.new("RGBA", (square * len(PIECE_ORDER), square))
+    for index, symbol in enumerate(PIECE_ORDER):
+        sprite = rasterize(chess.svg.piece(chess.Piece.from_symbol(symbol), size=square))
+        sheet.paste(sprite, (index * square, 0))
+    sheet.save(ASSETS / "pieces.png", optimize=True)
+
+    # Пустая доска с рамкой и координатами для каждой ориентации
+    full_size: int = (8 * chess.svg.SQUARE_SIZE + 2 * 17) * SCALE
+    for name, orientation in (("white", chess.WHITE), ("black", chess.BLACK)):
+        frame = rasterize(chess.svg.board(orientation=orientation, size=full_size)).convert("RGB")
+        frame.save(ASSETS / f"frame_{name}.png", optimize=True)
+
+    size: int = chess.svg.SQUARE_SIZE
+    check = rasterize(
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{square}" height="{square}" viewBox="0 0 {size} {size}">'
+        f'<defs>{chess.svg.CHECK_GRADIENT}</defs>'
+        f'<rect width="{size}" height="{size}" fill="url(#check_gradient)"/></svg>'
+    )
+    check.save(ASSETS / "check.png", optimize=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Набор значений меток метрики, например (("stage", "engine"),)
+Labels = Tuple[Tuple[str, str], ...]
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels: Labels) -> str:
+    """
+    Форматирует метки в синтаксисе Prometheus.
+
+    Args:
+        labels (Labels): Метки
+
+    Returns:
+        str: Строка вида {stage="engine"} или пустая строка
+    """
+    if not labels:
+        return ""
+    escaped: List[str] = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    """
+    Монотонно растущий счетчик.
+    """
+
+    def __init__(self, name: str, help: str) -> None:
+        """
+        Инициализирует счетчик.
+
+        Args:
+            name (str): Имя метрики
+            help (str): Описание метрики
+        """
+        self.name: str = name
+        self.help: str = help
+        self._values: Dict[Labels, float] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Увеличивает счетчик.
+
+        Args:
+            amount (float): На сколько увеличить
+            **labels (str): Метки
+
+        Returns:
+            None
+        """
+        key: Labels = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """
+        Возвращает текущие значения.
+
+        Счетчик, который еще ни разу не увеличивали, отдается нулем без меток,
+        чтобы rate() считался с первого опроса.
+
+        Returns:
+            List[Tuple[str, Labels, float]]: Имя, метки и значение каждой строки
+        """
+        with self._lock:
+            if not self._values:
+                return [(self.name + "_total", (), 0.0)]
+            return [(self.name + "_total", key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """
+    Гистограмма длительностей с накопительными корзинами, как в Prometheus.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        Инициализирует гистограмму.
+
+        Args:
+            name (str): Имя метрики
+            help (str): Описание метрики
+            buckets (Tuple[float, ...]): Верхние границы корзин по возрастанию
+        """
+        self.name: str = name
+        self.help: str = help
+        self.buckets: Tuple[float, ...] = buckets
+        # Для каждого набора меток: счетчики корзин (последняя - +Inf), сумма и количество
+        self._values: Dict[Labels, Tuple[List[int], float, int]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Учитывает одно значение.
+
+        Args:
+            value (float): Значение, секунды
+            **labels (str): Метки
+
+        Returns:
+            None
+        """
+        key: Labels = tuple(sorted(labels.items()))
+        index: int = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Замеряет длительность блока with.
+
+        Args:
+            **labels (str): Метки
+
+        Yields:
+            None
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def totals(self) -> Dict[Labels, Tuple[float, int]]:
+        """
+        Возвращает сумму и количество значений по наборам меток.
+
+        Returns:
+            Dict[Labels, Tuple[float, int]]: Сумма и количество
+        """
+        with self._lock:
+            return {key: (total, count) for key, (_, total, count) in self._values.items()}
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        """
+        Возвращает строки _bucket, _sum и _count.
+
+        Returns:
+            List[Tuple[str, Labels, float]]: Имя, метки и значение каждой строки
+        """
+        result: List[Tuple[str, Labels, float]] = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative: int = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le: str = "+Inf" if bound == float("inf") else repr(bound)
+                    result.append((self.name + "_bucket", key + (("le", le),), cumulative))
+                result.append((self.name + "_sum", key, total))
+                result.append((self.name + "_count", key, count))
+        return result
+
+
+class Registry:
+    """
+    Набор метрик процесса и текстовый формат Prometheus для них.
+
+    Кроме собственных счетчиков и гистограмм можно зарегистрировать функции,
+    которые при каждом чтении берут значения из уже существующих объектов
+    (пул движков, кеши, диспетчер), чтобы не считать одно и то же дважды.
+    """
+
+    def __init__(self) -> None:
+        """
+        Инициализирует пустой реестр.
+        """
+        self._metrics: List[Any] = []
+        self._callbacks: Dict[str, Tuple[str, str, Callable[[], Dict[Labels, float]]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def counter(self, name: str, help: str) -> Counter:
+        """
+        Создает и регистрирует счетчик.
+
+        Args:
+            name (str): Имя метрики без суффикса _total
+            help (str): Описание метрики
+
+        Returns:
+            Counter: Счетчик
+        """
+        metric: Counter = Counter(name, help)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Создает и регистрирует гистограмму.
+
+        Args:
+            name (str): Имя метрики
+            help (str): Описание метрики
+            buckets (Tuple[float, ...]): Верхние границы корзин
+
+        Returns:
+            Histogram: Гистограмма
+        """
+        metric: Histogram = Histogram(name, help, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register(self, name: str, kind: str, help: str, collect: Callable[[], Dict[Labels, float]]) -> None:
+        """
+        Регистрирует метрику, значения которой читаются функцией при каждом запросе.
+
+        Args:
+            name (str): Имя метрики
+            kind (str): Тип метрики Prometheus: gauge или counter
+            help (str): Описание метрики
+            collect (Callable[[], Dict[Labels, float]]): Функция, возвращающая значения по меткам
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._callbacks[name] = (kind, help, collect)
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+
+        Returns:
+            str: Текст для /metrics
+        """
+        with self._lock:
+            metrics: List[Any] = list(self._metrics)
+            callbacks = list(self._callbacks.items())
+
+        lines: List[str] = []
+        for metric in metrics:
+            kind: str = "histogram" if isinstance(metric, Histogram) else "counter"
+            # В формате 0.0.4 строки HELP и TYPE называют метрику так же, как ее значения
+            family: str = metric.name + "_total" if kind == "counter" else metric.name
+            lines.append(f"# HELP {family} {metric.help}")
+            lines.append(f"# TYPE {family} {kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        for name, (kind, help, collect) in callbacks:
+            try:
+                values: Dict[Labels, float] = collect()
+            except Exception as E:
+                logger.warning("Метрика %s не собрана: %s", name, E)
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values.items():
+                lines.append(f"{name}{format_labels(labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Запускает в фоновом потоке HTTP-сервер, отдающий метрики по /metrics.
+
+        Args:
+            port (int): Порт
+            host (str): Адрес, по умолчанию только локальный
+
+        Returns:
+            ThreadingHTTPServer: Запущенный сервер
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                payload: bytes = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        server: ThreadingHTTPServer = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def summary(self, previous: Dict[Tuple[str, Labels], Tuple[float, int]]) -> str:
+        """
+        Готовит короткую сводку для лога: количество и среднее время этапов с прошлой сводки.
+
+        Args:
+            previous (Dict[Tuple[str, Labels], Tuple[float, int]]): Суммы с прошлой сводки,
+                словарь обновляется на месте
+
+        Returns:
+            str: Строка сводки
+        """
+        with self._lock:
+            metrics: List[Any] = list(self._metrics)
+        parts: List[str] = []
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                for labels, (total, count) in sorted(metric.totals().items()):
+                    last_total, last_count = previous.get((metric.name, labels), (0.0, 0))
+                    previous[(metric.name, labels)] = (total, count)
+                    if count > last_count:
+                        name: str = metric.name.replace("gigachess_", "")
+                        if labels:
+                            name += "[" + ",".join(value for _, value in labels) + "]"
+                        avg_ms: float = (total - last_total) / (count - last_count) * 1000
+                        parts.append(f"{name} n={count - last_count} avg={avg_ms:.1f}ms")
+            else:
+                for sample, labels, value in metric.samples():
+                    name = sample.replace("gigachess_", "") + format_labels(labels)
+                    parts.append(f"{name}={value:g}")
+        return "; ".join(parts) or "нет данных"
+
+    def log_periodically(self, interval: float) -> threading.Thread:
+        """
+        Запускает фоновый поток, который раз в interval секунд пишет сводку в лог.
+
+        Args:
+            interval (float): Период в секундах
+
+        Returns:
+            threading.Thread: Запущенный поток
+        """
+        def loop() -> None:
+            previous: Dict[Tuple[str, Labels], Tuple[float, int]] = {}
+            while True:
+                time.sleep(interval)
+                logger.info("Метрики: %s", self.summary(previous))
+
+        thread: threading.Thread = threading.Thread(target=loop, name="metrics-log", daemon=True)
+        thread.start()
+        return thread
+
+
+REGISTRY: Registry = Registry()
+
+# Длительность этапов обработки хода: db, engine, search, render, upload
+STAGE_SECONDS: Histogram = REGISTRY.histogram("gigachess_stage_seconds", "Длительность этапов обработки хода")
+
+# Ожидание свободного места на этапе (Stage) перед выполнением
+STAGE_WAIT_SECONDS: Histogram = REGISTRY.histogram("gigachess_stage_wait_seconds", "Ожидание места на этапе обработки хода")
+
+# Ходы игроков, которые оказались невозможными
+ILLEGAL_MOVES: Counter = REGISTRY.counter("gigachess_illegal_moves", "Невозможные ходы игроков")
@@ -9,11 +9,82 @@ class Queries():
     SELECT_CHECK_PROFILE = """SELECT * FROM profiles WHERE tg_id = ?"""
     SELECT_PLAYER_ID_BY_TG_ID = """SELECT id FROM profiles WHERE tg_id = ?"""
     SELECT_USER_NAMES = """SELECT username FROM profiles"""
+    SELECT_PROFILE_BY_TG_ID = """SELECT id, username FROM profiles WHERE tg_id = ?"""
+    INCREMENT_WIN = """UPDATE profiles SET win = win + 1 WHERE tg_id = ?"""
+    INCREMENT_LOSE = """UPDATE profiles SET lose = lose + 1 WHERE tg_id = ?"""
+    INCREMENT_DRAW = """UPDATE profiles SET draw = draw + 1 WHERE tg_id = ?"""
 
     CREATE_GAME = """INSERT INTO games (player1, status, description, fen, level) VALUES (?,'in progres',?, 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', ?)"""
     SELECT_GAMES_BY_PLAYER_ID = """SELECT * FROM games WHERE player1 = ?"""
     SELECT_FINISHED_GAMES_BY_PLAYER_ID = """SELECT * FROM games WHERE player1 = ? AND status = 'over'"""
+    SELECT_UNFINISHED_AFTER = """SELECT id, description FROM games WHERE player1 = ? AND status = 'in progres' AND id > ? ORDER BY id LIMIT ?"""
+    SELECT_UNFINISHED_BEFORE = """SELECT id, description FROM games WHERE player1 = ? AND status = 'in progres' AND id < ? ORDER BY id DESC LIMIT ?"""
     SELECT_FEN_BY_GAME_ID = """SELECT fen FROM games WHERE id = ? """
     UPDATE_FEN_BY_GAME_ID = """UPDATE games SET fen = ? WHERE id = ?"""
     SELECT_GAME_LEVEL_BY_GAME_ID = """SELECT level FROM games WHERE id = ? """
+    LOAD_GAME_BY_GAME_ID = """SELECT games.fen, games.level, games.status, games.player1, profiles.tg_id FROM games LEFT JOIN profiles ON profiles.id = games.player1 WHERE games.id = ?"""
+    FINISH_GAME_BY_GAME_ID = """UPDATE games SET status = 'over', fen = ? WHERE id = ?"""
 
+    EXPORT_GAMES_BY_PLAYER_ID = """SELECT games.id, games.status, games.description, games.level, games.fen, game_origins.fen, moves.uci FROM games LEFT JOIN game_origins ON game_origins.game_id = games.id LEFT JOIN moves ON moves.game_id = games.id WHERE games.player1 = ? ORDER BY games.id, moves.ply"""
+    SELECT_UNANALYZED_GAMES = """SELECT games.id, game_origins.fen, moves.uci FROM games JOIN game_origins ON game_origins.game_id = games.id JOIN moves ON moves.game_id = games.id WHERE games.status = 'over' AND NOT EXISTS (SELECT 1 FROM analyzed_games WHERE analyzed_games.game_id = games.id) ORDER BY games.id, moves.ply"""
+    SAVE_MOVE_EVAL = """INSERT OR REPLACE INTO move_evals (game_id, ply, cp, mate, best) VALUES (?, ?, ?, ?, ?)"""
+    SAVE_ANALYZED_GAME = """INSERT OR REPLACE INTO analyzed_games (game_id, analyzed_at) VALUES (?, ?)"""
+    SELECT_PLAYER_EVALS = """SELECT move_evals.game_id, move_evals.ply, move_evals.cp FROM games JOIN move_evals ON move_evals.game_id = games.id WHERE games.player1 = ? ORDER BY move_evals.game_id, move_evals.ply"""
+    SELECT_GAME_ORIGIN = """SELECT fen FROM game_origins WHERE game_id = ?"""
+    SAVE_GAME_ORIGIN = """INSERT OR REPLACE INTO game_origins (game_id, fen) VALUES (?, ?)"""
+    DELETE_MOVES_BY_GAME_ID = """DELETE FROM moves WHERE game_id = ?"""
+    SELECT_MOVES_BY_GAME_ID = """SELECT uci FROM moves WHERE game_id = ? ORDER BY ply"""
+    APPEND_MOVE = """INSERT INTO moves (game_id, ply, uci) VALUES (?, ?, ?)"""
+
+    SELECT_CHAT_STATE = """SELECT state, game_id, data, expires_at FROM chat_states WHERE chat_id = ?"""
+    SAVE_CHAT_STATE = """INSERT OR REPLACE INTO chat_states (chat_id, state, game_id, data, expires_at) VALUES (?, ?, ?, ?, ?)"""
+    DELETE_CHAT_STATE = """DELETE FROM chat_states WHERE chat_id = ?"""
+    DELETE_EXPIRED_CHAT_STATES = """DELETE FROM chat_states WHERE expires_at <= ?"""
+
+    SELECT_FILE_ID_BY_KEY = """SELECT file_id FROM photo_cache WHERE key = ?"""
+    SAVE_FILE_ID = """INSERT OR REPLACE INTO photo_cache (key, file_id) VALUES (?, ?)"""
+    DELETE_FILE_ID_BY_KEY = """DELETE FROM photo_cache WHERE key = ?"""
+
+    SELECT_CACHED_MOVE = """SELECT uci, used_at FROM move_cache WHERE zobrist = ? AND level = ?"""
+    SAVE_CACHED_MOVE = """INSERT OR REPLACE INTO move_cache (zobrist, level, uci, used_at) VALUES (?, ?, ?, ?)"""
+    TOUCH_CACHED_MOVE = """UPDATE move_cache SET used_at = ? WHERE zobrist = ? AND level = ?"""
+    COUNT_CACHED_MOVES = """SELECT COUNT(*) FROM move_cache"""
+    EVICT_CACHED_MOVES = """DELETE FROM move_cache WHERE rowid IN (SELECT rowid FROM move_cache ORDER BY used_at LIMIT ?)"""
+
+    # Миграции схемы по порядку: номер версии базы (PRAGMA user_version) - сколько из них применено.
+    # Уже выпущенные миграции не меняются, новые изменения схемы дописываются в конец.
+    MIGRATIONS = [
+        # 1: основные таблицы и служебные кеши
+        [
+            """CREATE TABLE IF NOT EXISTS profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, "win" INTEGER DEFAULT 0, "draw" INTEGER DEFAULT 0, "lose" INTEGER DEFAULT 0, tg_id TEXT UNIQUE)""",
+            """CREATE TABLE IF NOT EXISTS games (id INTEGER PRIMARY KEY AUTOINCREMENT, player1 INTEGER NOT NULL, status TEXT NOT NULL, description TEXT, fen TEXT NOT NULL, level TEXT DEFAULT 'средний', FOREIGN KEY (player1) REFERENCES profiles(id))""",
+            """CREATE TABLE IF NOT EXISTS photo_cache (key TEXT PRIMARY KEY, file_id TEXT NOT NULL)""",
+            """CREATE TABLE IF NOT EXISTS move_cache (zobrist INTEGER NOT NULL, level TEXT NOT NULL, uci TEXT NOT NULL, used_at REAL NOT NULL, PRIMARY KEY (zobrist, level))""",
+            """CREATE INDEX IF NOT EXISTS move_cache_used_at ON move_cache (used_at)""",
+            """CREATE TABLE IF NOT EXISTS game_origins (game_id INTEGER PRIMARY KEY, fen TEXT NOT NULL)""",
+            """CREATE TABLE IF NOT EXISTS moves (game_id INTEGER NOT NULL, ply INTEGER NOT NULL, uci TEXT NOT NULL, PRIMARY KEY (game_id, ply))""",
+        ],
+        # 2: индексы для поиска профилей и игр; tg_id уже уникален через UNIQUE в таблице
+        [
+            """CREATE UNIQUE INDEX IF NOT EXISTS profiles_username ON profiles (username)""",
+            """CREATE INDEX IF NOT EXISTS games_player1_status ON games (player1, status)""",
+        ],
+        # 3: один статус незаконченной игры, чтобы список игр читался по индексу уже в порядке id
+        [
+            """UPDATE games SET status = 'in progres' WHERE status = 'in progress'""",
+        ],
+        # 4: состояния диалогов вместо next-step обработчиков в памяти
+        [
+            """CREATE TABLE IF NOT EXISTS chat_states (chat_id INTEGER PRIMARY KEY, state TEXT NOT NULL, game_id INTEGER, data TEXT, expires_at REAL NOT NULL)""",
+            """CREATE INDEX IF NOT EXISTS chat_states_expires_at ON chat_states (expires_at)""",
+        ],
+        # 5: игры игрока по порядку id без сортировки, для выгрузки PGN
+        [
+            """CREATE INDEX IF NOT EXISTS games_player1 ON games (player1)""",
+        ],
+        # 6: оценки позиций из пакетного анализа; analyzed_games - отметки о готовых играх для продолжения прерванного анализа
+        [
+            """CREATE TABLE IF NOT EXISTS move_evals (game_id INTEGER NOT NULL, ply INTEGER NOT NULL, cp INTEGER NOT NULL, mate INTEGER, best TEXT, PRIMARY KEY (game_id, ply))""",
+            """CREATE TABLE IF NOT EXISTS analyzed_games (game_id INTEGER PRIMARY KEY, analyzed_at REAL NOT NULL)""",
+        ],
+    ]
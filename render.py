@@ -0,0 +1,204 @@
+import io
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import chess
+
+from config import RENDER_CACHE_BYTES, RENDER_BACKEND
+from metrics import STAGE_SECONDS
+
+# Ключ картинки: (расстановка фигур, последний ход, клетка шаха, ориентация доски, размер)
+RenderKey = Tuple[str, Optional[str], Optional[int], bool, Optional[int]]
+
+# Стиль отрисовки входит в ключ file_id, чтобы смена оформления не отдавала старые картинки
+RENDER_STYLE: str = RENDER_BACKEND
+
+
+class RenderCache:
+    """
+    LRU-кеш готовых PNG-изображений доски, ограниченный суммарным размером в байтах.
+
+    Одинаковые позиции (начальная, популярные ответы) в разных играх
+    рисуются один раз, а дальше отдаются из памяти.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        """
+        Инициализирует кеш.
+
+        Args:
+            max_bytes (int): Максимальный суммарный размер изображений в кеше
+        """
+        self.max_bytes: int = max_bytes
+        self._items: "OrderedDict[RenderKey, bytes]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.size: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get_or_render(self, key: RenderKey, render: Callable[[], bytes]) -> bytes:
+        """
+        Возвращает изображение из кеша или рисует его и сохраняет.
+
+        Args:
+            key (RenderKey): Ключ изображения
+            render (Callable[[], bytes]): Функция, рисующая изображение при промахе
+
+        Returns:
+            bytes: PNG-изображение
+        """
+        with self._lock:
+            image: Optional[bytes] = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        # Рисуем вне блокировки, чтобы не задерживать другие потоки
+        image = render()
+        with self._lock:
+            if key not in self._items and len(image) <= self.max_bytes:
+                self._items[key] = image
+                self.size += len(image)
+                while self.size > self.max_bytes:
+                    _, evicted = self._items.popitem(last=False)
+                    self.size -= len(evicted)
+        return image
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики кеша.
+
+        Returns:
+            Dict[str, Any]: Количество записей, занятый объем, попадания и промахи
+        """
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+render_cache = RenderCache(RENDER_CACHE_BYTES)
+
+
+def board_key(board: chess.Board, lastmove: Optional[chess.Move] = None,
+              orientation: bool = chess.WHITE, size: Optional[int] = None) -> RenderKey:
+    """
+    Строит ключ кеша для изображения доски.
+
+    Args:
+        board (chess.Board): Шахматная доска
+        lastmove (Optional[chess.Move]): Последний ход для подсветки
+        orientation (bool): Сторона, которая находится снизу
+        size (Optional[int]): Размер изображения в пикселях, None - размер по умолчанию
+
+    Returns:
+        RenderKey: Ключ изображения
+    """
+    return (board.board_fen(), lastmove.uci() if lastmove else None, check_square(board), orientation, size)
+
+
+def check_square(board: chess.Board) -> Optional[chess.Square]:
+    """
+    Возвращает клетку короля, которому объявлен шах.
+
+    Args:
+        board (chess.Board): Шахматная доска
+
+    Returns:
+        Optional[chess.Square]: Клетка короля под шахом или None
+    """
+    return board.king(board.turn) if board.is_check() else None
+
+
+def key_to_str(key: RenderKey) -> str:
+    """
+    Превращает ключ картинки в строку для хранения в базе вместе со стилем отрисовки.
+
+    Args:
+        key (RenderKey): Ключ картинки
+
+    Returns:
+        str: Строковый ключ
+    """
+    return "|".join([RENDER_STYLE] + [str(part) for part in key])
+
+
+def render_svg_png(board: chess.Board, lastmove: Optional[chess.Move] = None,
+                   orientation: bool = chess.WHITE, size: Optional[int] = None) -> bytes:
+    """
+    Рисует доску в PNG в памяти через chess.svg, svglib и reportlab.
+
+    Args:
+        board (chess.Board): Шахматная доска
+        lastmove (Optional[chess.Move]): Последний ход для подсветки
+        orientation (bool): Сторона, которая находится снизу
+        size (Optional[int]): Размер изображения в пикселях
+
+    Returns:
+        bytes: PNG-изображение
+    """
+    # Тяжелые библиотеки нужны только этому способу отрисовки
+    import chess.svg
+    from svglib.svglib import svg2rlg
+    from reportlab.graphics import renderPM
+
+    svg_data: str = chess.svg.board(board=board, lastmove=lastmove, check=check_square(board),
+                                    orientation=orientation, size=size)
+    drawing = svg2rlg(io.BytesIO(svg_data.encode("utf-8")))
+    return renderPM.drawToString(drawing, fmt="PNG")
+
+
+def render_sprite_png(board: chess.Board, lastmove: Optional[chess.Move] = None,
+                      orientation: bool = chess.WHITE, size: Optional[int] = None) -> bytes:
+    """
+    Рисует доску в PNG из готовых спрайтов средствами Pillow.
+
+    Args:
+        board (chess.Board): Шахматная доска
+        lastmove (Optional[chess.Move]): Последний ход для подсветки
+        orientation (bool): Сторона, которая находится снизу
+        size (Optional[int]): Размер изображения в пикселях
+
+    Returns:
+        bytes: PNG-изображение
+    """
+    from fast_render import DEFAULT_SIZE, get_renderer
+
+    return get_renderer(size or DEFAULT_SIZE).render(board, lastmove, orientation, check_square(board))
+
+
+RENDERERS: Dict[str, Callable[..., bytes]] = {
+    "svg": render_svg_png,
+    "pillow": render_sprite_png,
+}
+render_png: Callable[..., bytes] = RENDERERS[RENDER_BACKEND]
+
+
+def board_png(board: chess.Board, lastmove: Optional[chess.Move] = None,
+              orientation: bool = chess.WHITE, size: Optional[int] = None) -> bytes:
+    """
+    Возвращает PNG-изображение доски, используя кеш.
+
+    Args:
+        board (chess.Board): Шахматная доска
+        lastmove (Optional[chess.Move]): Последний ход для подсветки
+        orientation (bool): Сторона, которая находится снизу
+        size (Optional[int]): Размер изображения в пикселях
+
+    Returns:
+        bytes: PNG-изображение
+    """
+    key: RenderKey = board_key(board, lastmove, orientation, size)
+
+    def draw() -> bytes:
+        with STAGE_SECONDS.time(stage="draw"):
+            return render_png(board, lastmove, orientation, size)
+
+    return render_cache.get_or_render(key, draw)
@@ -0,0 +1,241 @@
+import argparse
+import sys
+import tempfile
+from functools import lru_cache
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import chess
+from PIL import GifImagePlugin, Image
+
+from DataBase import DataBase
+from fast_render import COLORS, DEFAULT_SIZE, PIECE_ORDER, SpriteRenderer, get_renderer
+from render import check_square
+
+# Анимация партии в GIF по журналу ходов. Первый кадр - вся доска, каждый
+# следующий - только прямоугольник вокруг клеток, изменившихся за ход: они
+# перерисовываются в одном и том же буфере кадра и сразу кодируются в поток,
+# поэтому память не зависит от длины партии.
+#
+#   python replay.py --game-id 42 -o game42.gif
+
+# Сколько миллисекунд показывается каждый ход и финальная позиция
+FRAME_MS: int = 700
+LAST_FRAME_MS: int = 3000
+
+# Битборды BaseBoard, по которым видно, какие клетки изменились
+PIECE_MASKS: Tuple[str, ...] = ("pawns", "knights", "bishops", "rooks", "queens", "kings")
+
+
+def changed_squares(before: chess.BaseBoard, after: chess.BaseBoard) -> chess.SquareSet:
+    """
+    Находит клетки, на которых фигуры различаются (включая рокировку и взятие на проходе).
+
+    Args:
+        before (chess.BaseBoard): Позиция до хода
+        after (chess.BaseBoard): Позиция после хода
+
+    Returns:
+        chess.SquareSet: Изменившиеся клетки
+    """
+    mask: int = (before.occupied_co[chess.WHITE] ^ after.occupied_co[chess.WHITE]) | \
+        (before.occupied_co[chess.BLACK] ^ after.occupied_co[chess.BLACK])
+    for name in PIECE_MASKS:
+        mask |= getattr(before, name) ^ getattr(after, name)
+    return chess.SquareSet(mask)
+
+
+@lru_cache(maxsize=None)
+def palette_image(renderer: SpriteRenderer) -> Image.Image:
+    """
+    Подбирает общую палитру GIF по рамке и всем вариантам клеток рендерера.
+
+    Все кадры квантуются в одну палитру, поэтому кусок кадра можно
+    закодировать отдельно и положить поверх предыдущего.
+
+    Args:
+        renderer (SpriteRenderer): Рендерер доски
+
+    Returns:
+        Image.Image: Изображение в режиме P с палитрой
+    """
+    keys = [(symbol, light, highlighted, check)
+            for symbol in [None] + list(PIECE_ORDER) for light, highlighted in COLORS
+            for check in (False, True) if not check or symbol in ("K", "k")]
+    sheet: Image.Image = Image.new("RGB", (renderer.size + len(keys) * renderer.square, renderer.size))
+    sheet.paste(renderer.frames[chess.WHITE], (0, 0))
+    for index, key in enumerate(keys):
+        sheet.paste(renderer.tile(key), (renderer.size + index * renderer.square, 0))
+    return sheet.quantize(colors=256)
+
+
+def to_palette(image: Image.Image, palette: Image.Image) -> Image.Image:
+    """
+    Переводит RGB-изображение в общую палитру без дизеринга.
+
+    Args:
+        image (Image.Image): RGB-изображение
+        palette (Image.Image): Изображение с палитрой
+
+    Returns:
+        Image.Image: Изображение в режиме P
+    """
+    return image.quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+def iter_regions(board: chess.Board, moves: Sequence[chess.Move], renderer: SpriteRenderer,
+                 orientation: bool = chess.WHITE) -> Iterator[Tuple[Image.Image, Tuple[int, int]]]:
+    """
+    Выдает кадры партии: первый - вся доска, затем изменившиеся части доски.
+
+    Кадр рисуется в одном буфере: на каждом ходу перерисовываются только
+    клетки, где сменилась фигура, подсветка последнего хода или шах.
+
+    Args:
+        board (chess.Board): Начальная позиция, изменяется по ходу партии
+        moves (Sequence[chess.Move]): Ходы партии
+        renderer (SpriteRenderer): Рендерер доски
+        orientation (bool): Сторона, которая находится снизу
+
+    Yields:
+        Tuple[Image.Image, Tuple[int, int]]: RGB-кусок кадра и его левый верхний угол
+    """
+    check: Optional[chess.Square] = check_square(board)
+    frame: Image.Image = renderer.draw(board, None, orientation, check)
+    yield frame, (0, 0)
+
+    highlighted: Tuple[chess.Square, ...] = ()
+    for move in moves:
+        before: chess.BaseBoard = board.copy(stack=False)
+        board.push(move)
+        new_check: Optional[chess.Square] = check_square(board)
+        new_highlighted: Tuple[chess.Square, ...] = (move.from_square, move.to_square)
+
+        dirty: chess.SquareSet = changed_squares(before, board)
+        for square in highlighted + new_highlighted + (check, new_check):
+            if square is not None:
+                dirty.add(square)
+        highlighted, check = new_highlighted, new_check
+
+        left = top = renderer.size
+        right = bottom = 0
+        for square in dirty:
+            x, y = renderer.square_box(square, orientation)
+            frame.paste(renderer.tile(renderer.tile_key(board, square, highlighted, check)), (x, y))
+            left, top = min(left, x), min(top, y)
+            right, bottom = max(right, x + renderer.square), max(bottom, y + renderer.square)
+        yield frame.crop((left, top, right, bottom)), (left, top)
+
+
+def iter_gif(regions: Iterable[Tuple[Image.Image, Tuple[int, int]]], palette: Image.Image,
+             frame_ms: int = FRAME_MS, last_ms: int = LAST_FRAME_MS) -> Iterator[bytes]:
+    """
+    Кодирует кадры в GIF по одному.
+
+    Задержка записывается в заголовок кадра, поэтому кадр кодируется, когда
+    известен следующий: последний получает задержку last_ms.
+
+    Args:
+        regions (Iterable[Tuple[Image.Image, Tuple[int, int]]]): Куски кадров и их координаты
+        palette (Image.Image): Изображение с общей палитрой
+        frame_ms (int): Задержка обычного кадра, миллисекунды
+        last_ms (int): Задержка последнего кадра, миллисекунды
+
+    Yields:
+        bytes: Части GIF-файла
+    """
+    pending: Optional[Tuple[Image.Image, Tuple[int, int]]] = None
+    for image, offset in regions:
+        indexed: Image.Image = to_palette(image, palette)
+        if pending is None:
+            header, _ = GifImagePlugin.getheader(indexed, info={"loop": 0, "duration": frame_ms})
+            yield b"".join(header)
+        else:
+            yield b"".join(GifImagePlugin.getdata(pending[0], offset=pending[1], duration=frame_ms))
+        pending = indexed, offset
+    if pending is not None:
+        yield b"".join(GifImagePlugin.getdata(pending[0], offset=pending[1], duration=last_ms))
+    yield b";"
+
+
+def replay_gif(origin: str, ucis: Sequence[str], out: IO[bytes], size: int = DEFAULT_SIZE,
+               orientation: bool = chess.WHITE) -> int:
+    """
+    Записывает анимацию партии в поток.
+
+    Args:
+        origin (str): FEN начальной позиции журнала ходов
+        ucis (Sequence[str]): Ходы в формате UCI
+        out (IO[bytes]): Поток для записи
+        size (int): Размер доски в пикселях
+        orientation (bool): Сторона, которая находится снизу
+
+    Returns:
+        int: Количество ходов в анимации
+    """
+    board: chess.Board = chess.Board(origin)
+    moves: List[chess.Move] = []
+    replayed: chess.Board = board.copy(stack=False)
+    for uci in ucis:
+        move: chess.Move = chess.Move.from_uci(uci)
+        if not replayed.is_legal(move):
+            # Журнал поврежден: показываем партию до этого хода
+            break
+        replayed.push(move)
+        moves.append(move)
+
+    renderer: SpriteRenderer = get_renderer(size)
+    for chunk in iter_gif(iter_regions(board, moves, renderer, orientation), palette_image(renderer)):
+        out.write(chunk)
+    return len(moves)
+
+
+def replay_file(origin: str, ucis: Sequence[str]) -> Tuple[IO[bytes], int]:
+    """
+    Рисует анимацию партии во временный файл для отправки.
+
+    Args:
+        origin (str): FEN начальной позиции журнала ходов
+        ucis (Sequence[str]): Ходы в формате UCI
+
+    Returns:
+        Tuple[IO[bytes], int]: Открытый файл, перемотанный в начало, и количество ходов
+    """
+    out: IO[bytes] = tempfile.TemporaryFile()
+    try:
+        count: int = replay_gif(origin, ucis, out)
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out, count
+
+
+def main() -> None:
+    """
+    Записывает анимацию игры в файл.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Анимация партии GigaChess в GIF")
+    parser.add_argument("--db", default="GigaBase.db")
+    parser.add_argument("--game-id", type=int, required=True, help="ID игры")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="Размер доски в пикселях")
+    parser.add_argument("-o", "--output", required=True, help="Файл .gif")
+    args = parser.parse_args()
+
+    db: DataBase = DataBase(args.db)
+    # Журнал ходов живет в таблицах, которых может не быть в старой базе
+    db.migrate()
+    log = db.load_moves(args.game_id)
+    if log is False:
+        sys.exit(f"Не удалось прочитать журнал ходов игры {args.game_id}")
+    if not log:
+        sys.exit(f"У игры {args.game_id} нет журнала ходов")
+    with open(args.output, "wb") as out:
+        count: int = replay_gif(log[0], log[1], out, args.size)
+    print(f"Ходов в анимации: {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
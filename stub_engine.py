@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import os
+import random
+import sys
+import time
+from typing import List
+
+import chess
+
+# Заглушка UCI-движка для нагрузочных тестов: отвечает случайным легальным ходом.
+# Время "поиска" задается переменной окружения GIGACHESS_STUB_DELAY_MS.
+# Поддерживает go ponder: ответ на ponderhit приходит сразу, без задержки.
+
+OPTIONS: List[str] = [
+    "option name Threads type spin default 1 min 1 max 1024",
+    "option name Hash type spin default 16 min 1 max 33554432",
+    "option name Ponder type check default false",
+    "option name Skill Level type spin default 20 min 0 max 20",
+    "option name UCI_LimitStrength type check default false",
+    "option name UCI_Elo type spin default 1320 min 1320 max 3190",
+]
+
+
+def parse_position(args: List[str]) -> chess.Board:
+    """
+    Разбирает аргументы команды position.
+
+    Args:
+        args (List[str]): Аргументы после слова position
+
+    Returns:
+        chess.Board: Позиция после всех ходов
+    """
+    moves: List[str] = []
+    if "moves" in args:
+        index: int = args.index("moves")
+        moves = args[index + 1:]
+        args = args[:index]
+    board: chess.Board = chess.Board() if args[0] == "startpos" else chess.Board(" ".join(args[1:]))
+    for uci in moves:
+        board.push_uci(uci)
+    return board
+
+
+def material(board: chess.Board) -> int:
+    """
+    Оценивает позицию разницей материала с точки зрения стороны, которая ходит.
+
+    Args:
+        board (chess.Board): Позиция
+
+    Returns:
+        int: Оценка в сантипешках
+    """
+    score: int = 0
+    for piece_type, value in ((chess.PAWN, 100), (chess.KNIGHT, 300), (chess.BISHOP, 300),
+                              (chess.ROOK, 500), (chess.QUEEN, 900)):
+        score += value * (len(board.pieces(piece_type, board.turn)) - len(board.pieces(piece_type, not board.turn)))
+    return score
+
+
+def main() -> None:
+    """
+    Читает команды UCI из stdin и отвечает в stdout.
+
+    Returns:
+        None
+    """
+    delay: float = float(os.environ.get("GIGACHESS_STUB_DELAY_MS", "20")) / 1000
+    rng: random.Random = random.Random()
+    board: chess.Board = chess.Board()
+    # Ответ обдумывания, который отправляется по ponderhit или stop
+    pondering: str = ""
+
+    for line in sys.stdin:
+        command: List[str] = line.split()
+        if not command:
+            continue
+        if command[0] == "uci":
+            print("id name GigaChess stub")
+            print("\n".join(OPTIONS))
+            print("uciok", flush=True)
+        elif command[0] == "isready":
+            print("readyok", flush=True)
+        elif command[0] == "position":
+            board = parse_position(command[1:])
+        elif command[0] == "go":
+            answer: str = "bestmove (none)"
+            if any(board.legal_moves):
+                move: chess.Move = rng.choice(list(board.legal_moves))
+                answer = f"bestmove {move.uci()}"
+                board.push(move)
+                if any(board.legal_moves):
+                    answer += f" ponder {rng.choice(list(board.legal_moves)).uci()}"
+                board.pop()
+            if "ponder" in command[1:]:
+                pondering = answer
+                continue
+            time.sleep(delay)
+            print(f"info depth 1 score cp {material(board)}")
+            print(answer, flush=True)
+        elif command[0] in ("ponderhit", "stop") and pondering:
+            print(f"info depth 1 score cp {material(board)}")
+            print(pondering, flush=True)
+            pondering = ""
+        elif command[0] == "quit":
+            break
+
+
+if __name__ == "__main__":
+    main()
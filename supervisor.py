@@ -0,0 +1,498 @@
+import argparse
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import telebot
+
+from DataBase import DataBase
+from config import BOT_TOKEN, DB_PATH, DB_SYNCHRONOUS, DB_CACHE_SIZE, ENGINE_POOL_SIZE, RENDER_WORKERS, DISPATCH_WORKERS, DISPATCH_PRIORITY_WORKERS, METRICS_PORT, METRICS_LOG_INTERVAL, SUPERVISOR_WORKERS, SUPERVISOR_QUEUE_SIZE, SUPERVISOR_RESTART_DELAY, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+from metrics import REGISTRY
+from webhook import WebhookServer, update_chat_id
+
+# Бот в нескольких процессах: supervisor забирает обновления (long polling или
+# webhook) и раздает их процессам-обработчикам по chat.id, поэтому разговор
+# одного чата всегда идет в одном процессе и по порядку. Каждый процесс - это
+# обычный GigaChess со своими движками и кешами, общая у них только база SQLite
+# (WAL, ожидание блокировки задается busy_timeout). Упавший процесс
+# перезапускается: обновления из его очереди в supervisor дождутся нового
+# процесса, теряются только те, что уже были переданы упавшему. Лимиты движков
+# и потоков из config.py - общие на все процессы и делятся между ними. Сам
+# supervisor обновления не обрабатывает и GigaChess не импортирует.
+#
+#   python supervisor.py --workers 4
+
+logger = logging.getLogger(__name__)
+
+# Типы обновлений, которые обрабатывает бот
+ALLOWED_UPDATES: List[str] = ["message", "callback_query"]
+
+# Общие лимиты, которые делятся между процессами-обработчиками: переменная окружения и значение из config.py
+SHARED_LIMITS: Dict[str, int] = {
+    "GIGACHESS_ENGINE_POOL_SIZE": ENGINE_POOL_SIZE,
+    "GIGACHESS_RENDER_WORKERS": RENDER_WORKERS,
+    "GIGACHESS_DISPATCH_WORKERS": DISPATCH_WORKERS,
+    "GIGACHESS_DISPATCH_PRIORITY_WORKERS": DISPATCH_PRIORITY_WORKERS,
+}
+
+
+def shard_limits(workers: int) -> Dict[str, str]:
+    """
+    Делит общие лимиты движков и потоков между процессами-обработчиками.
+
+    Каждому процессу достается хотя бы один движок и поток, 0 сохраняет свой
+    смысл (например, стандартная обработка TeleBot без диспетчера).
+
+    Args:
+        workers (int): Количество процессов-обработчиков
+
+    Returns:
+        Dict[str, str]: Переменные окружения с лимитами одного процесса
+    """
+    return {name: str(0 if total == 0 else max(1, total // workers)) for name, total in SHARED_LIMITS.items()}
+
+
+def worker_main(index: int, updates: multiprocessing.connection.Connection, api_url: str) -> None:
+    """
+    Процесс-обработчик: принимает обновления своих чатов и передает их боту.
+
+    Args:
+        index (int): Номер процесса
+        updates (multiprocessing.connection.Connection): Канал обновлений, None - остановка
+        api_url (str): Адрес Bot API, как у supervisor
+
+    Returns:
+        None
+    """
+    # Ctrl+C получает вся группа процессов, останавливает обработчиков supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s %(levelname)s worker-{index} %(name)s: %(message)s")
+    telebot.apihelper.API_URL = api_url
+    # Бот, движки и потоки создаются только в процессах-обработчиках
+    import GigaChess
+
+    if index == 0:
+        # Список команд нужен Telegram один раз, его отправляет первый процесс
+        GigaChess.register_commands()
+    GigaChess.register_metrics()
+    if METRICS_PORT > 0:
+        REGISTRY.serve(METRICS_PORT + 1 + index)
+    if METRICS_LOG_INTERVAL > 0:
+        REGISTRY.log_periodically(METRICS_LOG_INTERVAL)
+    GigaChess.pool.warm_up()
+    try:
+        while True:
+            try:
+                update: Optional[Dict[str, Any]] = updates.recv()
+            except EOFError:
+                # supervisor завершился, не остановив процесс
+                break
+            if update is None:
+                break
+            try:
+                GigaChess.bot.process_new_updates([telebot.types.Update.de_json(update)])
+            except Exception:
+                logger.exception("Ошибка при обработке обновления %s", update.get("update_id"))
+    finally:
+        if GigaChess.dispatcher is not None:
+            GigaChess.dispatcher.shutdown()
+        GigaChess.pool.close()
+
+
+class Shard:
+    """
+    Процесс-обработчик и очередь обновлений его чатов.
+
+    Очередь живет в supervisor, а в процесс обновления передает поток-питатель
+    через канал. Если процесс упал, питатель ждет перезапуска и продолжает
+    с того же обновления.
+    """
+
+    def __init__(self, index: int, queue_size: int) -> None:
+        """
+        Инициализирует шард без процесса.
+
+        Args:
+            index (int): Номер шарда
+            queue_size (int): Емкость очереди обновлений
+        """
+        self.index: int = index
+        self.updates: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn: Optional[multiprocessing.connection.Connection] = None
+        self.started: float = 0.0
+        self.restarts: int = 0
+        # Процессу отправлена команда остановки, его завершение - не падение
+        self.done: bool = False
+        self.changed: threading.Condition = threading.Condition()
+
+
+class Supervisor:
+    """
+    Запускает процессы-обработчики, раздает им обновления по chat.id и
+    перезапускает упавшие.
+    """
+
+    def __init__(self, workers: int, queue_size: int = 1000, restart_delay: float = 1.0) -> None:
+        """
+        Инициализирует supervisor. Процессы запускаются в start().
+
+        Args:
+            workers (int): Количество процессов-обработчиков
+            queue_size (int): Емкость очереди обновлений одного процесса
+            restart_delay (float): Не перезапускать процесс чаще, чем раз в столько секунд
+        """
+        self.restart_delay: float = restart_delay
+        # spawn: у supervisor работают потоки, fork скопировал бы их блокировки
+        self._context = multiprocessing.get_context("spawn")
+        self.shards: List[Shard] = [Shard(index, queue_size) for index in range(max(1, workers))]
+        self.limits: Dict[str, str] = shard_limits(len(self.shards))
+        self._threads: List[threading.Thread] = []
+        self._lock: threading.Lock = threading.Lock()
+        # closing - прекратить прием обновлений, halted - процессы остановлены
+        self.closing: threading.Event = threading.Event()
+        self._halted: threading.Event = threading.Event()
+        self.received: int = 0
+        self.rejected: int = 0
+
+    def _spawn(self, shard: Shard) -> None:
+        """
+        Запускает процесс шарда с новым каналом.
+
+        Args:
+            shard (Shard): Шард
+
+        Returns:
+            None
+        """
+        reader, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=worker_main, args=(shard.index, reader, telebot.apihelper.API_URL),
+                                        name=f"gigachess-worker-{shard.index}")
+        process.start()
+        # Копия читающего конца остается только у процесса: если он упадет, запись получит ошибку
+        reader.close()
+        with shard.changed:
+            shard.process, shard.conn, shard.started = process, writer, time.monotonic()
+            shard.changed.notify_all()
+
+    def _feed(self, shard: Shard) -> None:
+        """
+        Передает обновления из очереди шарда в его процесс.
+
+        Args:
+            shard (Shard): Шард
+
+        Returns:
+            None
+        """
+        while True:
+            update: Optional[Dict[str, Any]] = shard.updates.get()
+            while True:
+                with shard.changed:
+                    conn: multiprocessing.connection.Connection = shard.conn
+                try:
+                    conn.send(update)
+                    break
+                except (OSError, ValueError):
+                    # Процесс упал: ждем, пока монитор запустит новый, и повторяем
+                    with shard.changed:
+                        while shard.conn is conn and not self._halted.is_set():
+                            shard.changed.wait()
+                        if self._halted.is_set():
+                            return
+            if update is None:
+                with shard.changed:
+                    shard.done = True
+                return
+
+    def _monitor(self) -> None:
+        """
+        Перезапускает упавшие процессы, в том числе во время остановки, чтобы
+        принятые обновления были обработаны.
+
+        Returns:
+            None
+        """
+        while not self._halted.wait(0.5):
+            for shard in self.shards:
+                if (shard.done or shard.process.is_alive()
+                        or time.monotonic() - shard.started < self.restart_delay):
+                    continue
+                with self._lock:
+                    if self._halted.is_set():
+                        return
+                    logger.warning("Процесс-обработчик %s завершился с кодом %s, перезапуск",
+                                   shard.index, shard.process.exitcode)
+                    shard.restarts += 1
+                    shard.conn.close()
+                    self._spawn(shard)
+
+    def start(self) -> None:
+        """
+        Запускает процессы-обработчики, их питатели и монитор.
+
+        Returns:
+            None
+        """
+        # Процесс, запущенный через spawn, получает окружение supervisor и читает config.py заново
+        os.environ.update(self.limits)
+        logger.info("Лимиты одного процесса: %s", self.limits)
+        for shard in self.shards:
+            self._spawn(shard)
+            thread: threading.Thread = threading.Thread(target=self._feed, args=(shard,),
+                                                        name=f"feed-{shard.index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self._monitor, name="supervisor-monitor", daemon=True).start()
+
+    def offer(self, update: Dict[str, Any], block: bool = False) -> bool:
+        """
+        Кладет обновление в очередь процесса, который обслуживает его чат.
+
+        Args:
+            update (Dict[str, Any]): Обновление в формате Bot API
+            block (bool): Ждать ли места в очереди
+
+        Returns:
+            bool: True, если обновление принято, False, если очередь переполнена или прием остановлен
+        """
+        shard: Shard = self.shards[update_chat_id(update) % len(self.shards)]
+        try:
+            if self.closing.is_set():
+                # Команда остановки уже в очередях, обновление после нее никто не обработает
+                raise queue.Full
+            shard.updates.put(update, block=block)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.received += 1
+        return True
+
+    def poll(self, timeout: int = 20) -> None:
+        """
+        Забирает обновления через getUpdates, пока не вызван stop() или не установлен closing.
+
+        Если очереди процессов заполнены, новые обновления не запрашиваются:
+        они подождут на стороне Telegram.
+
+        Args:
+            timeout (int): Время long polling, секунды
+
+        Returns:
+            None
+        """
+        offset: int = 0
+        while not self.closing.is_set():
+            try:
+                updates: List[Dict[str, Any]] = telebot.apihelper.get_updates(
+                    BOT_TOKEN, offset or None, None, timeout, ALLOWED_UPDATES, timeout)
+            except Exception as E:
+                logger.warning("Ошибка getUpdates: %s", E)
+                self.closing.wait(1)
+                continue
+            for update in updates:
+                if not self.offer(update, block=True):
+                    # Прием остановлен: без подтверждения offset Telegram отдаст обновление снова
+                    return
+                offset = update["update_id"] + 1
+
+    def serve_webhook(self, host: str, port: int, path: str, secret: str = "") -> "ShardedWebhook":
+        """
+        Запускает прием обновлений через webhook с раздачей по процессам.
+
+        Args:
+            host (str): Адрес, на котором слушает сервер
+            port (int): Порт
+            path (str): Путь, на который Telegram отправляет обновления
+            secret (str): Секрет из setWebhook(secret_token), пустая строка - не проверять
+
+        Returns:
+            ShardedWebhook: Запущенный сервер
+        """
+        server: ShardedWebhook = ShardedWebhook(self, host, port, path, secret)
+        server.start()
+        return server
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """
+        Останавливает процессы, дождавшись обработки уже принятых обновлений.
+
+        Args:
+            timeout (float): Сколько секунд ждать завершения процессов, потом они завершаются принудительно
+
+        Returns:
+            None
+        """
+        self.closing.set()
+        for shard in self.shards:
+            shard.updates.put(None)
+        deadline: float = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            self._halted.set()
+        for shard in self.shards:
+            with shard.changed:
+                shard.changed.notify_all()
+            shard.process.join(max(0.0, deadline - time.monotonic()))
+            if shard.process.is_alive():
+                logger.warning("Процесс-обработчик %s не завершился, остановка", shard.index)
+                shard.process.terminate()
+                shard.process.join()
+            shard.conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние процессов и очередей.
+
+        Returns:
+            Dict[str, Any]: Количество процессов, живых процессов, перезапусков,
+                принятых и отклоненных обновлений, глубина очередей
+        """
+        with self._lock:
+            return {
+                "workers": len(self.shards),
+                "alive": sum(1 for shard in self.shards if shard.process is not None and shard.process.is_alive()),
+                "restarts": sum(shard.restarts for shard in self.shards),
+                "received": self.received,
+                "rejected": self.rejected,
+                "queued": sum(shard.updates.qsize() for shard in self.shards),
+            }
+
+
+class ShardedWebhook(WebhookServer):
+    """
+    Webhook-сервер supervisor: принятые обновления уходят в очереди процессов-обработчиков.
+    """
+
+    def __init__(self, supervisor: Supervisor, host: str, port: int, path: str, secret: str = "") -> None:
+        """
+        Инициализирует сервер. Прием начинается после start().
+
+        Args:
+            supervisor (Supervisor): Supervisor, который раздает обновления
+            host (str): Адрес, на котором слушает сервер
+            port (int): Порт
+            path (str): Путь, на который Telegram отправляет обновления
+            secret (str): Секрет из setWebhook(secret_token), пустая строка - не проверять
+        """
+        super().__init__(None, host, port, path, secret, queue_size=1, workers=1)
+        self.supervisor: Supervisor = supervisor
+
+    def offer(self, update: Dict[str, Any]) -> bool:
+        """
+        Кладет обновление в очередь процесса его чата, не дожидаясь места.
+
+        Args:
+            update (Dict[str, Any]): Обновление в формате Bot API
+
+        Returns:
+            bool: True, если обновление принято, False, если очередь переполнена
+        """
+        accepted: bool = self.supervisor.offer(update)
+        with self._lock:
+            if accepted:
+                self.received += 1
+            else:
+                self.rejected += 1
+        return accepted
+
+    def start(self) -> None:
+        """
+        Запускает HTTP-сервер в фоне, обработчики работают в процессах supervisor.
+
+        Returns:
+            None
+        """
+        threading.Thread(target=self.http.serve_forever, name="webhook-http", daemon=True).start()
+
+    def stop(self) -> None:
+        """
+        Останавливает прием обновлений.
+
+        Returns:
+            None
+        """
+        self.http.shutdown()
+        self.http.server_close()
+
+
+def register_metrics(supervisor: Supervisor) -> None:
+    """
+    Регистрирует метрики supervisor.
+
+    Args:
+        supervisor (Supervisor): Supervisor
+
+    Returns:
+        None
+    """
+    REGISTRY.register("gigachess_supervisor_workers", "gauge", "Процессы-обработчики по состоянию",
+                      lambda: {(("state", "alive"),): supervisor.stats()["alive"],
+                               (("state", "configured"),): supervisor.stats()["workers"]})
+    REGISTRY.register("gigachess_supervisor_restarts_total", "counter", "Перезапуски упавших процессов-обработчиков",
+                      lambda: {(): supervisor.stats()["restarts"]})
+    REGISTRY.register("gigachess_supervisor_updates_total", "counter", "Обновления, розданные процессам",
+                      lambda: {(("result", result),): supervisor.stats()[result] for result in ("received", "rejected")})
+    REGISTRY.register("gigachess_supervisor_queued", "gauge", "Обновления в очередях процессов",
+                      lambda: {(): supervisor.stats()["queued"]})
+
+
+def main() -> None:
+    """
+    Запускает бота в нескольких процессах.
+
+    Метрики supervisor доступны на GIGACHESS_METRICS_PORT, метрики процесса N -
+    на порту GIGACHESS_METRICS_PORT + 1 + N.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="GigaChess в нескольких процессах")
+    parser.add_argument("--workers", type=int, default=SUPERVISOR_WORKERS, help="Количество процессов-обработчиков")
+    args = parser.parse_args()
+
+    if not BOT_TOKEN:
+        sys.exit("Не задан токен бота: GIGACHESS_TOKEN")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s supervisor %(name)s: %(message)s")
+    # Миграции применяются один раз, до запуска процессов
+    DataBase(DB_PATH, DB_SYNCHRONOUS, DB_CACHE_SIZE).migrate()
+    # Клиент Bot API только для настройки webhook, без обработчиков
+    api: telebot.TeleBot = telebot.TeleBot(BOT_TOKEN, threaded=False)
+    supervisor: Supervisor = Supervisor(args.workers, SUPERVISOR_QUEUE_SIZE, SUPERVISOR_RESTART_DELAY)
+    register_metrics(supervisor)
+    if METRICS_PORT > 0:
+        REGISTRY.serve(METRICS_PORT)
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.closing.set())
+    supervisor.start()
+
+    webhook: Optional[ShardedWebhook] = None
+    try:
+        if WEBHOOK_URL:
+            webhook = supervisor.serve_webhook(WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET)
+            api.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET or None,
+                            allowed_updates=ALLOWED_UPDATES)
+            supervisor.closing.wait()
+        else:
+            # Пока у бота есть webhook, getUpdates не работает
+            api.remove_webhook()
+            supervisor.poll()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if webhook is not None:
+            webhook.stop()
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
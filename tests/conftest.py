@@ -0,0 +1,50 @@
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+# Модули бота лежат в корне репозитория и читают levels.json и assets по относительным путям
+ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from DataBase import DataBase
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Запускает каждый тест из корня репозитория, как запускается бот.
+    """
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def db(tmp_path: Path) -> Iterator[DataBase]:
+    """
+    Пустая база во временном каталоге со всеми миграциями.
+    """
+    base: DataBase = DataBase(str(tmp_path / "test.db"))
+    base.migrate()
+    yield base
+    base.close()
+
+
+@pytest.fixture
+def baseline_db(tmp_path: Path) -> str:
+    """
+    Копия GigaBase.db из репозитория в исходной схеме, без миграций.
+    """
+    path: Path = tmp_path / "baseline.db"
+    shutil.copy(ROOT / "GigaBase.db", path)
+    return str(path)
+
+
+@pytest.fixture
+def player(db: DataBase) -> int:
+    """
+    Профиль игрока в тестовой базе, возвращает его ID.
+    """
+    db.create_user("tester", 0, 0, 0, 1001)
+    return db.select_profile(1001)[0]
@@ -0,0 +1,111 @@
+from typing import List
+
+import pytest
+
+import admission
+from admission import ADMITTED, BUSY, DEFERRED, LIMITED, PRIORITY, Admission
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """
+    Подменяет time.monotonic в admission: время двигается только вручную через clock[0].
+    """
+    now: List[float] = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_burst_then_limited_with_one_warning(clock: List[float]) -> None:
+    """
+    Пользователь присылает burst сообщений подряд, дальше отказ и только одно предупреждение.
+    """
+    gate: Admission = Admission(rate=1, burst=2)
+    assert gate.admit(1, False, 0) == (ADMITTED, False, 0.0)
+    assert gate.admit(1, False, 0) == (ADMITTED, False, 0.0)
+    assert gate.admit(1, False, 0) == (LIMITED, True, 0.0)
+    assert gate.admit(1, False, 0) == (LIMITED, False, 0.0)
+
+    clock[0] += 1.0
+    assert gate.admit(1, False, 0)[0] == ADMITTED
+    # Новый эпизод превышения снова предупреждается
+    assert gate.admit(1, False, 0) == (LIMITED, True, 0.0)
+
+
+def test_buckets_are_per_user(clock: List[float]) -> None:
+    """
+    Лимит одного пользователя не задевает другого.
+    """
+    gate: Admission = Admission(rate=1, burst=1)
+    assert gate.admit(1, False, 0)[0] == ADMITTED
+    assert gate.admit(1, False, 0)[0] == LIMITED
+    assert gate.admit(2, False, 0)[0] == ADMITTED
+
+
+def test_zero_rate_disables_limit(clock: List[float]) -> None:
+    """
+    rate=0 отключает ограничение частоты.
+    """
+    gate: Admission = Admission(rate=0, burst=1)
+    assert all(gate.admit(1, False, 0)[0] == ADMITTED for _ in range(100))
+
+
+def test_cheap_commands_go_to_priority(clock: List[float]) -> None:
+    """
+    Дешевые команды распознаются с упоминанием бота и идут вне очереди даже при полной очереди.
+    """
+    gate: Admission = Admission(rate=1, burst=5, max_pending=1, cheap_commands=["help"])
+    assert gate.is_cheap("/help@GigaChessBot что-нибудь")
+    assert not gate.is_cheap("/play_game")
+    assert not gate.is_cheap("help")
+    assert gate.admit(1, True, 10) == (PRIORITY, False, 0.0)
+
+
+def test_busy_when_queue_is_full_and_token_is_spent(clock: List[float]) -> None:
+    """
+    При полной очереди сообщение отклоняется, а токен не возвращается.
+    """
+    gate: Admission = Admission(rate=1, burst=1, max_pending=3)
+    assert gate.admit(1, False, 3) == (BUSY, True, 0.0)
+    assert gate.admit(1, False, 0)[0] == LIMITED
+
+
+def test_deferrable_message_borrows_tokens_up_to_max_defer(clock: List[float]) -> None:
+    """
+    Ход в партии при пустой корзине откладывается до появления токена, но не дольше max_defer.
+    """
+    gate: Admission = Admission(rate=2, burst=1, max_defer=1.0)
+    assert gate.admit(1, False, 0, deferrable=True) == (ADMITTED, False, 0.0)
+    result, notify, delay = gate.admit(1, False, 0, deferrable=True)
+    assert (result, notify, delay) == (DEFERRED, False, pytest.approx(0.5))
+    assert gate.admit(1, False, 0, deferrable=True)[2] == pytest.approx(1.0)
+    # Следующий токен появится через 1.5 с - дольше max_defer
+    assert gate.admit(1, False, 0, deferrable=True) == (LIMITED, True, 0.0)
+
+    clock[0] += 1.0
+    # Долг в два токена погашен ровно до нуля: новый ход снова откладывается на полсекунды
+    assert gate.admit(1, False, 0, deferrable=True)[2] == pytest.approx(0.5)
+    assert gate.stats()[DEFERRED] == 3
+
+
+def test_no_deferral_without_max_defer_or_for_cheap(clock: List[float]) -> None:
+    """
+    Без max_defer и для дешевых команд сообщение сверх лимита отклоняется.
+    """
+    gate: Admission = Admission(rate=1, burst=1)
+    gate.admit(1, False, 0)
+    assert gate.admit(1, False, 0, deferrable=True)[0] == LIMITED
+
+    gate = Admission(rate=1, burst=1, max_defer=10)
+    gate.admit(1, False, 0)
+    assert gate.admit(1, True, 0, deferrable=True)[0] == LIMITED
+
+
+def test_forgets_least_recent_users(clock: List[float]) -> None:
+    """
+    В памяти держится не больше max_users корзин.
+    """
+    gate: Admission = Admission(rate=1, burst=1, max_users=2)
+    for user_id in range(5):
+        gate.admit(user_id, False, 0)
+    assert gate.stats()["users"] == 2
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import List
+
+from dispatcher import ChatDispatcher
+
+
+def test_tasks_of_one_chat_run_in_order() -> None:
+    """
+    Задачи одного чата выполняются по очереди, даже если потоков много.
+    """
+    dispatcher: ChatDispatcher = ChatDispatcher(4)
+    done: List[int] = []
+
+    def work(index: int) -> None:
+        # Ранние задачи дольше поздних: при параллельном выполнении порядок бы нарушился
+        time.sleep(0.001 * (10 - index % 10))
+        done.append(index)
+
+    for index in range(30):
+        dispatcher.submit(1, work, index)
+    dispatcher.shutdown()
+    assert done == list(range(30))
+    assert dispatcher.pending() == 0
+
+
+def test_different_chats_run_in_parallel() -> None:
+    """
+    Задачи разных чатов не ждут друг друга.
+    """
+    dispatcher: ChatDispatcher = ChatDispatcher(2)
+    barrier: threading.Barrier = threading.Barrier(2, timeout=5)
+    met: List[int] = []
+
+    def work(chat_id: int) -> None:
+        barrier.wait()
+        met.append(chat_id)
+
+    dispatcher.submit(1, work, 1)
+    dispatcher.submit(2, work, 2)
+    dispatcher.shutdown()
+    assert sorted(met) == [1, 2]
+
+
+def test_priority_task_waits_for_earlier_tasks_of_its_chat() -> None:
+    """
+    Дешевая задача идет вне общей очереди, но не обгоняет задачи своего чата.
+    """
+    dispatcher: ChatDispatcher = ChatDispatcher(1, priority_workers=1)
+    done: List[str] = []
+    dispatcher.submit(1, lambda: (time.sleep(0.05), done.append("move")))
+    dispatcher.submit_priority(1, done.append, "help")
+    dispatcher.shutdown()
+    assert done == ["move", "help"]
+
+
+def test_priority_task_of_idle_chat_skips_busy_workers() -> None:
+    """
+    Дешевая задача свободного чата не ждет, пока общие потоки заняты.
+    """
+    dispatcher: ChatDispatcher = ChatDispatcher(1, priority_workers=1)
+    release: threading.Event = threading.Event()
+    done: List[str] = []
+    dispatcher.submit(1, lambda: (release.wait(5), done.append("slow")))
+    dispatcher.submit_priority(2, lambda: (done.append("help"), release.set()))
+    dispatcher.shutdown()
+    assert done == ["help", "slow"]
+
+
+def test_deferred_task_keeps_its_place_without_blocking_other_chats() -> None:
+    """
+    Отложенная задача держит место в очереди своего чата, а другие чаты идут сразу.
+    """
+    dispatcher: ChatDispatcher = ChatDispatcher(1)
+    done: List[str] = []
+    start: float = time.monotonic()
+    dispatcher.submit_later(1, 0.2, lambda: done.append(("late", time.monotonic() - start)))
+    dispatcher.submit(1, done.append, "after")
+    dispatcher.submit(2, done.append, "other")
+    dispatcher.shutdown()
+
+    assert done[0] == "other"
+    assert done[1][0] == "late" and done[1][1] >= 0.2
+    assert done[2] == "after"
+
+
+def test_failing_task_does_not_stop_the_chat() -> None:
+    """
+    Ошибка в задаче записывается в лог, следующие задачи чата выполняются.
+    """
+    dispatcher: ChatDispatcher = ChatDispatcher(1)
+    done: List[int] = []
+    dispatcher.submit(1, lambda: 1 / 0)
+    dispatcher.submit(1, done.append, 2)
+    dispatcher.shutdown()
+    assert done == [2]
@@ -0,0 +1,32 @@
+import io
+from typing import List
+
+import chess
+import chess.pgn
+
+from DataBase import DataBase
+from export import iter_pgn, write_pgn
+
+
+def test_exports_move_log_and_legacy_games(db: DataBase, player: int) -> None:
+    """
+    Игры с журналом выгружаются ходами, старые игры без журнала - позицией из FEN.
+    """
+    db.create_game(player, "с журналом")
+    db.save_moves(1, chess.STARTING_FEN, 0, ["f2f3", "e7e5", "g2g4"], "fen после ходов")
+    db.finish_game(1, "итоговая fen", 1001, "lose", chess.STARTING_FEN, 3, ["d8h4"])
+    legacy: str = "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1"
+    db.create_game(player, "")
+    db.update_fen(legacy, 2)
+
+    out: io.BytesIO = io.BytesIO()
+    assert write_pgn(iter_pgn(db, player, "tester"), out) == 2
+
+    pgn: io.StringIO = io.StringIO(out.getvalue().decode("utf-8"))
+    games: List[chess.pgn.Game] = [chess.pgn.read_game(pgn), chess.pgn.read_game(pgn)]
+    assert [move.uci() for move in games[0].mainline_moves()] == ["f2f3", "e7e5", "g2g4", "d8h4"]
+    assert games[0].headers["Result"] == "0-1"
+    assert games[0].headers["Event"] == "с журналом"
+    assert games[1].headers["FEN"] == legacy
+    assert games[1].headers["Result"] == "*"
+    assert not list(games[1].mainline_moves())
@@ -0,0 +1,56 @@
+import chess
+
+from fastpath import FastPath
+
+MATE_IN_ONE: str = "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"
+SINGLE_MOVE: str = "k7/8/8/8/8/8/1q6/K7 w - - 0 1"
+
+
+def test_finds_mate_in_one() -> None:
+    """
+    Мат в один ход находится без движка.
+    """
+    fast: FastPath = FastPath()
+    board: chess.Board = chess.Board(MATE_IN_ONE)
+    assert fast.move(board) == chess.Move.from_uci("h5f7")
+    # Поиск не меняет позицию
+    assert board.fen() == MATE_IN_ONE
+    assert fast.stats() == {"single": 0, "mate": 1, "syzygy": 0}
+
+
+def test_single_legal_move() -> None:
+    """
+    Единственный легальный ход возвращается сразу.
+    """
+    fast: FastPath = FastPath()
+    assert fast.move(chess.Board(SINGLE_MOVE)) == chess.Move.from_uci("a1b2")
+    assert fast.stats()["single"] == 1
+
+
+def test_shortcuts_limit_paths() -> None:
+    """
+    Выключенные короткие пути не используются.
+    """
+    fast: FastPath = FastPath()
+    assert fast.move(chess.Board(MATE_IN_ONE), ["single"]) is None
+    assert fast.move(chess.Board(SINGLE_MOVE), ["mate"]) is None
+    assert fast.stats() == {"single": 0, "mate": 0, "syzygy": 0}
+
+
+def test_no_shortcut_needs_engine() -> None:
+    """
+    В обычной позиции и без легальных ходов нужен поиск движка.
+    """
+    fast: FastPath = FastPath()
+    assert fast.move(chess.Board()) is None
+    assert fast.move(chess.Board("k7/8/1Q6/8/8/8/8/K7 b - - 0 1")) is None
+
+
+def test_missing_tablebases_are_ignored(tmp_path) -> None:
+    """
+    Пустой каталог таблиц не мешает остальным коротким путям.
+    """
+    fast: FastPath = FastPath(str(tmp_path))
+    assert fast.move(chess.Board("8/8/8/4k3/8/8/4P3/4K3 w - - 0 1")) is None
+    assert fast.move(chess.Board(SINGLE_MOVE)) == chess.Move.from_uci("a1b2")
+    fast.close()
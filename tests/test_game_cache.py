@@ -0,0 +1,122 @@
+import chess
+import pytest
+
+from DataBase import DataBase
+from game_cache import GameCache
+
+START: str = chess.STARTING_FEN
+
+
+@pytest.fixture
+def game(db: DataBase, player: int) -> int:
+    """
+    Новая игра игрока, возвращает ее ID.
+    """
+    db.create_game(player, "тест")
+    return 1
+
+
+def play(board: chess.Board, *ucis: str) -> None:
+    """
+    Делает ходы на доске.
+    """
+    for uci in ucis:
+        board.push_uci(uci)
+
+
+def test_save_and_reload_keeps_move_history(db: DataBase, game: int) -> None:
+    """
+    Доска, собранная из базы заново, сохраняет историю ходов.
+    """
+    cache: GameCache = GameCache(db, 10, 60)
+    board: chess.Board = cache.get(game, START)
+    play(board, "e2e4", "e7e5")
+    assert cache.save(game, board, 2)
+    play(board, "g1f3", "b8c6")
+    assert cache.save(game, board, 2)
+
+    assert cache.get(game, board.fen()) is board
+    cache.forget(game)
+    reloaded: chess.Board = cache.get(game, db.load_game(game)["fen"])
+    assert reloaded is not board
+    assert [move.uci() for move in reloaded.move_stack] == ["e2e4", "e7e5", "g1f3", "b8c6"]
+    assert reloaded.root().fen() == START
+    assert cache.stats()["hits"] == 1
+
+
+def test_stale_board_is_reloaded(db: DataBase, game: int) -> None:
+    """
+    Если FEN в базе не совпадает с доской в памяти, доска собирается заново.
+    """
+    cache: GameCache = GameCache(db, 10, 60)
+    board: chess.Board = cache.get(game, START)
+    play(board, "d2d4")
+    # Ход не сохранен - в базе по-прежнему начальная позиция
+    reloaded: chess.Board = cache.get(game, START)
+    assert reloaded is not board and not reloaded.move_stack
+
+
+def test_failed_log_read_raises_and_keeps_log(monkeypatch: pytest.MonkeyPatch, db: DataBase, game: int) -> None:
+    """
+    Ошибка чтения журнала не превращается в доску без истории, которая перезаписала бы журнал.
+    """
+    cache: GameCache = GameCache(db, 10, 60)
+    board: chess.Board = cache.get(game, START)
+    play(board, "e2e4")
+    cache.save(game, board, 1)
+    cache.forget(game)
+
+    monkeypatch.setattr(db, "load_moves", lambda game_id: False)
+    with pytest.raises(RuntimeError):
+        cache.get(game, board.fen())
+    monkeypatch.undo()
+    assert db.load_moves(game) == (START, ["e2e4"])
+
+
+def test_finish_appends_moves_and_ends_game(db: DataBase, game: int) -> None:
+    """
+    Завершение партии дописывает последние ходы, меняет статус и счет игрока.
+    """
+    cache: GameCache = GameCache(db, 10, 60)
+    board: chess.Board = cache.get(game, START)
+    play(board, "f2f3", "e7e5", "g2g4")
+    cache.save(game, board, 3)
+    play(board, "d8h4")
+    assert board.is_checkmate()
+    assert cache.finish(game, board, 1, 1001, "lose")
+
+    assert db.load_game(game)["status"] == "over"
+    assert db.load_moves(game) == (START, ["f2f3", "e7e5", "g2g4", "d8h4"])
+    assert cache.stats()["items"] == 0
+
+
+def test_legacy_game_starts_log_from_fen(db: DataBase, game: int) -> None:
+    """
+    Старая игра без журнала собирается из FEN, а журнал начинается с этой позиции.
+    """
+    fen: str = "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
+    db.update_fen(fen, game)
+    cache: GameCache = GameCache(db, 10, 60)
+    board: chess.Board = cache.get(game, fen)
+    assert board.fen() == fen and not board.move_stack
+
+    play(board, "g1f3")
+    assert cache.save(game, board, 1)
+    assert db.load_moves(game) == (fen, ["g1f3"])
+
+
+def test_evicts_by_count_and_idle_time(db: DataBase, player: int) -> None:
+    """
+    В памяти не больше max_items досок, давно не использованные вытесняются.
+    """
+    for _ in range(3):
+        db.create_game(player)
+    cache: GameCache = GameCache(db, 2, 60)
+    for game_id in (1, 2, 3):
+        cache.get(game_id, START)
+    assert cache.stats()["items"] == 2
+
+    idle: GameCache = GameCache(db, 10, 0)
+    idle.get(1, START)
+    idle.get(2, START)
+    assert idle.stats()["items"] == 1
@@ -0,0 +1,76 @@
+from typing import List
+
+import pytest
+
+from DataBase import DataBase
+
+
+@pytest.fixture
+def games(db: DataBase, player: int) -> List[int]:
+    """
+    Семь игр игрока, из которых третья и пятая закончены. Возвращает ID незаконченных.
+    """
+    for index in range(7):
+        db.create_game(player, f"игра {index}")
+    for game_id in (3, 5):
+        db.finish_game(game_id, "8/8/8/8/8/8/8/8 w - - 0 1", 1001, "draw")
+    return [1, 2, 4, 6, 7]
+
+
+def test_pages_forward_and_back(db: DataBase, player: int, games: List[int]) -> None:
+    """
+    Страницы идут по id после последней показанной игры и обратно до первой.
+    """
+    first = db.select_unfinished_page(player, -1, None, 2)
+    assert [row[0] for row in first] == [1, 2]
+    second = db.select_unfinished_page(player, first[-1][0], None, 2)
+    assert [row[0] for row in second] == [4, 6]
+    third = db.select_unfinished_page(player, second[-1][0], None, 2)
+    assert [row[0] for row in third] == [7]
+
+    back = db.select_unfinished_page(player, -1, third[0][0], 2)
+    assert [row[0] for row in back] == [4, 6]
+    assert back[0][1] == "игра 3"
+
+
+def test_other_players_games_are_not_listed(db: DataBase, player: int, games: List[int]) -> None:
+    """
+    Чужие игры не попадают в список.
+    """
+    db.create_user("other", 0, 0, 0, 2002)
+    other: int = db.select_profile(2002)[0]
+    db.create_game(other, "чужая")
+    rows = db.select_unfinished_page(player, -1, None, 100)
+    assert [row[0] for row in rows] == games
+    assert [row[0] for row in db.select_unfinished_page(other, -1, None, 100)] == [8]
+
+
+def test_games_page_buttons(monkeypatch: pytest.MonkeyPatch, db: DataBase, player: int,
+                            games: List[int]) -> None:
+    """
+    Кнопки страниц несут id крайней показанной игры.
+    """
+    GigaChess = pytest.importorskip("GigaChess")
+    monkeypatch.setattr(GigaChess, "db", db)
+    monkeypatch.setattr(GigaChess, "GAMES_PAGE_SIZE", 2)
+
+    def callbacks(markup) -> List[str]:
+        return [button.callback_data for row in markup.keyboard for button in row] if markup else []
+
+    text, markup = GigaChess.games_page(player)
+    assert "айди игры - 1," in text and "айди игры - 2," in text
+    assert callbacks(markup) == ["games:>:2"]
+
+    text, markup = GigaChess.games_page(player, after=2)
+    assert callbacks(markup) == ["games:<:4", "games:>:6"]
+
+    text, markup = GigaChess.games_page(player, after=6)
+    assert "айди игры - 7," in text
+    assert callbacks(markup) == ["games:<:7"]
+
+    text, markup = GigaChess.games_page(player, before=4)
+    assert callbacks(markup) == ["games:>:2"]
+
+    # За последней игрой ничего не осталось - показывается первая страница
+    text, markup = GigaChess.games_page(player, after=7)
+    assert callbacks(markup) == ["games:>:2"]
@@ -0,0 +1,49 @@
+import sqlite3
+from pathlib import Path
+from typing import List, Set, Tuple
+
+from DataBase import DataBase
+from queries import Queries as Q
+
+
+def tables(path: str) -> Set[str]:
+    """
+    Возвращает имена таблиц базы.
+    """
+    with sqlite3.connect(path) as con:
+        return {name for (name,) in con.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def test_migrate_baseline_is_idempotent(baseline_db: str) -> None:
+    """
+    Миграции применяются к базе из репозитория один раз и не трогают профили.
+    """
+    with sqlite3.connect(baseline_db) as con:
+        profiles: List[Tuple] = con.execute("SELECT * FROM profiles ORDER BY id").fetchall()
+        games: int = con.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    db: DataBase = DataBase(baseline_db)
+    assert db.migrate() == len(Q.MIGRATIONS)
+    assert db.migrate() == len(Q.MIGRATIONS)
+    db.close()
+    # Новое подключение видит сохраненную версию схемы
+    db = DataBase(baseline_db)
+    assert db.migrate() == len(Q.MIGRATIONS)
+    db.close()
+
+    assert {"moves", "game_origins", "chat_states", "move_evals", "analyzed_games"} <= tables(baseline_db)
+    with sqlite3.connect(baseline_db) as con:
+        assert con.execute("SELECT * FROM profiles ORDER BY id").fetchall() == profiles
+        assert con.execute("SELECT COUNT(*) FROM games").fetchone()[0] == games
+        assert con.execute("SELECT COUNT(*) FROM games WHERE status = 'in progress'").fetchone()[0] == 0
+
+
+def test_migrate_empty_database(tmp_path: Path) -> None:
+    """
+    Пустая база получает полную схему.
+    """
+    path: str = str(tmp_path / "empty.db")
+    db: DataBase = DataBase(path)
+    assert db.migrate() == len(Q.MIGRATIONS)
+    db.close()
+    assert {"profiles", "games", "moves", "game_origins", "chat_states"} <= tables(path)
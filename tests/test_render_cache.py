@@ -0,0 +1,62 @@
+from typing import List
+
+import chess
+
+from render import RenderCache, board_key
+
+
+def test_hits_and_misses() -> None:
+    """
+    Повторный запрос той же позиции не рисует изображение заново.
+    """
+    cache: RenderCache = RenderCache(100)
+    calls: List[str] = []
+
+    def render() -> bytes:
+        calls.append("render")
+        return b"x" * 10
+
+    assert cache.get_or_render("a", render) == b"x" * 10
+    assert cache.get_or_render("a", render) == b"x" * 10
+    assert calls == ["render"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes"]) == (1, 1, 10)
+
+
+def test_evicts_least_recently_used_by_bytes() -> None:
+    """
+    При превышении объема вытесняются давно не использованные изображения.
+    """
+    cache: RenderCache = RenderCache(25)
+    cache.get_or_render("a", lambda: b"a" * 10)
+    cache.get_or_render("b", lambda: b"b" * 10)
+    # Обращение к "a" делает самым давним "b"
+    cache.get_or_render("a", lambda: b"?")
+    cache.get_or_render("c", lambda: b"c" * 10)
+
+    assert cache.stats()["bytes"] == 20
+    assert cache.get_or_render("a", lambda: b"?") == b"a" * 10
+    assert cache.get_or_render("b", lambda: b"new") == b"new"
+
+
+def test_oversized_image_is_returned_but_not_cached() -> None:
+    """
+    Изображение больше всего кеша отдается, но не вытесняет остальные.
+    """
+    cache: RenderCache = RenderCache(25)
+    cache.get_or_render("a", lambda: b"a" * 10)
+    assert cache.get_or_render("big", lambda: b"b" * 30) == b"b" * 30
+    stats = cache.stats()
+    assert (stats["items"], stats["bytes"]) == (1, 10)
+
+
+def test_board_key_ignores_move_counters() -> None:
+    """
+    Одна и та же позиция из разных партий дает один ключ, подсветка хода - другой.
+    """
+    first: chess.Board = chess.Board()
+    for uci in ("g1f3", "g8f6", "f3g1", "f6g8"):
+        first.push_uci(uci)
+    assert board_key(first) == board_key(chess.Board())
+    assert board_key(first, first.peek()) != board_key(chess.Board())
+    assert board_key(first, orientation=chess.BLACK) != board_key(first)
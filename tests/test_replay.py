@@ -0,0 +1,87 @@
+import io
+import sys
+from pathlib import Path
+
+import chess
+import pytest
+
+import replay
+from DataBase import DataBase
+
+
+def after(board: chess.Board, uci: str) -> chess.Board:
+    """
+    Возвращает копию доски после хода.
+    """
+    board = board.copy()
+    board.push_uci(uci)
+    return board
+
+
+def test_changed_squares_castling() -> None:
+    """
+    При рокировке меняются клетки короля и ладьи.
+    """
+    board: chess.Board = chess.Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    changed = replay.changed_squares(board, after(board, "e1g1"))
+    assert changed == chess.SquareSet([chess.E1, chess.F1, chess.G1, chess.H1])
+
+
+def test_changed_squares_en_passant() -> None:
+    """
+    При взятии на проходе исчезает пешка на клетке, куда никто не ходил.
+    """
+    board: chess.Board = chess.Board("k7/8/8/3pP3/8/8/8/K7 w - d6 0 2")
+    changed = replay.changed_squares(board, after(board, "e5d6"))
+    assert changed == chess.SquareSet([chess.E5, chess.D6, chess.D5])
+
+
+def test_changed_squares_promotion_capture() -> None:
+    """
+    Превращение со взятием меняет обе клетки, хотя занятость поля назначения не меняется.
+    """
+    board: chess.Board = chess.Board("1r5k/P7/8/8/8/8/8/K7 w - - 0 1")
+    changed = replay.changed_squares(board, after(board, "a7b8q"))
+    assert changed == chess.SquareSet([chess.A7, chess.B8])
+
+
+def test_replay_gif_writes_animation() -> None:
+    """
+    Анимация - корректный GIF с кадром на каждый ход.
+    """
+    out: io.BytesIO = io.BytesIO()
+    assert replay.replay_gif(chess.STARTING_FEN, ["e2e4", "e7e5", "g1f3"], out, 160) == 3
+    data: bytes = out.getvalue()
+    assert data.startswith(b"GIF89a") and data.endswith(b";")
+
+
+def test_replay_gif_stops_at_illegal_move() -> None:
+    """
+    Поврежденный журнал показывается до первого нелегального хода.
+    """
+    out: io.BytesIO = io.BytesIO()
+    assert replay.replay_gif(chess.STARTING_FEN, ["e2e4", "e2e4", "g1f3"], out, 160) == 1
+    assert out.getvalue().endswith(b";")
+
+
+def test_main_migrates_old_database(monkeypatch: pytest.MonkeyPatch, baseline_db: str, tmp_path: Path) -> None:
+    """
+    Старая база без журналов мигрируется, а игра без журнала дает понятную ошибку.
+    """
+    monkeypatch.setattr(sys, "argv", ["replay.py", "--db", baseline_db, "--game-id", "1",
+                                      "-o", str(tmp_path / "out.gif")])
+    with pytest.raises(SystemExit) as exit_info:
+        replay.main()
+    assert "нет журнала" in str(exit_info.value.code)
+
+
+def test_main_reports_read_error(monkeypatch: pytest.MonkeyPatch, baseline_db: str, tmp_path: Path) -> None:
+    """
+    Ошибка чтения журнала не выдается за отсутствие журнала.
+    """
+    monkeypatch.setattr(DataBase, "load_moves", lambda self, game_id: False)
+    monkeypatch.setattr(sys, "argv", ["replay.py", "--db", baseline_db, "--game-id", "1",
+                                      "-o", str(tmp_path / "out.gif")])
+    with pytest.raises(SystemExit) as exit_info:
+        replay.main()
+    assert "Не удалось прочитать" in str(exit_info.value.code)
@@ -0,0 +1,189 @@
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import telebot
+
+logger = logging.getLogger(__name__)
+
+
+def update_chat_id(update: Any) -> int:
+    """
+    Определяет чат, к которому относится обновление, чтобы обновления одного чата попадали в одну очередь.
+
+    Args:
+        update (Any): Обновление в формате Bot API
+
+    Returns:
+        int: ID чата, ID пользователя или 0, если обновление ни к кому не относится или в нем нет числового ID
+    """
+    if not isinstance(update, dict):
+        return 0
+    for kind, value in update.items():
+        if not isinstance(value, dict):
+            continue
+        owners: List[Any] = [value.get("chat"), value.get("from")]
+        if kind == "callback_query" and isinstance(value.get("message"), dict):
+            owners.insert(0, value["message"].get("chat"))
+        for owner in owners:
+            if isinstance(owner, dict) and type(owner.get("id")) is int:
+                return owner["id"]
+    return 0
+
+
+class WebhookServer:
+    """
+    Прием обновлений Telegram через webhook вместо long polling.
+
+    HTTP-обработчик только проверяет секрет, разбирает JSON и кладет
+    обновление в ограниченную очередь, поэтому Telegram получает ответ сразу.
+    Очередей по одной на обработчик, и обновления одного чата всегда попадают
+    в одну и ту же, поэтому порядок сообщений чата сохраняется. Если очередь
+    переполнена, сервер отвечает 503 и Telegram повторит доставку позже.
+    """
+
+    def __init__(self, bot: telebot.TeleBot, host: str, port: int, path: str, secret: str = "",
+                 queue_size: int = 1000, workers: int = 4) -> None:
+        """
+        Инициализирует сервер. Прием начинается после start().
+
+        Args:
+            bot (telebot.TeleBot): Бот, обрабатывающий обновления
+            host (str): Адрес, на котором слушает сервер
+            port (int): Порт
+            path (str): Путь, на который Telegram отправляет обновления
+            secret (str): Секрет из setWebhook(secret_token), пустая строка - не проверять
+            queue_size (int): Суммарная емкость очередей обновлений
+            workers (int): Количество потоков-обработчиков
+        """
+        self.bot: telebot.TeleBot = bot
+        self.path: str = path
+        self.secret: str = secret
+        self.workers: int = max(1, workers)
+        self._queues: List["queue.Queue[Optional[Dict[str, Any]]]"] = [
+            queue.Queue(maxsize=max(1, queue_size // self.workers)) for _ in range(self.workers)
+        ]
+        self._threads: List[threading.Thread] = []
+        self._lock: threading.Lock = threading.Lock()
+        self.received: int = 0
+        self.rejected: int = 0
+        self.failed: int = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if self.path.split("?")[0] != server.path:
+                    self.send_error(404)
+                    return
+                if server.secret and not hmac.compare_digest(
+                        self.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), server.secret):
+                    self.send_error(403)
+                    return
+                try:
+                    update: Any = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                # Обновление Bot API - всегда JSON-объект
+                if not isinstance(update, dict):
+                    self.send_error(400)
+                    return
+                self.send_response(200 if server.offer(update) else 503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.http: ThreadingHTTPServer = ThreadingHTTPServer((host, port), Handler)
+        self.http.daemon_threads = True
+
+    def offer(self, update: Dict[str, Any]) -> bool:
+        """
+        Кладет обновление в очередь его чата, не дожидаясь места.
+
+        Args:
+            update (Dict[str, Any]): Обновление в формате Bot API
+
+        Returns:
+            bool: True, если обновление принято, False, если очередь переполнена
+        """
+        shard: int = update_chat_id(update) % self.workers
+        try:
+            self._queues[shard].put_nowait(update)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.received += 1
+        return True
+
+    def _work(self, updates: "queue.Queue[Optional[Dict[str, Any]]]") -> None:
+        """
+        Обрабатывает обновления одной очереди по порядку.
+
+        Args:
+            updates (queue.Queue[Optional[Dict[str, Any]]]): Очередь обработчика, None - остановка
+
+        Returns:
+            None
+        """
+        while True:
+            update: Optional[Dict[str, Any]] = updates.get()
+            if update is None:
+                return
+            try:
+                self.bot.process_new_updates([telebot.types.Update.de_json(update)])
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                logger.exception("Ошибка при обработке обновления %s", update.get("update_id"))
+
+    def start(self) -> None:
+        """
+        Запускает потоки-обработчики и HTTP-сервер в фоне.
+
+        Returns:
+            None
+        """
+        for index, updates in enumerate(self._queues):
+            thread: threading.Thread = threading.Thread(target=self._work, args=(updates,),
+                                                        name=f"webhook-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self.http.serve_forever, name="webhook-http", daemon=True).start()
+
+    def stop(self) -> None:
+        """
+        Останавливает прием, дожидается обработки уже принятых обновлений.
+
+        Returns:
+            None
+        """
+        self.http.shutdown()
+        self.http.server_close()
+        for updates in self._queues:
+            updates.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики приема обновлений.
+
+        Returns:
+            Dict[str, Any]: Принятые, отклоненные и упавшие обновления, глубина очередей
+        """
+        with self._lock:
+            return {
+                "received": self.received,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "queued": sum(updates.qsize() for updates in self._queues),
+            }